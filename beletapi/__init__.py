@@ -6,6 +6,7 @@ from .models.movie import (
     BeletSeriesEpisode,
 )
 from .models.file import BeletFile
+from .models.batch import BeletBatchResult
 
 __all__ = [
     "BeletClient",
@@ -14,4 +15,5 @@ __all__ = [
     "BeletSeriesSeason",
     "BeletSeriesEpisode",
     "BeletFile",
+    "BeletBatchResult",
 ]
@@ -0,0 +1,310 @@
+import time
+import random
+import threading
+from typing import Callable, Dict, FrozenSet, NamedTuple, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .api import Apis
+from .exceptions import CircuitOpenError
+from .ratelimit import RateLimiter, RateLimiterStats
+
+
+class HostConfig(NamedTuple):
+    """Connection settings of one host
+
+    Attributes:
+        pool_size: number of pooled connections
+        timeout: default `(connect, read)` timeout in seconds
+        retries: retries on connection errors and `retry_statuses`
+        backoff_factor: base of the exponential backoff in seconds
+        backoff_max: maximum backoff in seconds
+        retry_statuses: response statuses that are retried
+        retry_methods: methods that are retried
+        breaker_threshold: consecutive failures that open the circuit
+        breaker_reset_timeout: seconds before an open circuit lets
+            a trial request through
+        rate_limit: maximum requests per second (`None` - unlimited)
+        rate_burst: requests allowed at once above `rate_limit`
+        max_in_flight: maximum concurrent requests (`None` - unlimited)
+    """
+
+    pool_size: int = 10
+    timeout: Optional[float | tuple] = (5, 30)
+    retries: int = 3
+    backoff_factor: float = 0.5
+    backoff_max: float = 10
+    retry_statuses: FrozenSet[int] = frozenset({500, 502, 503, 504})
+    retry_methods: FrozenSet[str] = frozenset({"GET", "HEAD", "OPTIONS"})
+    breaker_threshold: int = 5
+    breaker_reset_timeout: float = 30
+    rate_limit: Optional[float] = None
+    rate_burst: int = 1
+    max_in_flight: Optional[int] = None
+
+
+# default ports, left out of host keys
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def host_key(scheme: str, host: Optional[str], port: Optional[int]) -> str:
+    """Key of a host in breakers and limiters, `host[:port]`"""
+
+    host = (host or "").lower()
+
+    if port is None or port == DEFAULT_PORTS.get(scheme):
+        return host
+
+    return f"{host}:{port}"
+
+
+class JitteredRetry(Retry):
+    """`Retry` with full jitter: backoff is uniform in `[0, backoff]`
+
+    Args:
+        backoff_cap (float): maximum backoff in seconds, unlike
+            `backoff_max` also supported by urllib3 1.26
+        before_retry (Callable): called with the connection pool after
+            the backoff of every retry, before it's sent
+    """
+
+    def __init__(
+        self,
+        *args,
+        backoff_cap: Optional[float] = None,
+        before_retry: Optional[Callable] = None,
+        **kwargs,
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.backoff_cap = backoff_cap
+        self.before_retry = before_retry
+        self._pool = None
+
+    def new(self, **kwargs) -> "JitteredRetry":
+        retry = super().new(**kwargs)
+        retry.backoff_cap = self.backoff_cap
+        retry.before_retry = self.before_retry
+        return retry
+
+    def increment(self, *args, **kwargs) -> "JitteredRetry":
+        retry = super().increment(*args, **kwargs)
+        retry._pool = kwargs.get("_pool")
+        return retry
+
+    def get_backoff_time(self) -> float:
+        backoff = super().get_backoff_time()
+
+        if self.backoff_cap is not None:
+            backoff = min(backoff, self.backoff_cap)
+
+        return random.uniform(0, backoff) if backoff > 0 else 0
+
+    def sleep(self, response=None) -> None:
+        super().sleep(response)
+
+        if self.before_retry is not None and self._pool is not None:
+            self.before_retry(self._pool)
+
+
+class CircuitBreaker:
+    """Fails requests to a host fast after repeated failures
+
+    After `threshold` consecutive failures the circuit opens and
+    requests raise `CircuitOpenError` without touching the network.
+    Once `reset_timeout` passes a single trial request is let through,
+    its success closes the circuit, a failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, host: str, threshold: int, reset_timeout: float):
+        self.host = host
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"<CircuitBreaker: host='{self.host}' state={self.state}>"
+
+    def before_request(self) -> None:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+
+            if (
+                self.state == self.OPEN
+                and time.monotonic() - self.opened_at >= self.reset_timeout
+            ):
+                self.state = self.HALF_OPEN
+                return
+
+            raise CircuitOpenError(self.host)
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_aborted(self) -> None:
+        """Record a request that ended without an outcome (e.g.
+        interrupted), a trial request is let through again
+        """
+
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                # `opened_at` is kept, the next request is a trial
+                self.state = self.OPEN
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+
+            if (
+                self.state == self.HALF_OPEN
+                or self.failures >= self.threshold
+            ):
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class BeletHTTPAdapter(HTTPAdapter):
+    """`HTTPAdapter` configured by `HostConfig`
+
+    Adds a default timeout, jittered exponential backoff retries,
+    a circuit breaker and a rate limiter per host. Retries take a
+    rate limiter token each, they keep the in-flight slot of their
+    request.
+    """
+
+    def __init__(self, config: HostConfig = HostConfig()) -> None:
+        self.host_config = config
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.limiters: Dict[str, RateLimiter] = {}
+        self._breakers_lock = threading.Lock()
+
+        super().__init__(
+            pool_connections=config.pool_size,
+            pool_maxsize=config.pool_size,
+            max_retries=JitteredRetry(
+                total=config.retries,
+                status_forcelist=config.retry_statuses,
+                allowed_methods=config.retry_methods,
+                backoff_factor=config.backoff_factor,
+                backoff_cap=config.backoff_max,
+                raise_on_status=False,
+                before_retry=self._before_retry,
+            ),
+        )
+
+    def get_breaker(self, host: str) -> CircuitBreaker:
+        with self._breakers_lock:
+            breaker = self.breakers.get(host)
+
+            if breaker is None:
+                breaker = self.breakers[host] = CircuitBreaker(
+                    host,
+                    self.host_config.breaker_threshold,
+                    self.host_config.breaker_reset_timeout,
+                )
+
+            return breaker
+
+    def get_limiter(self, host: str) -> Optional[RateLimiter]:
+        config = self.host_config
+
+        if config.rate_limit is None and config.max_in_flight is None:
+            return None
+
+        with self._breakers_lock:
+            limiter = self.limiters.get(host)
+
+            if limiter is None:
+                limiter = self.limiters[host] = RateLimiter(
+                    config.rate_limit,
+                    config.rate_burst,
+                    config.max_in_flight,
+                )
+
+            return limiter
+
+    def limiter_stats(self) -> Dict[str, RateLimiterStats]:
+        with self._breakers_lock:
+            limiters = list(self.limiters.items())
+
+        return {host: limiter.stats() for host, limiter in limiters}
+
+    def _before_retry(self, pool) -> None:
+        limiter = self.get_limiter(host_key(pool.scheme, pool.host, pool.port))
+
+        if limiter is not None:
+            limiter.acquire(slot=False)
+
+    def send(self, request, timeout=None, **kwargs) -> requests.Response:
+        url = urlsplit(request.url)
+        host = host_key(url.scheme, url.hostname, url.port)
+        breaker = self.get_breaker(host)
+        limiter = self.get_limiter(host)
+        acquired = False
+
+        if timeout is None:
+            timeout = self.host_config.timeout
+
+        breaker.before_request()
+
+        try:
+            # inside the try, an interrupted wait releases the trial
+            if limiter is not None:
+                limiter.acquire()
+                acquired = True
+
+            response = super().send(request, timeout=timeout, **kwargs)
+        except Exception:
+            # connection errors and timeouts, retries are exhausted
+            breaker.record_failure()
+            raise
+        except BaseException:
+            # interrupted, not a failure of the host
+            breaker.record_aborted()
+            raise
+        finally:
+            if acquired:
+                limiter.release()
+
+        if response.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
+        return response
+
+
+def default_host_configs() -> Dict[str, HostConfig]:
+    """Configs for every `Apis` host and a fallback for other hosts
+
+    The fallback (`https://` and `http://` prefixes) covers the HLS
+    CDN, its pool is larger because segments are downloaded
+    concurrently.
+    """
+
+    configs = {
+        api.host + "/": HostConfig()
+        for api in (
+            Apis.main_api,
+            Apis.homepage_api,
+            Apis.film_api,
+            Apis.search_api,
+        )
+    }
+    configs["https://"] = configs["http://"] = HostConfig(pool_size=32)
+
+    return configs
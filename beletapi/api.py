@@ -1,3 +1,7 @@
+import re
+from typing import List, Optional, Tuple
+
+
 class MetaApi(type):
     def __new__(cls, name, bases, attrs):
         if "host" not in attrs:
@@ -88,3 +92,52 @@ class Apis:
     homepage_api = HomepageApi()
     film_api = FilmApi()
     search_api = SearchApi()
+
+    _endpoint_patterns: Optional[List[Tuple[str, re.Pattern]]] = None
+
+    @classmethod
+    def resolve_endpoint(cls, url: str) -> Optional[str]:
+        """Get templated endpoint name of `url`
+
+        e.g. `https://film.beletapis.com/api/v2/movie/343315`
+        resolves to `film_api.movie`
+
+        Args:
+            url (str): request url, query string is ignored
+
+        Returns:
+            Optional[str]: `<api>.<endpoint>` or `None` if `url`
+                           doesn't belong to any api
+        """
+
+        if cls._endpoint_patterns is None:
+            cls._endpoint_patterns = cls._build_endpoint_patterns()
+
+        url = url.split("?", 1)[0]
+
+        for name, pattern in cls._endpoint_patterns:
+            if pattern.fullmatch(url):
+                return name
+
+        return None
+
+    @classmethod
+    def _build_endpoint_patterns(cls) -> List[Tuple[str, re.Pattern]]:
+        patterns = []
+
+        for api_name, api in vars(cls).items():
+            if not isinstance(type(api), MetaApi):
+                continue
+
+            for endpoint_name, endpoint in vars(type(api)).items():
+                if endpoint_name.startswith("_") or endpoint_name == "host":
+                    continue
+
+                pattern = re.escape(endpoint).replace(
+                    re.escape("{}"), "[^/]+"
+                )
+                patterns.append(
+                    (f"{api_name}.{endpoint_name}", re.compile(pattern))
+                )
+
+        return patterns
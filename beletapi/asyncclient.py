@@ -0,0 +1,430 @@
+import os
+import time
+import asyncio
+from collections import deque
+from typing import AsyncIterator, Optional, List, Dict, Iterable
+
+import requests
+from requests_toolbelt import MultipartEncoder
+
+from .asyncsession import AsyncBeletSession
+from .client import DEFAULT_HEADERS
+from .exceptions import *
+from .api import Apis
+from .enums import BeletHomepageSectionType
+from .models.movie import (
+    BeletMovie,
+    BeletMovieFragment,
+    BeletSeries,
+    movie_from_data,
+)
+from .models.batch import BeletBatchResult
+from .models.homepage import BeletHomepageSection
+from .models.search import BeletSearchResult
+from .models.searchfilters import SearchFilters
+from .utils import (
+    format_movie_id,
+    format_movie_ids,
+    format_phone,
+    generate_fingerprint,
+    load_data_file,
+    save_data_file,
+)
+
+
+class AsyncBeletClient(AsyncBeletSession):
+    """Asyncio counterpart of `BeletClient`
+
+    Shares the data file format with `BeletClient`, so both clients
+    can use the same login. Models returned by this client have to be
+    used through their awaitable methods (`BeletMovie.fetch_files`,
+    `BeletSeriesSeason.fetch_episodes`). Downloads aren't supported,
+    use `BeletClient.download` for them.
+    """
+
+    _filter_data: Optional[SearchFilters]
+
+    def __init__(
+        self,
+        *args,
+        data_file: str = "beletapidata.bin",
+        **kwargs,
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self._data_file = data_file
+        self._filter_data = None
+
+        self.headers.update(DEFAULT_HEADERS)
+
+        self._load_data()
+
+    async def login(self, phone: int | str) -> None:
+        """Login to belet using phone number
+
+        See `BeletClient.login` for the phone number format
+
+        Args:
+            phone (int): phone number
+        """
+
+        phone = format_phone(phone)
+        self._set_fingerprint_cookie()
+
+        response = await self._send(
+            "POST",
+            Apis.main_api.sign_in,
+            json={"phone": phone},
+            params={"sign_in_type": 1},
+        )
+
+        response.raise_for_status()
+        response_json = response.json()
+
+        code = await asyncio.get_running_loop().run_in_executor(
+            None, input, f"Please enter the code that was sent to {phone}: "
+        )
+
+        response = await self._send(
+            "POST",
+            Apis.main_api.check_code,
+            json={"code": code, "token": response_json["token"]},
+        )
+
+        response.raise_for_status()
+
+        await self._refresh_token()
+
+    async def logout(self) -> None:
+        """Log out from account
+
+        Clears token and cookies
+        """
+
+        response = await self.post(Apis.main_api.log_out)
+        response.raise_for_status()
+
+        self._clear_data()
+
+    async def get_movie(
+        self, movie_id: int | str, deep: bool = False
+    ) -> BeletMovie | BeletSeries:
+        """Get movie or series
+
+        See `BeletClient.get_movie`
+        """
+
+        movie_id = format_movie_id(movie_id)
+        response = await self.get(Apis.film_api.movie.format(movie_id))
+
+        response.raise_for_status()
+        response_json = response.json()
+        APIStatusError.raise_for_status(response_json)
+
+        movie = movie_from_data(self, response_json["film"])
+
+        if deep:
+            await self._prefetch_movie(movie)
+
+        return movie
+
+    async def get_movies(
+        self,
+        movie_ids: Iterable[int | str],
+        concurrency: int = 64,
+        prefetch: bool = False,
+    ) -> BeletBatchResult:
+        """Get many movies concurrently
+
+        See `BeletClient.get_movies`, `concurrency` bounds the
+        number of movies that are fetched at the same time.
+        """
+
+        ids, errors = format_movie_ids(movie_ids)
+        # unparsable inputs aren't fetched
+        indexes = [
+            index
+            for index, movie_id in enumerate(ids)
+            if movie_id not in errors
+        ]
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(movie_id: int) -> BeletMovie | BeletSeries:
+            async with semaphore:
+                return await self.get_movie(movie_id, prefetch)
+
+        results = await asyncio.gather(
+            *(fetch(ids[index]) for index in indexes), return_exceptions=True
+        )
+
+        movies = [None] * len(ids)
+
+        for index, result in zip(indexes, results):
+            if isinstance(result, Exception):
+                errors[ids[index]] = result
+            else:
+                movies[index] = result
+
+        return BeletBatchResult(ids, movies, errors)
+
+    async def get_homepage_movies(
+        self,
+        offset: int = 0,
+        limit: int = 3,
+        h_limit: int = 12,
+        type_id: int = 0,
+    ) -> List[BeletHomepageSection]:
+        response = await self.get(
+            Apis.homepage_api.home_page,
+            params={
+                "offset": offset,
+                "limit": limit,
+                "h_limit": h_limit,
+                "type_id": type_id,
+            },
+        )
+
+        response.raise_for_status()
+        response_json = response.json()
+        APIStatusError.raise_for_status(response_json)
+
+        return list(
+            BeletHomepageSection.from_data(self, data)
+            for data in response_json["result"]
+        )
+
+    async def get_homepage_section(
+        self,
+        offset: int,
+        h_limit: int = 12,
+        type_id: int = 0,
+    ) -> Optional[BeletHomepageSection]:
+        """Get a single homepage section
+
+        See `BeletClient.get_homepage_section`
+        """
+
+        sections = await self.get_homepage_movies(offset, 1, h_limit, type_id)
+        return sections[0] if sections else None
+
+    async def iter_homepage(
+        self,
+        limit: int = 3,
+        h_limit: int = 12,
+        type_id: int = 0,
+        lookahead: int = 1,
+        h_limits: Optional[Dict[BeletHomepageSectionType, int]] = None,
+    ) -> AsyncIterator[BeletHomepageSection]:
+        """Iterate over all homepage sections
+
+        See `BeletClient.iter_homepage`
+        """
+
+        h_limits = h_limits or {}
+        slices = deque()
+        offset = 0
+        exhausted = False
+
+        async def refetch(
+            section: BeletHomepageSection, position: int, section_h_limit: int
+        ) -> BeletHomepageSection:
+            return (
+                await self.get_homepage_section(
+                    position, section_h_limit, type_id
+                )
+                or section
+            )
+
+        try:
+            while True:
+                while not exhausted and len(slices) <= lookahead:
+                    task = asyncio.ensure_future(
+                        self.get_homepage_movies(
+                            offset, limit, h_limit, type_id
+                        )
+                    )
+                    slices.append((offset, task))
+                    offset += limit
+
+                if not slices:
+                    return
+
+                slice_offset, task = slices.popleft()
+                sections = await task
+
+                if len(sections) < limit:
+                    # following slices are out of range
+                    exhausted = True
+
+                    for _, task in slices:
+                        task.cancel()
+
+                    slices.clear()
+
+                items = []
+
+                for position, section in enumerate(sections, slice_offset):
+                    section_h_limit = h_limits.get(section.type, h_limit)
+
+                    if section_h_limit != h_limit:
+                        section = asyncio.ensure_future(
+                            refetch(section, position, section_h_limit)
+                        )
+
+                    items.append(section)
+
+                for item in items:
+                    if isinstance(item, asyncio.Future):
+                        item = await item
+
+                    yield item
+        finally:
+            for _, task in slices:
+                task.cancel()
+
+    async def get_filter_data(self) -> SearchFilters:
+        if self._filter_data is not None:
+            return self._filter_data
+
+        response = await self.get(Apis.search_api.filter_data)
+
+        response.raise_for_status()
+        response_json = response.json()
+        APIStatusError.raise_for_status(response_json)
+
+        self._filter_data = SearchFilters.from_data(response_json)
+        return self._filter_data
+
+    async def search(
+        self,
+        text: str = "",
+        order: str = "desc",
+        page: int = 1,
+        filters: Optional[Dict[str, int]] = None,
+        sort: Optional[str] = None,
+    ) -> BeletSearchResult:
+        data = {"text": text, "order": order, "page": page}
+
+        if filters:
+            data |= filters
+
+        if sort:
+            data["sort"] = sort
+
+        response = await self.post(Apis.search_api.search, data=data)
+
+        response.raise_for_status()
+        response_json = response.json()
+        APIStatusError.raise_for_status(response_json)
+
+        return BeletSearchResult.from_data(self, response_json)
+
+    async def iter_search(
+        self,
+        text: str = "",
+        filters: Optional[Dict[str, int]] = None,
+        sort: Optional[str] = None,
+        order: str = "desc",
+        start_page: int = 1,
+        lookahead: int = 1,
+    ) -> AsyncIterator[BeletMovieFragment]:
+        """Iterate over search results of all pages
+
+        See `BeletClient.iter_search`
+        """
+
+        pending = deque()
+        page = start_page
+
+        try:
+            while True:
+                while len(pending) <= lookahead:
+                    pending.append(
+                        asyncio.ensure_future(
+                            self.search(text, order, page, filters, sort)
+                        )
+                    )
+                    page += 1
+
+                result = await pending.popleft()
+
+                if not result.movies:
+                    return
+
+                for movie in result.movies:
+                    yield movie
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def set_last_watch_time(
+        self, movie_id: int, season_id: int = 0, watch_time: float = 0
+    ) -> bool:
+        m = MultipartEncoder(
+            {
+                "movie_id": str(movie_id),
+                "season_id": str(season_id),
+                "watch_time": str(watch_time),
+                "play_time": str(0),
+            },
+            boundary="WebKitFormBoundaryMOUcf4f5UGAefHV3",
+        )
+
+        response = await self.post(
+            Apis.film_api.last_watch_time,
+            data=m.to_string(),
+            headers={"Content-Type": m.content_type},
+        )
+
+        response.raise_for_status()
+        response_json = response.json()
+        APIStatusError.raise_for_status(response_json)
+
+        return response_json["status"] == "ok"
+
+    async def _prefetch_movie(self, movie: BeletMovie | BeletSeries) -> None:
+        if isinstance(movie, BeletSeries):
+            await movie.fetch_seasons()
+        else:
+            await movie.fetch_files()
+
+    def _load_data(self) -> None:
+        data = load_data_file(self._data_file)
+
+        if data is None:
+            return
+
+        self.token, cookies = data
+        self._set_requests_cookies(cookies)
+
+    def _save_data(self) -> None:
+        save_data_file(
+            self._data_file, self.token, self._get_requests_cookies()
+        )
+
+    def _clear_data(self) -> None:
+        if os.path.isfile(self._data_file):
+            os.remove(self._data_file)
+
+        self.token = None
+        self._pending_cookies = []
+
+        if self._cookies is not None:
+            self._cookies.clear()
+
+    async def _refresh_token(self) -> None:
+        await super()._refresh_token()
+        self._save_data()
+
+    def _set_fingerprint_cookie(self) -> None:
+        self._set_requests_cookies(
+            [
+                requests.cookies.create_cookie(
+                    "fingerprint",
+                    generate_fingerprint(),
+                    domain="api.belet.tm",
+                    path="/api",
+                    secure=True,
+                    expires=time.time() + 5184000,
+                )
+            ]
+        )
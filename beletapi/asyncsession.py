@@ -0,0 +1,327 @@
+import json
+import time
+import asyncio
+from http.cookies import SimpleCookie
+from typing import Any, Dict, Optional, Tuple
+
+import aiohttp
+import requests
+from yarl import URL
+
+from .api import Apis
+from .exceptions import *
+from .utils import decode_token
+
+
+class AsyncResponse:
+    """Fully read response of `AsyncBeletSession`
+
+    Mimics the parts of `requests.Response` that are used by the
+    models, so they can parse responses of both sessions.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        status_code: int,
+        reason: Optional[str],
+        headers: Dict[str, str],
+        content: bytes,
+        encoding: Optional[str] = None,
+    ) -> None:
+        self.url = url
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = headers
+        self.content = content
+        self.encoding = encoding or "utf-8"
+
+    def __repr__(self) -> str:
+        return f"<AsyncResponse [{self.status_code}]>"
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding, "replace")
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+    def raise_for_status(self) -> None:
+        """Raises `requests.HTTPError`, same as `BeletSession` responses"""
+
+        if 400 <= self.status_code < 600:
+            raise requests.HTTPError(
+                f"{self.status_code} Error: {self.reason} for url: {self.url}",
+                response=self,
+            )
+
+
+class AsyncBeletSession:
+    """Asyncio counterpart of `BeletSession`
+
+    Wraps `aiohttp.ClientSession`, the underlying session is created
+    lazily inside the running event loop. `limit` is the maximum
+    number of simultaneously open connections, raise it to keep
+    thousands of requests in flight.
+    """
+
+    """Session token"""
+    _token: Optional[str]
+
+    def __init__(
+        self,
+        limit: int = 100,
+        limit_per_host: int = 0,
+        timeout: Optional[float] = 30,
+    ) -> None:
+        self.headers: Dict[str, str] = {}
+
+        self._limit = limit
+        self._limit_per_host = limit_per_host
+        self._timeout = timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._refresh_lock: Optional[asyncio.Lock] = None
+        self._token = None
+        self._token_expiration: Optional[Tuple[str, int]] = None
+
+        # cookie jar needs a running loop, so it's created on first use
+        self._cookies: Optional[aiohttp.CookieJar] = None
+        self._pending_cookies = []
+
+    async def __aenter__(self) -> "AsyncBeletSession":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.close()
+
+    @property
+    def cookies(self) -> aiohttp.CookieJar:
+        if self._cookies is None:
+            self._cookies = aiohttp.CookieJar()
+            self._set_requests_cookies(self._pending_cookies)
+            self._pending_cookies = []
+
+        return self._cookies
+
+    @property
+    def token(self) -> str:
+        return self._token
+
+    @token.setter
+    def token(self, token) -> None:
+        self._token = token
+
+    def get_token_expiration_date(self) -> int:
+        """Get timestamp of token expiration time
+
+        Returns:
+            int: expiry time
+
+        Raises:
+            InvalidTokenError: raised if token is `None`
+        """
+
+        token = self._token
+        cached = self._token_expiration
+
+        if cached is None or cached[0] is not token:
+            cached = (token, decode_token(token)["exp"])
+            self._token_expiration = cached
+
+        return cached[1]
+
+    def is_token_expired(self) -> bool:
+        """Check if token is expired
+
+        Returns:
+            bool: `True` if token is expired, otherwise `False`
+        """
+
+        if not self._token:
+            return True
+
+        return time.time() > self.get_token_expiration_date()
+
+    async def refresh_if_expired(self) -> bool:
+        """Refreshes token if it is expired
+
+        Returns:
+            bool: `True` if token was refreshed, otherwise `False`
+        """
+
+        if self.is_token_expired():
+            await self._refresh_token_once(self._token)
+            return True
+
+        return False
+
+    async def get(self, url: str, **kwargs) -> AsyncResponse:
+        """Make GET request
+
+        Make GET request to `url` with token appended.
+        Automatically refreshes token if expired.
+
+        Args:
+            All args of `aiohttp.ClientSession.request`.
+            refresh (bool): Whether token should be automatically
+                            refreshed or not (default: `True`)
+
+        Returns:
+            AsyncResponse: fully read response
+        """
+
+        return await self._request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> AsyncResponse:
+        """Make POST request
+
+        Make POST request to `url` with token appended.
+        Automatically refreshes token if expired.
+
+        Args:
+            All args of `aiohttp.ClientSession.request`.
+            refresh (bool): Whether token should be automatically
+                            refreshed or not (default: `True`)
+
+        Returns:
+            AsyncResponse: fully read response
+        """
+
+        return await self._request("POST", url, **kwargs)
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self._limit,
+                    limit_per_host=self._limit_per_host,
+                ),
+                cookie_jar=self.cookies,
+                timeout=aiohttp.ClientTimeout(total=self._timeout),
+            )
+
+        return self._session
+
+    async def _send(
+        self,
+        method: str,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        **kwargs,
+    ) -> AsyncResponse:
+        headers = {**self.headers, **(headers or {})}
+
+        async with self._get_session().request(
+            method, url, headers=headers, **kwargs
+        ) as response:
+            content = await response.read()
+
+            return AsyncResponse(
+                str(response.url),
+                response.status,
+                response.reason,
+                dict(response.headers),
+                content,
+                response.get_encoding() if content else None,
+            )
+
+    async def _request(
+        self,
+        method: str,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        refresh: bool = True,
+        **kwargs,
+    ) -> AsyncResponse:
+        token = self._token
+        request_headers = dict(headers or {})
+
+        if token:
+            request_headers.setdefault("Authorization", token)
+
+        response = await self._send(
+            method, url, headers=request_headers, **kwargs
+        )
+
+        if response.status_code == 401:
+            if refresh:
+                await self._refresh_token_once(token)
+                return await self._request(
+                    method, url, headers=headers, refresh=False, **kwargs
+                )
+            else:
+                response.raise_for_status()
+
+        return response
+
+    async def _refresh_token_once(self, stale_token: Optional[str]) -> None:
+        # every request that got 401 with the same token waits for
+        # a single refresh instead of refreshing by itself
+        if self._refresh_lock is None:
+            self._refresh_lock = asyncio.Lock()
+
+        async with self._refresh_lock:
+            if self._token != stale_token:
+                return
+
+            await self._refresh_token()
+
+    async def _refresh_token(self) -> None:
+        response = await self._send("POST", Apis.main_api.refresh)
+
+        if response.status_code == 401:
+            raise UnauthorizedError(response.text)
+
+        response.raise_for_status()
+
+        self.token = response.json()["token"]
+
+    def _set_requests_cookies(self, cookies) -> None:
+        """Import cookies of a `requests` cookie jar"""
+
+        if self._cookies is None:
+            self._pending_cookies.extend(cookies)
+            return
+
+        for cookie in cookies:
+            morsel = SimpleCookie()
+            morsel[cookie.name] = cookie.value
+            morsel[cookie.name]["domain"] = cookie.domain
+            morsel[cookie.name]["path"] = cookie.path
+
+            if cookie.secure:
+                morsel[cookie.name]["secure"] = True
+
+            self.cookies.update_cookies(
+                morsel, URL("https://" + cookie.domain.lstrip("."))
+            )
+
+    def _get_requests_cookies(self) -> requests.cookies.RequestsCookieJar:
+        """Export cookies as a `requests` cookie jar"""
+
+        jar = requests.cookies.RequestsCookieJar()
+
+        for cookie in self._pending_cookies:
+            jar.set_cookie(cookie)
+
+        for morsel in self._cookies or []:
+            jar.set_cookie(
+                requests.cookies.create_cookie(
+                    morsel.key,
+                    morsel.value,
+                    domain=morsel["domain"],
+                    path=morsel["path"] or "/",
+                    secure=bool(morsel["secure"]),
+                )
+            )
+
+        return jar
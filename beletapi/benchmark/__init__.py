@@ -0,0 +1,20 @@
+from .server import MockBeletServer, MockServerConfig
+from .suite import (
+    BENCHMARKS,
+    BenchmarkResult,
+    BenchmarkSkipped,
+    format_results,
+    run_benchmark,
+    run_benchmarks,
+)
+
+__all__ = [
+    "MockBeletServer",
+    "MockServerConfig",
+    "BENCHMARKS",
+    "BenchmarkResult",
+    "BenchmarkSkipped",
+    "format_results",
+    "run_benchmark",
+    "run_benchmarks",
+]
@@ -0,0 +1,70 @@
+import os
+import argparse
+
+from .server import MockServerConfig
+from .suite import BENCHMARKS, format_results, run_benchmark
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m beletapi.benchmark",
+        description="Benchmark BeletClient against a local mock server",
+    )
+    parser.add_argument(
+        "benchmarks",
+        nargs="*",
+        help="benchmarks to run: {} (default: all)".format(
+            ", ".join(BENCHMARKS)
+        ),
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="seconds per response"
+    )
+    parser.add_argument(
+        "--jitter", type=float, default=0.0, help="random extra latency"
+    )
+    parser.add_argument(
+        "--bandwidth", type=float, default=None, help="bytes per second"
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="failure probability"
+    )
+    parser.add_argument("--movies", type=int, default=1000)
+    parser.add_argument("--segments", type=int, default=60)
+    parser.add_argument("--segment-size", type=int, default=256 * 1024)
+    parser.add_argument(
+        "--workers", type=int, default=8, help="segment download workers"
+    )
+    parser.add_argument(
+        "--in-process",
+        action="store_true",
+        help="run the server in a thread instead of a child process",
+    )
+    args = parser.parse_args()
+
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark -> {name}")
+
+    config = MockServerConfig(
+        latency=args.latency,
+        jitter=args.jitter,
+        bandwidth=args.bandwidth,
+        error_rate=args.error_rate,
+        movies=args.movies,
+        segments=args.segments,
+        segment_size=args.segment_size,
+    )
+
+    process = not args.in_process and hasattr(os, "fork")
+    results = []
+
+    for name in args.benchmarks or BENCHMARKS:
+        print(f"running {name}...", flush=True)
+        results.append(run_benchmark(name, config, args.workers, process))
+
+    print(format_results(results))
+
+
+if __name__ == "__main__":
+    main()
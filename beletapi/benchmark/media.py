@@ -0,0 +1,298 @@
+import random
+import struct
+from typing import Iterator, List
+
+# video and audio PIDs of the generated program
+PMT_PID = 0x1000
+VIDEO_PID = 0x100
+AUDIO_PID = 0x101
+
+AUDIO_RATE = 48000
+AUDIO_RATE_INDEX = 3
+
+_NONZERO = bytes([1]) + bytes(range(1, 256))
+
+
+def _crc32_mpeg(data: bytes) -> int:
+    crc = 0xFFFFFFFF
+
+    for byte in data:
+        crc ^= byte << 24
+
+        for _ in range(8):
+            crc = (crc << 1) ^ 0x04C11DB7 if crc & 0x80000000 else crc << 1
+            crc &= 0xFFFFFFFF
+
+    return crc
+
+
+class _BitWriter:
+    def __init__(self) -> None:
+        self.value = 0
+        self.length = 0
+
+    def bits(self, count: int, value: int) -> None:
+        self.value = self.value << count | value
+        self.length += count
+
+    def ue(self, value: int) -> None:
+        value += 1
+        self.bits(value.bit_length() * 2 - 1, value)
+
+    def se(self, value: int) -> None:
+        self.ue(value * 2 - 1 if value > 0 else -value * 2)
+
+    def rbsp(self) -> bytes:
+        # stop bit and alignment
+        self.bits(1, 1)
+        self.bits(-self.length % 8, 0)
+        return self.value.to_bytes(self.length // 8, "big")
+
+
+def _escape(rbsp: bytes) -> bytes:
+    out = bytearray()
+    zeros = 0
+
+    for byte in rbsp:
+        if zeros >= 2 and byte <= 3:
+            out.append(3)
+            zeros = 0
+
+        out.append(byte)
+        zeros = zeros + 1 if byte == 0 else 0
+
+    return bytes(out)
+
+
+def h264_parameter_sets(width: int, height: int) -> List[bytes]:
+    """Constrained baseline SPS and PPS NAL units of a `width`x`height`
+    stream (even dimensions)"""
+
+    width_mbs = -(-width // 16)
+    height_mbs = -(-height // 16)
+
+    sps = _BitWriter()
+    sps.bits(8, 66)  # profile_idc
+    sps.bits(8, 0xC0)  # constraint_set0/1
+    sps.bits(8, 30)  # level_idc
+    sps.ue(0)  # seq_parameter_set_id
+    sps.ue(0)  # log2_max_frame_num_minus4
+    sps.ue(2)  # pic_order_cnt_type
+    sps.ue(1)  # max_num_ref_frames
+    sps.bits(1, 0)  # gaps_in_frame_num_value_allowed_flag
+    sps.ue(width_mbs - 1)
+    sps.ue(height_mbs - 1)
+    sps.bits(1, 1)  # frame_mbs_only_flag
+    sps.bits(1, 1)  # direct_8x8_inference_flag
+
+    # cropping in 2 pixel units of 4:2:0
+    crop_right = (width_mbs * 16 - width) // 2
+    crop_bottom = (height_mbs * 16 - height) // 2
+    sps.bits(1, bool(crop_right or crop_bottom))  # frame_cropping_flag
+
+    if crop_right or crop_bottom:
+        for offset in (0, crop_right, 0, crop_bottom):
+            sps.ue(offset)
+
+    sps.bits(1, 0)  # vui_parameters_present_flag
+
+    pps = _BitWriter()
+    pps.ue(0)  # pic_parameter_set_id
+    pps.ue(0)  # seq_parameter_set_id
+    pps.bits(2, 0)  # entropy_coding_mode, bottom_field_pic_order
+    pps.ue(0)  # num_slice_groups_minus1
+    pps.ue(0)  # num_ref_idx_l0_default_active_minus1
+    pps.ue(0)  # num_ref_idx_l1_default_active_minus1
+    pps.bits(3, 0)  # weighted_pred_flag, weighted_bipred_idc
+    pps.se(0)  # pic_init_qp_minus26
+    pps.se(0)  # pic_init_qs_minus26
+    pps.se(0)  # chroma_qp_index_offset
+    pps.bits(3, 0b100)  # deblocking, constrained_intra, redundant_pic
+
+    return [b"\x67" + _escape(sps.rbsp()), b"\x68" + _escape(pps.rbsp())]
+
+
+class _TsWriter:
+    def __init__(self) -> None:
+        self._counters = {}
+
+    def _header(self, pid: int, start: bool, adaptation: bool) -> bytes:
+        counter = self._counters.get(pid, 0)
+        self._counters[pid] = (counter + 1) & 0x0F
+
+        return struct.pack(
+            ">BHB",
+            0x47,
+            (0x4000 if start else 0) | pid,
+            (0x30 if adaptation else 0x10) | counter,
+        )
+
+    def section(self, pid: int, table: bytes) -> bytes:
+        table += struct.pack(">I", _crc32_mpeg(table))
+        payload = b"\x00" + table
+        return self._header(pid, True, False) + payload.ljust(184, b"\xff")
+
+    def pes(
+        self, pid: int, stream_id: int, pts: int, dts: int, data: bytes
+    ) -> bytes:
+        if pts != dts:
+            header = b"\xc0\x0a" + _timestamp(3, pts) + _timestamp(1, dts)
+        else:
+            header = b"\x80\x05" + _timestamp(2, pts)
+
+        length = 1 + len(header) + len(data)
+        pes = (
+            b"\x00\x00\x01"
+            + bytes((stream_id,))
+            # unbounded length is allowed for video only
+            + struct.pack(">H", length if length < 0x10000 else 0)
+            + b"\x80"
+            + header
+            + data
+        )
+
+        packets = []
+        offset = 0
+
+        while offset < len(pes):
+            start = offset == 0
+            adaptation = b""
+
+            if start and pid == VIDEO_PID:
+                # PCR with the DTS
+                pcr = dts - 9000
+                adaptation = b"\x10" + struct.pack(
+                    ">IH", pcr >> 1 & 0xFFFFFFFF, (pcr & 1) << 15 | 0x7E00
+                )
+
+            room = 184 - (len(adaptation) + 1 if adaptation else 0)
+            chunk = pes[offset : offset + room]
+
+            if adaptation or len(chunk) < 184:
+                stuffing = 183 - len(adaptation) - len(chunk)
+
+                if not adaptation and stuffing == 0:
+                    field = b"\x00"
+                elif not adaptation:
+                    field = (
+                        bytes((stuffing, 0x00)) + b"\xff" * (stuffing - 1)
+                    )
+                else:
+                    field = bytes((stuffing + len(adaptation),)) + (
+                        adaptation + b"\xff" * stuffing
+                    )
+
+                packets.append(self._header(pid, start, True) + field + chunk)
+            else:
+                packets.append(self._header(pid, start, False) + chunk)
+
+            offset += len(chunk)
+
+        return b"".join(packets)
+
+
+def _timestamp(prefix: int, value: int) -> bytes:
+    value &= (1 << 33) - 1
+    return struct.pack(
+        ">BHH",
+        prefix << 4 | (value >> 29 & 0x0E) | 1,
+        (value >> 14 & 0xFFFE) | 1,
+        (value << 1 & 0xFFFE) | 1,
+    )
+
+
+def synthetic_ts(
+    seconds: float,
+    bitrate: int = 2_000_000,
+    width: int = 640,
+    height: int = 360,
+    fps: int = 25,
+    gop: int = 50,
+    seed: int = 0,
+) -> Iterator[bytes]:
+    """Generate a MPEG-TS stream with H.264 video and AAC audio
+
+    Slices and AAC frames carry random data, the stream is only valid
+    on the container level: it can be remuxed but not decoded. Video
+    frames are presented two frames after decoding, like a stream with
+    B-frames.
+
+    Args:
+        seconds (float): stream duration
+        bitrate (int): total bits per second
+        width (int): video width (even)
+        height (int): video height (even)
+        fps (int): frames per second
+        gop (int): frames per keyframe interval
+        seed (int): random seed
+
+    Yields:
+        bytes: TS packets of one video frame and the audio before it
+    """
+
+    rng = random.Random(seed)
+    writer = _TsWriter()
+    sps, pps = h264_parameter_sets(width, height)
+
+    pat = struct.pack(
+        ">BHHBBBHH", 0x00, 0xB00D, 1, 0xC1, 0, 0, 1, 0xE000 | PMT_PID
+    )
+    pmt = struct.pack(
+        ">BHHBBBHHBHHBHH",
+        0x02, 0xB017, 1, 0xC1, 0, 0, 0xE000 | VIDEO_PID, 0xF000,
+        0x1B, 0xE000 | VIDEO_PID, 0xF000,
+        0x0F, 0xE000 | AUDIO_PID, 0xF000,
+    )
+
+    audio_bytes = 128000 // 8 * 1024 // AUDIO_RATE
+    frame_bytes = max(int(bitrate - 128000) // 8 // fps, 16)
+    frame_ticks = 90000 // fps
+    audio_ticks = 1024 * 90000 / AUDIO_RATE
+    audio_frames = 0
+
+    def payload(size: int) -> bytes:
+        return rng.randbytes(size).translate(_NONZERO)
+
+    for frame in range(int(seconds * fps)):
+        chunk = []
+        dts = 90000 + frame * frame_ticks
+        keyframe = frame % gop == 0
+
+        if keyframe:
+            chunk.append(writer.section(0, pat))
+            chunk.append(writer.section(PMT_PID, pmt))
+
+        # audio up to the video frame, 4 frames per PES
+        while audio_frames * audio_ticks < (frame + 1) * frame_ticks:
+            data = b""
+
+            for _ in range(4):
+                size = 7 + audio_bytes
+                header = struct.pack(
+                    ">BBBBBBB",
+                    0xFF,
+                    0xF1,
+                    0x40 | AUDIO_RATE_INDEX << 2,
+                    0x80 | size >> 11,
+                    size >> 3 & 0xFF,
+                    (size & 0x07) << 5 | 0x1F,
+                    0xFC,
+                )
+                data += header + payload(audio_bytes)
+
+            pts = 90000 + int(audio_frames * audio_ticks)
+            chunk.append(writer.pes(AUDIO_PID, 0xC0, pts, pts, data))
+            audio_frames += 4
+
+        nals = [b"\x09\xf0"]
+
+        if keyframe:
+            nals += [sps, pps, b"\x65" + payload(frame_bytes * 4)]
+        else:
+            nals.append(b"\x41" + payload(frame_bytes))
+
+        data = b"".join(b"\x00\x00\x00\x01" + nal for nal in nals)
+        pts = dts + 2 * frame_ticks
+        chunk.append(writer.pes(VIDEO_PID, 0xE0, pts, dts, data))
+
+        yield b"".join(chunk)
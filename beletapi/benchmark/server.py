@@ -0,0 +1,671 @@
+import json
+import time
+import base64
+import random
+import hashlib
+import threading
+import multiprocessing
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+from beletapi.api import Apis
+from beletapi.adapters import BeletHTTPAdapter
+from beletapi.enums import BeletCategory, BeletHomepageSectionType
+from beletapi.session import BeletSession
+
+
+class MockServerConfig(NamedTuple):
+    """Behaviour of `MockBeletServer`
+
+    Attributes:
+        latency: seconds every response is delayed by
+        jitter: random extra delay in seconds, uniform in `[0, jitter]`
+        bandwidth: bytes per second a response body is sent with
+            (`None` - unlimited)
+        error_rate: probability of a request failing with
+            `error_status`
+        error_status: status code of injected errors
+        token_ttl: lifetime of issued tokens in seconds
+        movies: number of movies, ids are `1..movies`
+        series_every: every n-th movie is a series
+        seasons: seasons per series
+        episodes: episodes per season
+        homepage_sections: number of homepage sections
+        search_pages: number of non-empty search pages
+        page_size: movies per search page
+        segments: segments per media playlist
+        segment_duration: seconds per segment
+        segment_size: bytes per segment of the best quality
+        seed: seed of the error injection and jitter
+    """
+
+    latency: float = 0.0
+    jitter: float = 0.0
+    bandwidth: Optional[float] = None
+    error_rate: float = 0.0
+    error_status: int = 503
+    token_ttl: float = 3600
+    movies: int = 1000
+    series_every: int = 5
+    seasons: int = 3
+    episodes: int = 10
+    homepage_sections: int = 20
+    search_pages: int = 10
+    page_size: int = 20
+    segments: int = 60
+    segment_duration: float = 4.0
+    segment_size: int = 256 * 1024
+    seed: int = 0
+
+
+# (quality, relative bitrate, resolution) of the variants in master
+# playlists, BANDWIDTH is derived from the actual segment size
+QUALITIES = (
+    ("1080p", 5_000_000, "1920x1080"),
+    ("720p", 2_800_000, "1280x720"),
+    ("480p", 1_400_000, "854x480"),
+)
+
+_TS_PACKET_SIZE = 188
+
+_CHUNK_SIZE = 16 * 1024
+
+
+class MockBeletServer:
+    """Local stand-in for the Belet apis and HLS CDN
+
+    Serves `MainApi`, `HomepageApi`, `FilmApi` and `SearchApi`
+    endpoints with generated data, and HLS master/media playlists with
+    synthetic MPEG-TS segments (null packets, not decodable video).
+    Responses can be delayed, throttled and failed randomly, see
+    `MockServerConfig`.
+
+    Api requests of a session are routed to the server by `install`,
+    so `BeletClient` works unchanged:
+
+        with MockBeletServer(MockServerConfig(latency=0.02)) as server:
+            client = BeletClient(data_file=...)
+            server.install(client)
+            client.token = server.issue_token()
+            client.get_movie(1)
+
+    Args:
+        config (MockServerConfig): server behaviour
+        host (str): address to listen on
+        port (int): port to listen on, `0` picks a free one
+    """
+
+    def __init__(
+        self,
+        config: MockServerConfig = MockServerConfig(),
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        self.config = config
+        self.request_count = 0
+        self.error_count = 0
+
+        self._random = random.Random(config.seed)
+        self._lock = threading.Lock()
+        self._segments: Dict[str, bytes] = {}
+        self._httpd = _HTTPServer((host, port), _Handler)
+        self._httpd.mock = self
+        self._thread: Optional[threading.Thread] = None
+        self._process: Optional[multiprocessing.Process] = None
+
+    def __enter__(self) -> "MockBeletServer":
+        self.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self, process: bool = False) -> None:
+        """Start serving in background
+
+        Args:
+            process (bool): serve from a forked child process instead
+                of a thread, so the server doesn't compete with the
+                client for the GIL. `request_count` and `error_count`
+                aren't updated then. Needs `os.fork`.
+        """
+
+        if self._thread is not None or self._process is not None:
+            return
+
+        if process:
+            self._process = multiprocessing.get_context("fork").Process(
+                target=self._httpd.serve_forever,
+                name="beletapi-mock-server",
+                daemon=True,
+            )
+            self._process.start()
+            return
+
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever,
+            name="beletapi-mock-server",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+            self._process = None
+        elif self._thread is not None:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        else:
+            return
+
+        self._httpd.server_close()
+
+    def install(self, session: BeletSession) -> None:
+        """Route api requests of `session` to this server
+
+        Adapters of `session` for the api hosts are replaced by ones
+        that keep their `HostConfig` but send to this server.
+        """
+
+        for api in (
+            Apis.main_api,
+            Apis.homepage_api,
+            Apis.film_api,
+            Apis.search_api,
+        ):
+            prefix = api.host + "/"
+            adapter = session.get_adapter(prefix)
+            config = getattr(adapter, "host_config", None)
+
+            if config is None:
+                session.mount(prefix, _RedirectAdapter(self.url))
+            else:
+                session.mount(prefix, _RedirectAdapter(self.url, config))
+
+    def issue_token(self, ttl: Optional[float] = None) -> str:
+        """Create a token accepted by this server
+
+        Args:
+            ttl (float): lifetime in seconds, negative for an already
+                expired token (default: `config.token_ttl`)
+        """
+
+        if ttl is None:
+            ttl = self.config.token_ttl
+
+        now = time.time()
+        claims = {"sub": "mock", "iat": int(now), "exp": int(now + ttl)}
+        payload = base64.urlsafe_b64encode(json.dumps(claims).encode())
+
+        return "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9.{}.mock".format(
+            payload.decode().rstrip("=")
+        )
+
+    def master_playlist_url(self, movie_id: int) -> str:
+        return f"{self.url}/hls/{movie_id}/master.m3u8"
+
+    def _roll_error(self) -> bool:
+        with self._lock:
+            self.request_count += 1
+
+            if self._random.random() >= self.config.error_rate:
+                return False
+
+            self.error_count += 1
+            return True
+
+    def _delay(self) -> float:
+        with self._lock:
+            jitter = self._random.uniform(0, self.config.jitter)
+
+        return self.config.latency + jitter
+
+    def _segment(self, quality: str) -> bytes:
+        with self._lock:
+            data = self._segments.get(quality)
+
+            if data is None:
+                data = self._segments[quality] = _null_packets(
+                    self._segment_size(quality)
+                )
+
+            return data
+
+    def _segment_size(self, quality: str) -> int:
+        best = QUALITIES[0][1]
+
+        for name, bandwidth, _ in QUALITIES:
+            if name == quality:
+                size = self.config.segment_size * bandwidth // best
+                return max(size // _TS_PACKET_SIZE, 1) * _TS_PACKET_SIZE
+
+        raise KeyError(quality)
+
+    # data
+
+    def _movie(self, movie_id: int) -> Dict[str, Any]:
+        is_series = movie_id % self.config.series_every == 0
+
+        return {
+            "id": movie_id,
+            "name": f"Movie {movie_id}",
+            "age": 12,
+            "year": 1990 + movie_id % 35,
+            "duration": self.config.segments * self.config.segment_duration,
+            "thumbnails": {},
+            "images": {},
+            "language": "ru",
+            "description": f"Description of movie {movie_id}",
+            "parent_id": None,
+            "like": False,
+            "dislike": False,
+            "favorites": False,
+            "watch_time": None,
+            "type_id": 2 if is_series else 1,
+            "category_id": int(
+                BeletCategory.SERIES if is_series else BeletCategory.MOVIE
+            ),
+            "rating_kp": round(5 + movie_id % 50 / 10, 1),
+            "rating_imdb": round(5 + movie_id % 45 / 10, 1),
+            "for_kids": False,
+            "genres": [{"id": movie_id % 7, "name": f"Genre {movie_id % 7}"}],
+            "countries": [],
+            "actors": [{"id": movie_id, "name": f"Actor {movie_id}"}],
+            "directors": [],
+            "seasons": (
+                [
+                    {"id": movie_id * 100 + season, "name": f"Season {season}"}
+                    for season in range(1, self.config.seasons + 1)
+                ]
+                if is_series
+                else None
+            ),
+        }
+
+    def _sources(self, movie_id: int) -> list:
+        return [
+            {
+                "filename": self.master_playlist_url(movie_id),
+                "type": "hls",
+                "quality": quality,
+            }
+            for quality, _, _ in QUALITIES
+        ]
+
+    def _episodes(self, season_id: int) -> Dict[str, Any]:
+        movie_id = season_id // 100
+
+        return {
+            "status": "ok",
+            "episodes": [
+                {
+                    "duration": (
+                        self.config.segments * self.config.segment_duration
+                    ),
+                    "id": season_id * 1000 + episode,
+                    "last_watch": {},
+                    "name": f"Episode {episode}",
+                    "parent_id": movie_id,
+                    "sources": self._sources(movie_id),
+                    "type_id": 2,
+                    "image": [],
+                }
+                for episode in range(1, self.config.episodes + 1)
+            ],
+        }
+
+    def _homepage(self, query: Dict[str, str]) -> Dict[str, Any]:
+        offset = int(query.get("offset", 0))
+        limit = int(query.get("limit", 3))
+        h_limit = int(query.get("h_limit", 12))
+        end = min(offset + limit, self.config.homepage_sections)
+
+        return {
+            "status": "ok",
+            "result": [
+                {
+                    "id": position + 1,
+                    "title": f"Section {position}",
+                    "title_tk": f"Bolum {position}",
+                    "title_ru": f"Раздел {position}",
+                    "type": str(BeletHomepageSectionType.BY_CATEGORY),
+                    "category_type": "movie",
+                    "category_id": int(BeletCategory.MOVIE),
+                    "sort": "new",
+                    "item_size": h_limit,
+                    "position": position,
+                    "content_type_id": 1,
+                    "movies": [
+                        self._movie(self._movie_id(position * h_limit + i))
+                        for i in range(h_limit)
+                    ],
+                    "promotions": [],
+                }
+                for position in range(offset, end)
+            ],
+        }
+
+    def _search(self, form: Dict[str, str]) -> Dict[str, Any]:
+        page = int(form.get("page", 1))
+        size = self.config.page_size
+
+        if not 1 <= page <= self.config.search_pages:
+            return {"status": "ok", "films": []}
+
+        return {
+            "status": "ok",
+            "films": [
+                self._movie(self._movie_id((page - 1) * size + i))
+                for i in range(size)
+            ],
+        }
+
+    def _filter_data(self) -> Dict[str, Any]:
+        return {
+            "status": "ok",
+            "data": [
+                {
+                    "name": "Genres",
+                    "query_name": "genres",
+                    "data": [
+                        {"id": genre, "name": f"Genre {genre}"}
+                        for genre in range(7)
+                    ],
+                },
+            ],
+            "data_sort": {
+                "name": "Sort",
+                "name_param": "sort",
+                "data": [
+                    {"id": "new", "name": "New"},
+                    {"id": "rating", "name": "Rating"},
+                ],
+            },
+        }
+
+    def _movie_id(self, index: int) -> int:
+        return index % self.config.movies + 1
+
+    def _master_playlist(self) -> str:
+        lines = ["#EXTM3U", "#EXT-X-VERSION:3"]
+
+        for quality, _, resolution in QUALITIES:
+            bandwidth = int(
+                self._segment_size(quality) * 8 / self.config.segment_duration
+            )
+            lines.append(
+                f"#EXT-X-STREAM-INF:BANDWIDTH={bandwidth},"
+                f"RESOLUTION={resolution}"
+            )
+            lines.append(f"{quality}/media.m3u8")
+
+        return "\n".join(lines) + "\n"
+
+    def _media_playlist(self) -> str:
+        duration = self.config.segment_duration
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:3",
+            f"#EXT-X-TARGETDURATION:{int(duration + 0.999)}",
+            "#EXT-X-MEDIA-SEQUENCE:0",
+            "#EXT-X-PLAYLIST-TYPE:VOD",
+        ]
+
+        for index in range(self.config.segments):
+            lines.append(f"#EXTINF:{duration:.3f},")
+            lines.append(f"seg{index}.ts")
+
+        lines.append("#EXT-X-ENDLIST")
+        return "\n".join(lines) + "\n"
+
+    def route(
+        self, method: str, path: str, query: Dict[str, str], body: bytes
+    ) -> Tuple[int, str, bytes | Dict[str, Any]]:
+        """Build a response as `(status, content_type, body)`
+
+        Api paths are prefixed with the api host, e.g.
+        `/film.beletapis.com/api/v2/movie/1`, dict bodies are sent
+        as json.
+        """
+
+        parts = path.strip("/").split("/")
+
+        if parts[0] == "hls":
+            return self._route_hls(parts[1:])
+
+        endpoint = Apis.resolve_endpoint("https://" + path.lstrip("/"))
+
+        if endpoint is None:
+            return 404, "text/plain", b"not found"
+
+        if endpoint == "main_api.refresh":
+            return 200, "application/json", {"token": self.issue_token()}
+
+        if endpoint == "main_api.sign_in":
+            return 200, "application/json", {"token": "mock-sign-in"}
+
+        if endpoint in ("main_api.check_code", "main_api.log_out"):
+            return 200, "application/json", {"status": "ok"}
+
+        if endpoint == "homepage_api.home_page":
+            return 200, "application/json", self._homepage(query)
+
+        if endpoint == "search_api.search":
+            form = {
+                key: values[0]
+                for key, values in parse_qs(body.decode()).items()
+            }
+            return 200, "application/json", self._search(form)
+
+        if endpoint == "search_api.filter_data":
+            return 200, "application/json", self._filter_data()
+
+        if endpoint == "film_api.last_watch_time":
+            return 200, "application/json", {"status": "ok"}
+
+        if endpoint == "film_api.episodes":
+            season_id = int(query.get("seasonId", 0))
+            return 200, "application/json", self._episodes(season_id)
+
+        movie_id = int(parts[-1]) if parts[-1].isdigit() else 0
+
+        if not 1 <= movie_id <= self.config.movies:
+            return (
+                200,
+                "application/json",
+                {"status": "error", "message": "film not found"},
+            )
+
+        if endpoint == "film_api.movie":
+            return (
+                200,
+                "application/json",
+                {"status": "ok", "film": self._movie(movie_id)},
+            )
+
+        # film_api.files
+        return (
+            200,
+            "application/json",
+            {"status": "ok", "sources": self._sources(movie_id)},
+        )
+
+    def _route_hls(self, parts) -> Tuple[int, str, bytes]:
+        if parts[-1] == "master.m3u8":
+            return (
+                200,
+                "application/vnd.apple.mpegurl",
+                self._master_playlist().encode(),
+            )
+
+        if len(parts) != 3 or parts[1] not in (q[0] for q in QUALITIES):
+            return 404, "text/plain", b"not found"
+
+        if parts[2] == "media.m3u8":
+            return (
+                200,
+                "application/vnd.apple.mpegurl",
+                self._media_playlist().encode(),
+            )
+
+        name = parts[2]
+
+        if not (name.startswith("seg") and name.endswith(".ts")):
+            return 404, "text/plain", b"not found"
+
+        index = name[3:-3]
+
+        if not index.isdigit() or int(index) >= self.config.segments:
+            return 404, "text/plain", b"not found"
+
+        return 200, "video/mp2t", self._segment(parts[1])
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    # the default backlog of 5 drops connections of concurrent clients
+    request_queue_size = 128
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    # headers and body are written separately
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        self._handle("GET")
+
+    def do_POST(self) -> None:
+        self._handle("POST")
+
+    def _handle(self, method: str) -> None:
+        mock: MockBeletServer = self.server.mock
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+
+        delay = mock._delay()
+
+        if delay > 0:
+            time.sleep(delay)
+
+        if mock._roll_error():
+            self._send(mock.config.error_status, "text/plain", b"injected")
+            return
+
+        if self._token_expired():
+            self._send(401, "application/json", b'{"message": "expired"}')
+            return
+
+        url = urlsplit(self.path)
+        query = {
+            key: values[0] for key, values in parse_qs(url.query).items()
+        }
+        status, content_type, data = mock.route(method, url.path, query, body)
+
+        if isinstance(data, dict):
+            data = json.dumps(data, ensure_ascii=False).encode()
+
+        etag = '"{}"'.format(hashlib.sha1(data).hexdigest())
+
+        if method == "GET" and self.headers.get("If-None-Match") == etag:
+            self._send(304, content_type, b"", etag)
+            return
+
+        self._send(status, content_type, data, etag)
+
+    def _token_expired(self) -> bool:
+        token = self.headers.get("Authorization")
+
+        if not token or token.count(".") != 2:
+            return False
+
+        payload = token.split(".")[1]
+
+        try:
+            claims = json.loads(
+                base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4))
+            )
+        except ValueError:
+            return False
+
+        return claims.get("exp", 0) < time.time()
+
+    def _send(
+        self,
+        status: int,
+        content_type: str,
+        data: bytes,
+        etag: Optional[str] = None,
+    ) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+
+        if etag is not None:
+            self.send_header("ETag", etag)
+
+        self.end_headers()
+
+        bandwidth = self.server.mock.config.bandwidth
+
+        try:
+            if bandwidth is None:
+                self.wfile.write(data)
+                return
+
+            view = memoryview(data)
+
+            for offset in range(0, len(view), _CHUNK_SIZE):
+                chunk = view[offset : offset + _CHUNK_SIZE]
+                self.wfile.write(chunk)
+                time.sleep(len(chunk) / bandwidth)
+        except (BrokenPipeError, ConnectionResetError):
+            # client gave up (e.g. cancelled download)
+            pass
+
+
+class _RedirectAdapter(BeletHTTPAdapter):
+    """Sends requests to `MockBeletServer` instead of the real host"""
+
+    def __init__(self, server_url: str, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.server_url = server_url
+
+    def send(self, request, *args, **kwargs) -> requests.Response:
+        url = urlsplit(request.url)
+        redirected = request.copy()
+        redirected.url = f"{self.server_url}/{url.netloc}{url.path}"
+
+        if url.query:
+            redirected.url += "?" + url.query
+
+        response = super().send(redirected, *args, **kwargs)
+
+        # callers see the original request (401 replays, cookies...)
+        response.request = request
+        response.url = request.url
+
+        return response
+
+
+def _null_packets(size: int) -> bytes:
+    """MPEG-TS null packets (PID 0x1FFF) of `size` bytes"""
+
+    packet = b"\x47\x1f\xff\x10" + b"\xff" * (_TS_PACKET_SIZE - 4)
+    return packet * (size // _TS_PACKET_SIZE)
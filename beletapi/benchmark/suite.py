@@ -0,0 +1,374 @@
+import os
+import time
+import shutil
+import tempfile
+import threading
+import subprocess
+from functools import partial
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+
+import requests
+
+from beletapi.client import BeletClient
+from beletapi.downloaders.segmentdownloader import SegmentDownloader
+from beletapi.exceptions import RemuxError
+from beletapi.remux import remux_file
+from .media import synthetic_ts
+from .server import MockBeletServer, MockServerConfig
+
+
+class BenchmarkResult(NamedTuple):
+    """Result of one benchmark
+
+    Latency percentiles are of single HTTP requests (until response
+    headers), throughput is in `unit`s per second of wall time.
+
+    Attributes:
+        name: benchmark name
+        operations: number of `unit`s processed
+        unit: what an operation is (movies, bytes...)
+        seconds: wall time
+        requests: number of HTTP requests sent
+        errors: number of failed operations
+        p50: median request latency in seconds
+        p99: 99th percentile request latency in seconds
+        error: why the benchmark failed or was skipped
+        skipped: the benchmark couldn't run here (e.g. missing ffmpeg)
+    """
+
+    name: str
+    operations: int
+    unit: str
+    seconds: float
+    requests: int
+    errors: int
+    p50: float
+    p99: float
+    error: Optional[str] = None
+    skipped: bool = False
+
+    @property
+    def throughput(self) -> float:
+        return self.operations / self.seconds if self.seconds > 0 else 0.0
+
+
+class BenchmarkSkipped(Exception):
+    """Raised by benchmarks that can't run in this environment"""
+
+
+class _LatencyRecorder:
+    """`requests` response hook collecting request latencies"""
+
+    def __init__(self) -> None:
+        self.latencies: List[float] = []
+        self._lock = threading.Lock()
+
+    def __call__(self, response: requests.Response, *args, **kwargs):
+        with self._lock:
+            self.latencies.append(response.elapsed.total_seconds())
+
+    def percentile(self, percent: float) -> float:
+        with self._lock:
+            latencies = sorted(self.latencies)
+
+        if not latencies:
+            return 0.0
+
+        # nearest rank
+        rank = max(int(len(latencies) * percent / 100 + 0.5), 1)
+        return latencies[min(rank, len(latencies)) - 1]
+
+
+def bench_get_movie(client: BeletClient, server: MockBeletServer) -> tuple:
+    """Sequential `get_movie` calls"""
+
+    count = min(server.config.movies, 200)
+
+    for movie_id in range(1, count + 1):
+        client.get_movie(movie_id)
+
+    return count, "movies", 0
+
+
+def bench_get_movies(client: BeletClient, server: MockBeletServer) -> tuple:
+    """Metadata fan-out: `get_movies` with files and episodes"""
+
+    count = min(server.config.movies, 500)
+    result = client.get_movies(range(1, count + 1), workers=16, prefetch=True)
+
+    return count, "movies", len(result.errors)
+
+
+def bench_iter_search(client: BeletClient, server: MockBeletServer) -> tuple:
+    """Paging through all search results with lookahead"""
+
+    count = sum(1 for _ in client.iter_search("movie", lookahead=2))
+    return count, "movies", 0
+
+
+def bench_iter_homepage(
+    client: BeletClient, server: MockBeletServer
+) -> tuple:
+    """Iterating over all homepage sections"""
+
+    count = sum(1 for _ in client.iter_homepage(lookahead=2))
+    return count, "sections", 0
+
+
+def bench_token_refresh(
+    client: BeletClient, server: MockBeletServer
+) -> tuple:
+    """Concurrent requests with an expired token (single refresh)"""
+
+    client.token = server.issue_token(ttl=-60)
+    count = min(server.config.movies, 100)
+    result = client.get_movies(range(1, count + 1), workers=32)
+
+    return count, "movies", len(result.errors)
+
+
+def bench_download(client: BeletClient, server: MockBeletServer) -> tuple:
+    """Downloading one file with `SegmentDownloader`"""
+
+    file = client.get_movie(1).files[0]
+
+    with tempfile.TemporaryDirectory() as directory:
+        output_filename = os.path.join(directory, "movie.ts")
+        client.download(file, output_filename)
+        size = os.path.getsize(output_filename)
+
+    return size, "bytes", 0
+
+
+def _bench_remux(
+    server: MockBeletServer, remux: Callable[[str, str], None]
+) -> tuple:
+    # mock segments carry no media, a stream of the same duration and
+    # bitrate with H.264 and AAC is generated instead (not timed)
+    config = server.config
+    seconds = config.segments * config.segment_duration
+    bitrate = int(config.segment_size * 8 / config.segment_duration)
+
+    with tempfile.TemporaryDirectory() as directory:
+        input_filename = os.path.join(directory, "movie.ts")
+        output_filename = os.path.join(directory, "movie.mp4")
+
+        with open(input_filename, "wb") as input_file:
+            for chunk in synthetic_ts(seconds, bitrate, seed=config.seed):
+                input_file.write(chunk)
+
+        size = os.path.getsize(input_filename)
+
+        start = time.perf_counter()
+        remux(input_filename, output_filename)
+        seconds = time.perf_counter() - start
+
+    return size, "bytes", 0, seconds
+
+
+def _ffmpeg_remux(input_filename: str, output_filename: str) -> None:
+    proc = subprocess.run(
+        [
+            "ffmpeg", "-y",
+            "-i", input_filename,
+            "-bsf:a", "aac_adtstoasc",
+            "-c", "copy",
+            output_filename,
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+
+    if proc.returncode != 0:
+        raise RemuxError(proc.stderr.decode("utf-8", "replace")[-512:])
+
+
+def bench_remux_python(
+    client: BeletClient, server: MockBeletServer
+) -> tuple:
+    """MPEG-TS to MP4 with the pure Python remuxer"""
+
+    return _bench_remux(server, remux_file)
+
+
+def bench_remux_ffmpeg(
+    client: BeletClient, server: MockBeletServer
+) -> tuple:
+    """MPEG-TS to MP4 with ffmpeg (skipped if it isn't installed)"""
+
+    if shutil.which("ffmpeg") is None:
+        raise BenchmarkSkipped("ffmpeg is not installed")
+
+    return _bench_remux(server, _ffmpeg_remux)
+
+
+BENCHMARKS: Dict[str, Callable[[BeletClient, MockBeletServer], tuple]] = {
+    "get_movie": bench_get_movie,
+    "get_movies": bench_get_movies,
+    "iter_search": bench_iter_search,
+    "iter_homepage": bench_iter_homepage,
+    "token_refresh": bench_token_refresh,
+    "download": bench_download,
+    "remux_python": bench_remux_python,
+    "remux_ffmpeg": bench_remux_ffmpeg,
+}
+
+
+def run_benchmark(
+    name: str,
+    config: MockServerConfig = MockServerConfig(),
+    workers: int = 8,
+    process: bool = hasattr(os, "fork"),
+) -> BenchmarkResult:
+    """Run one benchmark of `BENCHMARKS` against a fresh server
+
+    Every benchmark gets its own server and client, so caches and
+    connection pools of one don't affect another. Failing benchmarks
+    are reported with one error, no operations and the exception in
+    `error`, benchmarks raising `BenchmarkSkipped` as `skipped`.
+    Benchmarks return `(operations, unit, errors)`, optionally followed
+    by the seconds of the measured part if preparing its input
+    shouldn't count.
+
+    Args:
+        name (str): benchmark name
+        config (MockServerConfig): server behaviour
+        workers (int): `SegmentDownloader` workers
+        process (bool): run the server in a child process, otherwise
+            it shares the GIL with the client and skews results of
+            concurrent benchmarks
+
+    Returns:
+        BenchmarkResult: measured result
+    """
+
+    benchmark = BENCHMARKS[name]
+    server = MockBeletServer(config)
+    server.start(process)
+
+    with tempfile.TemporaryDirectory() as directory:
+        client = BeletClient(
+            data_file=os.path.join(directory, "beletapidata.bin"),
+            downloader_cls=partial(SegmentDownloader, workers=workers),
+        )
+        server.install(client)
+        client.token = server.issue_token()
+
+        recorder = _LatencyRecorder()
+        client.hooks["response"].append(recorder)
+
+        start = time.perf_counter()
+        measured = None
+        error = None
+        skipped = False
+
+        try:
+            operations, unit, errors, *measured = benchmark(client, server)
+        except BenchmarkSkipped as e:
+            operations, unit, errors = 0, "operations", 0
+            error, skipped = str(e), True
+        except Exception as e:
+            operations, unit, errors = 0, "operations", 1
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            seconds = time.perf_counter() - start
+            client.close()
+            server.stop()
+
+        if measured:
+            seconds = measured[0]
+
+    return BenchmarkResult(
+        name=name,
+        operations=operations,
+        unit=unit,
+        seconds=seconds,
+        requests=len(recorder.latencies),
+        errors=errors,
+        p50=recorder.percentile(50),
+        p99=recorder.percentile(99),
+        error=error,
+        skipped=skipped,
+    )
+
+
+def run_benchmarks(
+    config: MockServerConfig = MockServerConfig(),
+    names: Optional[Iterable[str]] = None,
+    workers: int = 8,
+    process: bool = hasattr(os, "fork"),
+) -> List[BenchmarkResult]:
+    """Run benchmarks of `BENCHMARKS`
+
+    Args:
+        config (MockServerConfig): server behaviour
+        names (Iterable[str]): benchmarks to run (default: all)
+        workers (int): `SegmentDownloader` workers
+        process (bool): run the server in a child process
+
+    Returns:
+        List[BenchmarkResult]: results in order of `names`
+    """
+
+    return [
+        run_benchmark(name, config, workers, process)
+        for name in (names or BENCHMARKS)
+    ]
+
+
+def format_results(results: Iterable[BenchmarkResult]) -> str:
+    """Format results as a text table, followed by the reasons of
+    failed and skipped benchmarks
+    """
+
+    rows = [
+        (
+            "benchmark", "ops", "seconds", "throughput", "requests",
+            "errors", "p50 ms", "p99 ms",
+        )
+    ]
+
+    notes = []
+
+    for result in results:
+        if result.error is not None:
+            status = "skipped" if result.skipped else "failed"
+            notes.append(f"{result.name} {status} -> {result.error}")
+
+        if result.skipped:
+            rows.append((result.name, "-", "-", "skipped", "-", "-", "-", "-"))
+            continue
+
+        if result.unit == "bytes":
+            throughput = f"{result.throughput / 2**20:.1f} MiB/s"
+        else:
+            throughput = f"{result.throughput:.1f} {result.unit}/s"
+
+        rows.append(
+            (
+                result.name,
+                str(result.operations),
+                f"{result.seconds:.3f}",
+                throughput,
+                str(result.requests),
+                str(result.errors),
+                f"{result.p50 * 1000:.1f}",
+                f"{result.p99 * 1000:.1f}",
+            )
+        )
+
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+
+    lines = [
+        "  ".join(
+            cell.ljust(width) if i == 0 else cell.rjust(width)
+            for i, (cell, width) in enumerate(zip(row, widths))
+        )
+        for row in rows
+    ]
+
+    if notes:
+        lines.append("")
+        lines.extend(notes)
+
+    return "\n".join(lines)
@@ -0,0 +1,207 @@
+import os
+import json
+import time
+import pickle
+import hashlib
+import tempfile
+import threading
+from typing import Any, Dict, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from .utils import decode_token
+
+
+class ResponseCache:
+    """Size bounded on-disk cache of GET responses
+
+    Only endpoints listed in `ttls` (`<api>.<endpoint>` names, see
+    `Apis.resolve_endpoint`) are cached. Stale entries are revalidated
+    with `If-None-Match`/`If-Modified-Since` when the server sent an
+    `ETag`/`Last-Modified`. Entries are keyed by url and user, so
+    per-user fields (`watch_time`, `like`...) are never shared between
+    accounts. Least recently used entries are evicted once the cache
+    grows over `max_size` bytes.
+
+    Pass it to the client to enable it:
+    `BeletClient(cache=ResponseCache("beletapicache"))`
+    """
+
+    DEFAULT_TTLS = {
+        "film_api.movie": 3600,
+        "film_api.files": 3600,
+        "film_api.episodes": 3600,
+        "homepage_api.home_page": 600,
+        "search_api.filter_data": 86400,
+    }
+
+    # token claims that change on every refresh of the same user
+    _volatile_claims = ("exp", "iat", "nbf", "jti")
+
+    def __init__(
+        self,
+        directory: str = "beletapicache",
+        max_size: int = 256 * 1024 * 1024,
+        ttls: Optional[Dict[str, float]] = None,
+    ) -> None:
+        self.directory = directory
+        self.max_size = max_size
+        self.ttls = dict(self.DEFAULT_TTLS if ttls is None else ttls)
+
+        self._lock = threading.Lock()
+        self._sizes: Dict[str, int] = {}
+
+        os.makedirs(directory, exist_ok=True)
+
+        for filename in os.listdir(directory):
+            if filename.endswith(".entry"):
+                path = os.path.join(directory, filename)
+                self._sizes[path] = os.path.getsize(path)
+
+    @property
+    def size(self) -> int:
+        return sum(self._sizes.values())
+
+    def get_ttl(self, endpoint: Optional[str]) -> Optional[float]:
+        return self.ttls.get(endpoint)
+
+    def key(self, url: str, token: Optional[str]) -> str:
+        """Cache key of `url` requested with `token`"""
+
+        return hashlib.sha256(
+            (self._user_key(token) + "\n" + url).encode()
+        ).hexdigest()
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._path(key)
+
+        try:
+            with open(path, "rb") as file:
+                entry = pickle.load(file)
+        except (OSError, pickle.PickleError, EOFError):
+            return None
+
+        # mtime is used as last access time for LRU eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        return entry
+
+    def store(self, key: str, response: requests.Response) -> None:
+        self.save(
+            key,
+            {
+                "url": response.url,
+                "status_code": response.status_code,
+                "headers": dict(response.headers),
+                "content": response.content,
+                "encoding": response.encoding,
+                "stored_at": time.time(),
+            },
+        )
+
+    def save(self, key: str, entry: Dict[str, Any]) -> None:
+        path = self._path(key)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+
+        with os.fdopen(fd, "wb") as file:
+            pickle.dump(entry, file, pickle.HIGHEST_PROTOCOL)
+
+        os.replace(temp_path, path)
+
+        with self._lock:
+            self._sizes[path] = os.path.getsize(path)
+            self._evict()
+
+    def is_fresh(self, entry: Dict[str, Any], ttl: float) -> bool:
+        return time.time() - entry["stored_at"] < ttl
+
+    def revalidation_headers(self, entry: Dict[str, Any]) -> Dict[str, str]:
+        headers = CaseInsensitiveDict(entry["headers"])
+        validators = {}
+
+        if "ETag" in headers:
+            validators["If-None-Match"] = headers["ETag"]
+
+        if "Last-Modified" in headers:
+            validators["If-Modified-Since"] = headers["Last-Modified"]
+
+        return validators
+
+    def is_cacheable(self, response: requests.Response) -> bool:
+        if response.status_code != 200:
+            return False
+
+        if "no-store" in response.headers.get("Cache-Control", ""):
+            return False
+
+        # api errors come with 200 too
+        try:
+            data = response.json()
+        except ValueError:
+            return True
+
+        return not (isinstance(data, dict) and data.get("status") == "error")
+
+    def build_response(self, entry: Dict[str, Any]) -> requests.Response:
+        response = requests.Response()
+        response.url = entry["url"]
+        response.status_code = entry["status_code"]
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response.encoding = entry["encoding"]
+        response._content = entry["content"]
+        response.from_cache = True
+
+        return response
+
+    def clear(self) -> None:
+        with self._lock:
+            for path in list(self._sizes):
+                self._remove(path)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".entry")
+
+    def _remove(self, path: str) -> None:
+        self._sizes.pop(path, None)
+
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        total = sum(self._sizes.values())
+
+        if total <= self.max_size:
+            return
+
+        def last_access(path: str) -> float:
+            try:
+                return os.path.getmtime(path)
+            except OSError:
+                return 0
+
+        for path in sorted(self._sizes, key=last_access):
+            total -= self._sizes[path]
+            self._remove(path)
+
+            if total <= self.max_size:
+                break
+
+    def _user_key(self, token: Optional[str]) -> str:
+        if not token:
+            return "anonymous"
+
+        try:
+            claims = decode_token(token)
+        except Exception:
+            return hashlib.sha256(token.encode()).hexdigest()
+
+        for claim in self._volatile_claims:
+            claims.pop(claim, None)
+
+        return json.dumps(claims, sort_keys=True)
@@ -0,0 +1,351 @@
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .session import BeletSession
+from .models.moviebase import BeletMovieBase
+from .models.movie import BeletMovieFragment
+from .models.homepage import BeletHomepageSection
+from .models.search import BeletSearchResult
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS movies (
+    id INTEGER PRIMARY KEY,
+    name TEXT,
+    description TEXT,
+    actors TEXT,
+    year INTEGER,
+    category_id INTEGER,
+    type_id INTEGER,
+    rating_kp REAL,
+    rating_imdb REAL,
+    data TEXT NOT NULL,
+    data_hash TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS movie_genres (
+    genre TEXT NOT NULL,
+    movie_id INTEGER NOT NULL REFERENCES movies (id) ON DELETE CASCADE,
+    PRIMARY KEY (genre, movie_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS movies_year ON movies (year);
+CREATE INDEX IF NOT EXISTS movies_category ON movies (category_id);
+CREATE INDEX IF NOT EXISTS movies_rating_kp ON movies (rating_kp);
+CREATE INDEX IF NOT EXISTS movies_rating_imdb ON movies (rating_imdb);
+CREATE INDEX IF NOT EXISTS movie_genres_movie ON movie_genres (movie_id);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS movies_fts USING fts5 (
+    name, description, actors, content='movies', content_rowid='id'
+);
+
+CREATE TRIGGER IF NOT EXISTS movies_ai AFTER INSERT ON movies BEGIN
+    INSERT INTO movies_fts (rowid, name, description, actors)
+    VALUES (new.id, new.name, new.description, new.actors);
+END;
+
+CREATE TRIGGER IF NOT EXISTS movies_ad AFTER DELETE ON movies BEGIN
+    INSERT INTO movies_fts (movies_fts, rowid, name, description, actors)
+    VALUES ('delete', old.id, old.name, old.description, old.actors);
+END;
+
+CREATE TRIGGER IF NOT EXISTS movies_au AFTER UPDATE ON movies BEGIN
+    INSERT INTO movies_fts (movies_fts, rowid, name, description, actors)
+    VALUES ('delete', old.id, old.name, old.description, old.actors);
+    INSERT INTO movies_fts (rowid, name, description, actors)
+    VALUES (new.id, new.name, new.description, new.actors);
+END;
+"""
+
+
+class BeletCatalog:
+    """Local SQLite catalog of movies with offline full-text search
+
+    Movies returned by `BeletClient.search`, `get_homepage_movies`
+    and `get_movie` can be ingested and queried later without network.
+    Ingesting is incremental: data of a movie is merged with what is
+    already stored and the row is only written if the result differs.
+    Per-user fields (`watch_time`, `like`...) aren't stored.
+    """
+
+    # fields that depend on the logged in user
+    _user_fields = (
+        "like",
+        "dislike",
+        "favorites",
+        "watch_time",
+        "episode_info",
+        "last_episode_info",
+    )
+
+    def __init__(
+        self,
+        path: str = "beletcatalog.db",
+        session: Optional[BeletSession] = None,
+    ) -> None:
+        self._session = session
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA foreign_keys = ON")
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.executescript(_SCHEMA)
+
+    def __enter__(self) -> "BeletCatalog":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute(
+                "SELECT COUNT(*) FROM movies"
+            ).fetchone()[0]
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def ingest(
+        self,
+        items: Iterable[
+            BeletMovieBase | BeletSearchResult | BeletHomepageSection
+        ],
+    ) -> int:
+        """Insert or update movies
+
+        Args:
+            items: movies, search results or homepage sections
+
+        Returns:
+            int: number of rows that were inserted or changed
+        """
+
+        incoming: Dict[int, Dict[str, Any]] = {}
+
+        for item in self._flatten(items):
+            data = {
+                key: value
+                for key, value in item.raw_data.items()
+                if key not in self._user_fields
+            }
+
+            if data.get("id") is None:
+                continue
+
+            incoming.setdefault(data["id"], {}).update(data)
+
+        if not incoming:
+            return 0
+
+        changed = 0
+
+        with self._lock, self._connection:
+            stored = self._load_data(list(incoming))
+
+            for movie_id, data in incoming.items():
+                merged = dict(stored.get(movie_id, ({}, None))[0])
+                merged.update(data)
+
+                text = json.dumps(merged, sort_keys=True, ensure_ascii=False)
+                data_hash = hashlib.sha1(text.encode()).hexdigest()
+
+                if movie_id in stored and stored[movie_id][1] == data_hash:
+                    continue
+
+                self._write(movie_id, merged, text, data_hash)
+                changed += 1
+
+        return changed
+
+    def get(self, movie_id: int) -> Optional[BeletMovieFragment]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT data FROM movies WHERE id = ?", (movie_id,)
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        return BeletMovieFragment(self._session, **json.loads(row[0]))
+
+    def search(
+        self,
+        text: Optional[str] = None,
+        year: Optional[int | Tuple[int, int]] = None,
+        category_id: Optional[int] = None,
+        genre: Optional[str] = None,
+        min_rating_kp: Optional[float] = None,
+        min_rating_imdb: Optional[float] = None,
+        limit: int = 50,
+        offset: int = 0,
+    ) -> List[BeletMovieFragment]:
+        """Search stored movies
+
+        Args:
+            text (str): words to look for in name, description
+                        and actors (prefix match)
+            year (int | Tuple[int, int]): year or inclusive range
+            category_id (int): `BeletCategory`
+            genre (str): genre name
+            min_rating_kp (float): minimum Kinopoisk rating
+            min_rating_imdb (float): minimum IMDb rating
+            limit (int): maximum number of results
+            offset (int): number of results to skip
+
+        Returns:
+            List[BeletMovieFragment]: best matches first if `text`
+                                      is given, otherwise by id
+        """
+
+        query = "SELECT movies.data FROM movies"
+        conditions = []
+        params = []
+        order = "movies.id"
+
+        if genre is not None:
+            query += (
+                " JOIN movie_genres ON movie_genres.movie_id = movies.id"
+                " AND movie_genres.genre = ?"
+            )
+            params.append(genre)
+            order = "movie_genres.movie_id"
+
+        if text:
+            fts_query = self._fts_query(text)
+
+            if fts_query is None:
+                return []
+
+            query += " JOIN movies_fts ON movies_fts.rowid = movies.id"
+            conditions.append("movies_fts MATCH ?")
+            params.append(fts_query)
+            order = "movies_fts.rank"
+
+        if isinstance(year, tuple):
+            conditions.append("movies.year BETWEEN ? AND ?")
+            params.extend(year)
+        elif year is not None:
+            conditions.append("movies.year = ?")
+            params.append(year)
+
+        if category_id is not None:
+            conditions.append("movies.category_id = ?")
+            params.append(int(category_id))
+
+        if min_rating_kp is not None:
+            conditions.append("movies.rating_kp >= ?")
+            params.append(min_rating_kp)
+
+        if min_rating_imdb is not None:
+            conditions.append("movies.rating_imdb >= ?")
+            params.append(min_rating_imdb)
+
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+
+        query += f" ORDER BY {order} LIMIT ? OFFSET ?"
+        params.extend((limit, offset))
+
+        with self._lock:
+            rows = self._connection.execute(query, params).fetchall()
+
+        return [
+            BeletMovieFragment(self._session, **json.loads(row[0]))
+            for row in rows
+        ]
+
+    def _flatten(self, items) -> Iterable[BeletMovieBase]:
+        if isinstance(
+            items, (BeletMovieBase, BeletSearchResult, BeletHomepageSection)
+        ):
+            items = [items]
+
+        for item in items:
+            if isinstance(item, (BeletSearchResult, BeletHomepageSection)):
+                yield from item.movies
+            else:
+                yield item
+
+    def _load_data(
+        self, movie_ids: List[int]
+    ) -> Dict[int, Tuple[Dict[str, Any], str]]:
+        stored = {}
+
+        # stay below SQLITE_MAX_VARIABLE_NUMBER of old sqlite versions
+        for i in range(0, len(movie_ids), 500):
+            chunk = movie_ids[i : i + 500]
+            rows = self._connection.execute(
+                "SELECT id, data, data_hash FROM movies WHERE id IN "
+                f"({', '.join('?' * len(chunk))})",
+                chunk,
+            )
+
+            for movie_id, data, data_hash in rows:
+                stored[movie_id] = (json.loads(data), data_hash)
+
+        return stored
+
+    def _write(
+        self, movie_id: int, data: Dict[str, Any], text: str, data_hash: str
+    ) -> None:
+        category_id = data.get("category_id")
+
+        self._connection.execute(
+            "INSERT INTO movies (id, name, description, actors, year, "
+            "category_id, type_id, rating_kp, rating_imdb, data, data_hash, "
+            "updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (id) DO UPDATE SET name = excluded.name, "
+            "description = excluded.description, actors = excluded.actors, "
+            "year = excluded.year, category_id = excluded.category_id, "
+            "type_id = excluded.type_id, rating_kp = excluded.rating_kp, "
+            "rating_imdb = excluded.rating_imdb, data = excluded.data, "
+            "data_hash = excluded.data_hash, updated_at = excluded.updated_at",
+            (
+                movie_id,
+                data.get("name"),
+                data.get("description"),
+                ", ".join(self._names(data.get("actors"))),
+                data.get("year"),
+                None if category_id is None else int(category_id),
+                data.get("type_id"),
+                data.get("rating_kp"),
+                data.get("rating_imdb"),
+                text,
+                data_hash,
+                time.time(),
+            ),
+        )
+
+        self._connection.execute(
+            "DELETE FROM movie_genres WHERE movie_id = ?", (movie_id,)
+        )
+        self._connection.executemany(
+            "INSERT OR IGNORE INTO movie_genres (genre, movie_id) "
+            "VALUES (?, ?)",
+            ((genre, movie_id) for genre in self._names(data.get("genres"))),
+        )
+
+    @staticmethod
+    def _names(values: Optional[List[Any]]) -> List[str]:
+        names = []
+
+        for value in values or []:
+            if isinstance(value, dict):
+                value = value.get("name")
+
+            if value:
+                names.append(str(value))
+
+        return names
+
+    @staticmethod
+    def _fts_query(text: str) -> Optional[str]:
+        words = [
+            '"' + word.replace('"', '""') + '"*' for word in text.split()
+        ]
+        return " ".join(words) or None
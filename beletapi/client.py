@@ -1,10 +1,9 @@
 import os
-import re
-import struct
-import pickle
 import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from functools import lru_cache
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Iterable, Iterator
 
 import requests
 from requests_toolbelt import MultipartEncoder
@@ -13,19 +12,55 @@ from http.cookiejar import Cookie
 from .session import BeletSession
 from .exceptions import *
 from .api import Apis
-from .models.movie import BeletMovie, BeletSeries
+from .enums import BeletHomepageSectionType
+from .models.movie import (
+    BeletMovie,
+    BeletMovieFragment,
+    BeletSeries,
+    movie_from_data,
+)
+from .models.batch import BeletBatchResult
 from .models.homepage import BeletHomepageSection
 from .models.file import BeletFile
 from .models.search import BeletSearchResult
 from .models.searchfilters import SearchFilters
-from .utils import parse_movie_url, generate_fingerprint
+from .utils import (
+    format_movie_id,
+    format_movie_ids,
+    format_phone,
+    generate_fingerprint,
+    load_data_file,
+    save_data_file,
+)
 from .downloaders.ffmpegdownloader import FFmpegDownloader
 from .downloaders.downloaderbase import (
+    DownloadControl,
     DownloaderBase,
     DownloadProgressProtocol,
 )
 
 
+DEFAULT_HEADERS = {
+    "Referer": "https://film.belet.tm/",
+    "Origin": "https://film.belet.tm",
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/134.0.0.0 Safari/537.36"
+    ),
+    "Sec-Ch-Ua": (
+        '"Chromium";v="134", "Not:A-Brand";v="24", "Google Chrome";v="134"'
+    ),
+    "Sec-Ch-Ua-Mobile": "?0",
+    "Sec-Ch-Ua-Platform": '"Windows"',
+    "Sec-Fetch-Dest": "empty",
+    "Sec-Fetch-Mode": "cors",
+    "Sec-Fetch-Site": "same-site",
+    "Dnt": "1",
+    "Priority": "u=1, i",
+    "Lang": "ru",
+    "X-Platform": "Web",
+}
+
+
 class BeletClient(BeletSession):
     def __init__(
         self,
@@ -38,23 +73,7 @@ class BeletClient(BeletSession):
         self._data_file = data_file
         self._downloader = downloader_cls(self)
 
-        self.headers["Referer"] = "https://film.belet.tm/"
-        self.headers["Origin"] = "https://film.belet.tm"
-        self.headers["User-Agent"] = (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/134.0.0.0 Safari/537.36"
-        )
-        self.headers["Sec-Ch-Ua"] = (
-            '"Chromium";v="134", "Not:A-Brand";v="24", "Google Chrome";v="134"'
-        )
-        self.headers["Sec-Ch-Ua-Mobile"] = "?0"
-        self.headers["Sec-Ch-Ua-Platform"] = '"Windows"'
-        self.headers["Sec-Fetch-Dest"] = "empty"
-        self.headers["Sec-Fetch-Mode"] = "cors"
-        self.headers["Sec-Fetch-Site"] = "same-site"
-        self.headers["Dnt"] = "1"
-        self.headers["Priority"] = "u=1, i"
-        self.headers["Lang"] = "ru"
-        self.headers["X-Platform"] = "Web"
+        self.headers.update(DEFAULT_HEADERS)
 
         self._load_data()
 
@@ -109,7 +128,20 @@ class BeletClient(BeletSession):
 
         self._clear_data()
 
-    def get_movie(self, movie_id: int | str) -> BeletMovie:
+    def get_movie(
+        self, movie_id: int | str, deep: bool = False
+    ) -> BeletMovie | BeletSeries:
+        """Get movie or series
+
+        Args:
+            movie_id (int | str): movie id or url
+            deep (bool): also load `files` of a movie or episodes
+                         of all seasons of a series concurrently
+
+        Returns:
+            BeletMovie | BeletSeries: movie or series
+        """
+
         movie_id = self._format_movie_id(movie_id)
         response = self.get(url=Apis.film_api.movie.format(movie_id))
 
@@ -117,15 +149,65 @@ class BeletClient(BeletSession):
         response_json = response.json()
         APIStatusError.raise_for_status(response_json)
 
-        movie = None
+        movie = movie_from_data(self, response_json["film"])
 
-        if response_json["film"]["seasons"] is None:
-            movie = BeletMovie(self, **response_json["film"])
-        else:
-            movie = BeletSeries(self, **response_json["film"])
+        if deep:
+            self._prefetch_movie(movie)
 
         return movie
 
+    def get_movies(
+        self,
+        movie_ids: Iterable[int | str],
+        workers: int = 8,
+        prefetch: bool = False,
+    ) -> BeletBatchResult:
+        """Get many movies concurrently
+
+        Ids and urls are normalized and deduplicated, then fetched by
+        a pool of `workers` threads. A failing movie doesn't abort the
+        batch, its exception is collected in `errors` instead, inputs
+        that can't be parsed are kept as they are with their
+        `InvalidMovieIDError` (or `ValueError` for urls).
+
+        Args:
+            movie_ids (Iterable[int | str]): movie ids or urls
+            workers (int): maximum number of concurrent requests
+            prefetch (bool): also load `files` of movies and
+                             `episodes` of every season of series
+
+        Returns:
+            BeletBatchResult: movies in input order and errors
+        """
+
+        ids, errors = format_movie_ids(movie_ids)
+        movies = [None] * len(ids)
+        # unparsable inputs aren't fetched
+        indexes = [
+            index
+            for index, movie_id in enumerate(ids)
+            if movie_id not in errors
+        ]
+
+        if not indexes:
+            return BeletBatchResult(ids, movies, errors)
+
+        workers = min(workers, len(indexes))
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                index: executor.submit(self.get_movie, ids[index], prefetch)
+                for index in indexes
+            }
+
+            for index, future in futures.items():
+                try:
+                    movies[index] = future.result()
+                except Exception as e:
+                    errors[ids[index]] = e
+
+        return BeletBatchResult(ids, movies, errors)
+
     def get_homepage_movies(
         self,
         offset: int = 0,
@@ -152,6 +234,120 @@ class BeletClient(BeletSession):
             for data in response_json["result"]
         )
 
+    def get_homepage_section(
+        self,
+        offset: int,
+        h_limit: int = 12,
+        type_id: int = 0,
+    ) -> Optional[BeletHomepageSection]:
+        """Get a single homepage section
+
+        Useful to load more movies of one section without
+        fetching the whole homepage again.
+
+        Args:
+            offset (int): position of the section on the homepage
+            h_limit (int): maximum number of movies in the section
+            type_id (int): homepage type
+
+        Returns:
+            Optional[BeletHomepageSection]: section or `None` if
+                                            `offset` is out of range
+        """
+
+        sections = self.get_homepage_movies(offset, 1, h_limit, type_id)
+        return sections[0] if sections else None
+
+    def iter_homepage(
+        self,
+        limit: int = 3,
+        h_limit: int = 12,
+        type_id: int = 0,
+        lookahead: int = 1,
+        h_limits: Optional[Dict[BeletHomepageSectionType, int]] = None,
+    ) -> Iterator[BeletHomepageSection]:
+        """Iterate over all homepage sections
+
+        Slices of `limit` sections are fetched with increasing offset,
+        the next `lookahead` slices are fetched in background threads
+        while the caller consumes the current one.
+
+        Args:
+            limit (int): number of sections per request
+            h_limit (int): maximum number of movies per section
+            type_id (int): homepage type
+            lookahead (int): number of slices to prefetch
+            h_limits (Dict[BeletHomepageSectionType, int]): per section
+                type `h_limit`, sections of these types are fetched
+                again on their own with the given limit
+
+        Yields:
+            BeletHomepageSection: homepage sections in order
+        """
+
+        h_limits = h_limits or {}
+        slices = deque()
+        offset = 0
+        exhausted = False
+
+        def refetch(
+            section: BeletHomepageSection, position: int, section_h_limit: int
+        ) -> BeletHomepageSection:
+            return (
+                self.get_homepage_section(position, section_h_limit, type_id)
+                or section
+            )
+
+        with ThreadPoolExecutor(max_workers=lookahead + limit) as executor:
+            try:
+                while True:
+                    while not exhausted and len(slices) <= lookahead:
+                        future = executor.submit(
+                            self.get_homepage_movies,
+                            offset,
+                            limit,
+                            h_limit,
+                            type_id,
+                        )
+                        slices.append((offset, future))
+                        offset += limit
+
+                    if not slices:
+                        return
+
+                    slice_offset, future = slices.popleft()
+                    sections = future.result()
+
+                    if len(sections) < limit:
+                        # following slices are out of range
+                        exhausted = True
+
+                        for _, future in slices:
+                            future.cancel()
+
+                        slices.clear()
+
+                    items = []
+
+                    for position, section in enumerate(sections, slice_offset):
+                        section_h_limit = h_limits.get(section.type, h_limit)
+
+                        if section_h_limit != h_limit:
+                            section = executor.submit(
+                                refetch, section, position, section_h_limit
+                            )
+
+                        items.append(section)
+
+                    for item in items:
+                        if isinstance(item, Future):
+                            item = item.result()
+
+                        yield item
+            finally:
+                for _, future in slices:
+                    future.cancel()
+
     @lru_cache(maxsize=1)
     def get_filter_data(self) -> SearchFilters:
         response = self.get(Apis.search_api.filter_data)
@@ -189,6 +385,57 @@ class BeletClient(BeletSession):
 
         return BeletSearchResult.from_data(self, response_json)
 
+    def iter_search(
+        self,
+        text: str = "",
+        filters: Optional[Dict[str, int]] = None,
+        sort: Optional[str] = None,
+        order: str = "desc",
+        start_page: int = 1,
+        lookahead: int = 1,
+    ) -> Iterator[BeletMovieFragment]:
+        """Iterate over search results of all pages
+
+        While the caller consumes a page, the next `lookahead` pages
+        are fetched in background threads. Iteration stops at the
+        first empty page.
+
+        Args:
+            text (str): search text
+            filters (Dict[str, int]): search filters
+            sort (str): sort parameter
+            order (str): `desc` or `asc`
+            start_page (int): first page to fetch
+            lookahead (int): number of pages to prefetch
+
+        Yields:
+            BeletMovieFragment: found movies
+        """
+
+        pending = deque()
+        page = start_page
+
+        with ThreadPoolExecutor(max_workers=max(lookahead, 1)) as executor:
+            try:
+                while True:
+                    while len(pending) <= lookahead:
+                        pending.append(
+                            executor.submit(
+                                self.search, text, order, page, filters, sort
+                            )
+                        )
+                        page += 1
+
+                    result = pending.popleft().result()
+
+                    if not result.movies:
+                        return
+
+                    yield from result.movies
+            finally:
+                for future in pending:
+                    future.cancel()
+
     def set_last_watch_time(
         self, movie_id: int, season_id: int = 0, watch_time: float = 0
     ) -> bool:
@@ -219,44 +466,25 @@ class BeletClient(BeletSession):
         file: BeletFile,
         output_filename: str,
         download_progress_callback: Optional[DownloadProgressProtocol] = None,
+        control: Optional[DownloadControl] = None,
     ) -> str:
         return self._downloader.download(
             file,
             output_filename,
             download_progress_callback,
+            control,
         )
 
     def _load_data(self) -> None:
-        if not os.path.isfile(self._data_file):
-            return
-
-        with open(self._data_file, "rb") as file:
-            data = file.read()
+        data = load_data_file(self._data_file)
 
-        token_len, cookies_len = struct.unpack(">Bi", data[0:5])
-
-        _, _, token, cookies = struct.unpack(
-            f">Bi{token_len}s{cookies_len}s",
-            data,
-        )
+        if data is None:
+            return
 
-        self.token = token.decode("ascii")
-        self.cookies = pickle.loads(cookies)
+        self.token, self.cookies = data
 
     def _save_data(self) -> None:
-        token_len = len(self.token)
-        cookies = pickle.dumps(self.cookies)
-        cookies_len = len(cookies)
-        data = struct.pack(
-            f">Bi{token_len}s{cookies_len}s",
-            token_len,
-            cookies_len,
-            self.token.encode("ascii"),
-            cookies,
-        )
-
-        with open(self._data_file, "wb") as file:
-            file.write(data)
+        save_data_file(self._data_file, self.token, self.cookies)
 
     def _clear_data(self) -> None:
         if os.path.isfile(self._data_file):
@@ -269,30 +497,17 @@ class BeletClient(BeletSession):
         super()._refresh_token()
         self._save_data()
 
-    def _format_phone(self, phone: int | str) -> int:
-        pattern = re.compile("[\\d]{8}$")
-
-        if isinstance(phone, int):
-            phone = str(phone)
-
-        found = pattern.search(phone)
-
-        if not found:
-            raise ValueError(f"Wrong phone number format -> {phone}")
+    def _prefetch_movie(self, movie: BeletMovie | BeletSeries) -> None:
+        if isinstance(movie, BeletSeries):
+            movie.prefetch()
+        else:
+            movie.files
 
-        return int("993" + found[0])
+    def _format_phone(self, phone: int | str) -> int:
+        return format_phone(phone)
 
     def _format_movie_id(self, movie_id: int | str) -> int:
-        if isinstance(movie_id, str):
-            if movie_id.startswith("https://"):
-                return parse_movie_url(movie_id).movie_id
-            elif movie_id.isdigit():
-                return int(movie_id)
-
-        if isinstance(movie_id, int):
-            return movie_id
-
-        raise InvalidMovieIDError(movie_id)
+        return format_movie_id(movie_id)
 
     def _create_fingerprint_cookie(self) -> Cookie:
         cookie = requests.cookies.create_cookie(
@@ -1,23 +1,254 @@
+import os
+import threading
 from abc import ABCMeta, abstractmethod
-from typing import Optional, Protocol
+from typing import Callable, Optional, Protocol, Tuple
+
+import m3u8
 
 from beletapi.session import BeletSession
 from beletapi.models.file import BeletFile
+from beletapi.ratelimit import BandwidthLimiter
+from beletapi.exceptions import DownloadCancelledError
+from .progress import DownloadProgress, ProgressTracker
+from .playlist import PlaylistCache
+from .segmentcache import SegmentCache
+from .quality import QualityChoice, QualitySelector, Variant
 
 
 class DownloadProgressProtocol(Protocol):
+    """Download progress callback
+
+    `progress` is only passed to callbacks that declare it
+    (or accept `**kwargs`).
+    """
+
     def __call__(
         self,
         downloaded_bytes: int,
         downloaded_segment: int,
         max_segments: int,
+        progress: Optional[DownloadProgress] = None,
     ) -> None:
         pass
 
 
+class DownloadControl:
+    """Lets other threads pause, resume or cancel a running download
+
+    Downloaders call `checkpoint` between chunks of work with the
+    number of bytes received since the last call. It blocks while
+    the download is paused, raises `DownloadCancelledError` once it's
+    cancelled and sleeps to stay below the rate of `limiter`.
+
+    Args:
+        limiter (BandwidthLimiter): bandwidth limit, may be shared
+            between downloads
+        on_bytes (Callable[[int], None]): called with received bytes
+        name (str): name of the download used in errors
+    """
+
+    def __init__(
+        self,
+        limiter: Optional[BandwidthLimiter] = None,
+        on_bytes: Optional[Callable[[int], None]] = None,
+        name: Optional[str] = None,
+    ) -> None:
+        self.name = name
+        self.limiter = limiter
+        self.on_bytes = on_bytes
+        self.received_bytes = 0
+
+        self._lock = threading.Lock()
+        self._running = threading.Event()
+        self._running.set()
+        self._cancelled = threading.Event()
+
+    @property
+    def paused(self) -> bool:
+        return not self._running.is_set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def pause(self) -> None:
+        if not self.cancelled:
+            self._running.clear()
+
+    def resume(self) -> None:
+        self._running.set()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+        self._running.set()
+
+    def checkpoint(self, received_bytes: int = 0) -> None:
+        """Account received bytes, wait while paused
+
+        Raises:
+            DownloadCancelledError: raised if the download was cancelled
+        """
+
+        if received_bytes:
+            with self._lock:
+                self.received_bytes += received_bytes
+
+            if self.on_bytes is not None:
+                self.on_bytes(received_bytes)
+
+            if self.limiter is not None:
+                self.limiter.consume(received_bytes)
+
+        self._running.wait()
+
+        if self._cancelled.is_set():
+            raise DownloadCancelledError(self.name)
+
+
 class DownloaderBase(metaclass=ABCMeta):
-    def __init__(self, session: BeletSession) -> None:
+    """Base of downloaders
+
+    Args:
+        session (BeletSession): session used for requests
+        progress_interval (float): minimum seconds between progress
+            callback calls
+        quality_selector (QualitySelector): chooses the variant of
+            master playlists, the first one is used if `None`
+        playlist_cache (PlaylistCache): parsed playlists, pass the same
+            cache to several downloaders to share it (default: a cache
+            of this downloader)
+        segment_cache (SegmentCache): on-disk segment store consulted
+            before requesting segments
+    """
+
+    def __init__(
+        self,
+        session: BeletSession,
+        progress_interval: float = 0.5,
+        quality_selector: Optional[QualitySelector] = None,
+        playlist_cache: Optional[PlaylistCache] = None,
+        segment_cache: Optional[SegmentCache] = None,
+    ) -> None:
         self._session = session
+        self._progress_interval = progress_interval
+        self._quality_selector = quality_selector
+        self._playlist_cache = (
+            playlist_cache if playlist_cache is not None else PlaylistCache()
+        )
+        self._segment_cache = segment_cache
+
+    @property
+    def playlist_cache(self) -> PlaylistCache:
+        return self._playlist_cache
+
+    @staticmethod
+    def default_output_filename(file: BeletFile) -> str:
+        """`<playlist name>.mp4` in the current directory"""
+
+        return os.path.splitext(file.filename.rsplit("/", 1)[1])[0] + ".mp4"
+
+    def _fetch_segment(
+        self, segment: m3u8.Segment, control: Optional[DownloadControl] = None
+    ) -> bytes:
+        if self._segment_cache is not None:
+            if control is not None:
+                control.checkpoint()
+
+            data = self._segment_cache.read(segment.absolute_uri)
+
+            if data is not None:
+                # not received, doesn't count against the bandwidth
+                return data
+
+        return self._request_segment(segment, control)
+
+    def _request_segment(
+        self, segment: m3u8.Segment, control: Optional[DownloadControl] = None
+    ) -> bytes:
+        """Request a segment, bypassing and filling `segment_cache`"""
+
+        if control is not None:
+            control.checkpoint()
+
+        response = self._session.get(segment.absolute_uri)
+        response.raise_for_status()
+
+        if control is not None:
+            control.checkpoint(len(response.content))
+
+        if self._segment_cache is not None:
+            self._segment_cache.store(segment.absolute_uri, response.content)
+
+        return response.content
+
+    def _create_progress_tracker(
+        self,
+        m: m3u8.M3U8,
+        download_progress_callback: Optional[DownloadProgressProtocol],
+        downloaded_bytes: int = 0,
+        downloaded_segment: int = -1,
+    ) -> ProgressTracker:
+        return ProgressTracker(
+            m,
+            download_progress_callback,
+            interval=self._progress_interval,
+            downloaded_bytes=downloaded_bytes,
+            downloaded_segment=downloaded_segment,
+        )
+
+    def _fetch_video_metadata(self, file: BeletFile) -> m3u8.M3U8:
+        '''Fetch media playlist of `file`
+
+        If `file.filename` points to a master playlist, the media
+        playlist of the variant chosen by `quality_selector` (or the
+        first one) is fetched instead. With a `quality_selector` all
+        variants are fetched concurrently first, so probing and the
+        download itself are served from `playlist_cache`. `base_uri`
+        of the returned playlist is set, so `segment.absolute_uri` can
+        be used directly.
+
+        Args:
+            file (BeletFile): `BeletFile` object
+
+        Returns:
+            m3u8.M3U8: parsed media playlist
+        '''
+
+        return self._fetch_media_playlist(file)[1]
+
+    def _fetch_media_playlist(
+        self, file: BeletFile
+    ) -> Tuple[str, m3u8.M3U8]:
+        """Same as `_fetch_video_metadata`, also returns the url"""
+
+        url = file.filename
+        m = self._playlist_cache.get(self._session, url)
+
+        if m.is_endlist:
+            return url, m
+
+        self._prefetch_variants(m)
+
+        url = self._choose_variant(m).variant.uri
+        return url, self._playlist_cache.get(self._session, url)
+
+    def _prefetch_variants(self, master: m3u8.M3U8) -> None:
+        # the selector may need any variant, one round trip for all
+        if self._quality_selector is not None:
+            self._playlist_cache.get_many(
+                self._session, [p.absolute_uri for p in master.playlists]
+            )
+
+    def _choose_variant(self, master: m3u8.M3U8) -> QualityChoice:
+        if self._quality_selector is None:
+            # keep the order of the master playlist
+            return QualityChoice(
+                [Variant.from_playlist(p) for p in master.playlists], 0, None
+            )
+
+        return self._quality_selector.select(
+            self._session, master, self._playlist_cache
+        )
 
     @abstractmethod
     def download(
@@ -25,6 +256,7 @@ class DownloaderBase(metaclass=ABCMeta):
         file: BeletFile,
         output_filename: str,
         download_progress_callback: Optional[DownloadProgressProtocol] = None,
+        control: Optional[DownloadControl] = None,
     ) -> str:
         '''Abstract method for downloading `BeletFile`
         to `output_filename`
@@ -34,5 +266,9 @@ class DownloaderBase(metaclass=ABCMeta):
             output_filename (str): path where to download the file to
             download_progress_callback (DownloadProgressProtocol):
                 download progress callback
+            control (DownloadControl): pause/cancel/bandwidth control
+
+        Raises:
+            DownloadCancelledError: raised if `control` was cancelled
         '''
         ...
@@ -1,67 +1,206 @@
 import os
-import re
-from subprocess import Popen, PIPE
-from typing import Optional
+import math
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from subprocess import Popen, PIPE, DEVNULL
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
 
 import m3u8
 
-from .downloaderbase import DownloaderBase, DownloadProgressProtocol
+from .downloaderbase import (
+    DownloadControl,
+    DownloaderBase,
+    DownloadProgressProtocol,
+)
+from .progress import ProgressTracker
+from .quality import QualityChoice, Variant
 from beletapi.models.file import BeletFile
+from beletapi.exceptions import FFmpegError
+
+
+class FFmpegBatchResult(NamedTuple):
+    """Result of `FFmpegDownloader.download_many`
+
+    `output_filenames` is aligned with `files` (input order), downloads
+    that failed are `None` in `output_filenames` and their exception
+    is stored in `errors` under their index.
+    """
+
+    files: List[BeletFile]
+    output_filenames: List[Optional[str]]
+    errors: Dict[int, Exception]
 
 
 class FFmpegDownloader(DownloaderBase):
-    def __init__(self, *args, **kwargs):
+    """Downloads files with an ffmpeg process each
+
+    Progress is read from ffmpeg's `-progress` key/value channel on
+    stdout: output bytes, `out_time` (media seconds written, which
+    also gives the segment index) and `speed` are passed to the
+    callback through `DownloadProgress`. stderr only carries errors,
+    they are raised as `FFmpegError`.
+
+    Without a `quality_selector` the variant ffmpeg itself would pick
+    from a master playlist is downloaded: the highest resolution, then
+    the highest `BANDWIDTH`.
+
+    With a `segment_cache`, unencrypted playlists are fetched by the
+    downloader instead: cached segments are hard linked (or reflinked)
+    into a temporary directory next to the cache, missing ones are
+    requested by `workers` threads and stored, then ffmpeg remuxes the
+    local copy. Progress is reported while fetching. Master playlists
+    with alternative renditions (`EXT-X-MEDIA`) are always left to
+    ffmpeg.
+
+    Args:
+        ffmpeg (str): ffmpeg executable
+        workers (int): number of concurrent segment requests when a
+            `segment_cache` is used
+    """
+
+    def __init__(
+        self, *args, ffmpeg: str = "ffmpeg", workers: int = 8, **kwargs
+    ):
         super().__init__(*args, **kwargs)
 
-    def _read_proc(
+        if workers < 1:
+            raise ValueError(f"workers must be positive -> {workers}")
+
+        self._ffmpeg = ffmpeg
+        self._workers = workers
+
+    def _command(
+        self, url: str, output_filename: str, authorize: bool = True
+    ) -> List[str]:
+        command = [
+            self._ffmpeg,
+            "-y",
+            "-nostdin",
+            "-nostats",
+            "-loglevel", "error",
+            "-progress", "pipe:1",
+        ]
+
+        if authorize:
+            command += [
+                "-headers", f"Authorization: {self._session.token}\r\n"
+            ]
+
+        return command + [
+            "-i", url,
+            "-bsf:a", "aac_adtstoasc",
+            "-c", "copy",
+            output_filename,
+        ]
+
+    def _read_progress(
         self,
         proc: Popen,
-        m: m3u8.M3U8,
-        download_progress_callback: Optional[DownloadProgressProtocol] = None,
+        tracker: ProgressTracker,
+        control: Optional[DownloadControl] = None,
+        received: bool = True,
     ) -> None:
-        segment_pattern = re.compile(
-            "\\[https @ [0-9a-f]+\\] Opening '[\\w\\d\\-\\._/:]+?video"
-            "[\\w\\d\\-\\._/:]+?([\\d]{1,4}).ts' for reading"
-        )
+        # blocks of "key=value" lines, each ended by "progress=..."
+        values: Dict[bytes, bytes] = {}
+        downloaded_size = 0
+        reported_size = 0
+        downloaded_duration = 0.0
+        speed = None
 
-        # downloaded_pattern = re.compile("size=\\s+([\\d]+kB)")
+        for line in proc.stdout:
+            key, _, value = line.strip().partition(b"=")
 
-        downloaded_size = 0
-        downloaded_segment = 0
-        max_segments = len(m.segments)
+            if key != b"progress":
+                values[key] = value
+                continue
 
-        while True:
-            output = proc.stderr.readline()
-            if output == b"" and proc.poll() is not None:
-                break
-            if output:
-                output = output.decode("utf-8")
+            total_size = values.get(b"total_size", b"")
+            out_time_us = values.get(b"out_time_us", b"")
+            speed_value = values.get(b"speed", b"").strip().rstrip(b"x")
+            values.clear()
 
-                if found := segment_pattern.search(output):
-                    downloaded_segment = int(found[1])
-                # elif found := downloaded_pattern.search(output):
-                #     downloaded_size = int(found[1][:-2]) * 1024
+            # "N/A" until known
+            if total_size.isdigit():
+                downloaded_size = int(total_size)
 
-                if download_progress_callback:
-                    download_progress_callback(
-                        downloaded_size, downloaded_segment, max_segments
-                    )
+            if out_time_us.isdigit():
+                downloaded_duration = int(out_time_us) / 1_000_000
 
-    def _fetch_video_metadata(self, file: BeletFile) -> m3u8.M3U8:
-        response = self._session.get(file.filename)
-        response.raise_for_status()
+            try:
+                speed = float(speed_value)
+            except ValueError:
+                pass
 
-        m = m3u8.M3U8(response.text)
+            tracker.update(
+                downloaded_size,
+                tracker.segment_at(downloaded_duration),
+                downloaded_duration,
+                speed,
+            )
 
-        if not m.is_endlist:
-            url = file.filename[: file.filename.rfind("/")]
-            url = url + "/" + m.playlists[0].uri
-            response = self._session.get(url)
-            response.raise_for_status()
+            if control is not None:
+                # while this blocks ffmpeg stalls on the full pipe,
+                # so pausing and the bandwidth limit are approximate
+                if received:
+                    control.checkpoint(downloaded_size - reported_size)
+                    reported_size = downloaded_size
+                else:
+                    control.checkpoint()
 
-            m = m3u8.M3U8(response.text)
+    def _run(
+        self,
+        command: List[str],
+        tracker: ProgressTracker,
+        control: Optional[DownloadControl] = None,
+        received: bool = True,
+    ) -> None:
+        """Run ffmpeg, `received` tells whether the output bytes come
+        from the network and count against the bandwidth limit
+        """
+
+        if control is not None:
+            # don't start processes of paused or cancelled downloads
+            control.checkpoint()
+
+        proc = Popen(command, stdin=DEVNULL, stdout=PIPE, stderr=PIPE)
+
+        # stderr is drained concurrently so ffmpeg never blocks on it
+        errors = deque(maxlen=20)
+        drain = threading.Thread(
+            target=errors.extend, args=(proc.stderr,), daemon=True
+        )
+        drain.start()
 
-        return m
+        try:
+            self._read_progress(proc, tracker, control, received)
+        except BaseException:
+            # cancelled, or the callback failed
+            proc.kill()
+            raise
+        finally:
+            proc.wait()
+            drain.join()
+            proc.stdout.close()
+            proc.stderr.close()
+
+        if proc.returncode != 0:
+            raise FFmpegError(
+                proc.returncode,
+                b"".join(errors).decode("utf-8", "replace").strip(),
+            )
+
+        tracker.finish()
 
     # override
     def download(
@@ -69,28 +208,217 @@ class FFmpegDownloader(DownloaderBase):
         file: BeletFile,
         output_filename: Optional[str],
         download_progress_callback: Optional[DownloadProgressProtocol] = None,
+        control: Optional[DownloadControl] = None,
     ) -> str:
         if output_filename is None:
-            output_filename = os.path.splitext(
-                file.filename.rsplit("/", 1)[1]
-            )[0] + ".mp4"
-
-        m = self._fetch_video_metadata(file)
-
-        proc = Popen(
-            " ".join(
-                [
-                    "ffmpeg -y",
-                    f'-headers "Authorization: {self._session.token}"',
-                    f'-i "{file.filename}" -bsf:a aac_adtstoasc',
-                    f'-vcodec copy -c copy -crf 23 "{output_filename}"',
-                ]
+            output_filename = self.default_output_filename(file)
+
+        url, m = self._fetch_media_playlist(file)
+        tracker = self._create_progress_tracker(m, download_progress_callback)
+
+        if self._has_renditions(file):
+            # ffmpeg combines the renditions itself
+            url = file.filename
+        elif self._segment_cache is not None and self._is_local_supported(m):
+            self._download_local(m, output_filename, tracker, control)
+            return output_filename
+
+        # ffmpeg fetches the media playlist once more: its HLS demuxer
+        # only forwards -headers to segment requests when the playlist
+        # itself is read over HTTP, a local copy would lose them
+        self._run(self._command(url, output_filename), tracker, control)
+
+        return output_filename
+
+    # override
+    def _choose_variant(self, master: m3u8.M3U8) -> QualityChoice:
+        if self._quality_selector is not None:
+            return super()._choose_variant(master)
+
+        # same as ffmpeg's default stream selection
+        variants = [Variant.from_playlist(p) for p in master.playlists]
+        index = max(
+            range(len(variants)),
+            key=lambda i: (
+                math.prod(variants[i].resolution or (0, 0)),
+                variants[i].bandwidth,
             ),
-            stdout=PIPE,
-            stderr=PIPE,
-            shell=True,
         )
+        return QualityChoice(variants, index, None)
 
-        self._read_proc(proc, m, download_progress_callback)
+    def _has_renditions(self, file: BeletFile) -> bool:
+        # audio or subtitles in separate playlists, served from cache
+        master = self._playlist_cache.get(self._session, file.filename)
+        return any(media.uri for media in master.media)
 
-        return output_filename
+    @staticmethod
+    def _is_local_supported(m: m3u8.M3U8) -> bool:
+        # keys and initialization sections are left to ffmpeg
+        return not m.segment_map and all(
+            key is None or key.method == "NONE" for key in m.keys
+        )
+
+    def _download_local(
+        self,
+        m: m3u8.M3U8,
+        output_filename: str,
+        tracker: ProgressTracker,
+        control: Optional[DownloadControl] = None,
+    ) -> None:
+        # same filesystem as the cache, so segments can be hard linked
+        with tempfile.TemporaryDirectory(
+            dir=self._segment_cache.directory
+        ) as directory:
+            playlist_filename = self._materialize_segments(
+                m, directory, tracker, control
+            )
+
+            # media is local now, progress was already reported
+            self._run(
+                self._command(playlist_filename, output_filename, False),
+                self._create_progress_tracker(m, None),
+                control,
+                received=False,
+            )
+
+    def _materialize_segments(
+        self,
+        m: m3u8.M3U8,
+        directory: str,
+        tracker: ProgressTracker,
+        control: Optional[DownloadControl] = None,
+    ) -> str:
+        """Put the segments of `m` in `directory`, returns a playlist
+        of them
+        """
+
+        def materialize(index: int) -> int:
+            segment = m.segments[index]
+            filename = os.path.join(directory, f"{index:05d}.ts")
+
+            if control is not None:
+                control.checkpoint()
+
+            if self._segment_cache.materialize(
+                segment.absolute_uri, filename
+            ) is None:
+                data = self._request_segment(segment, control)
+
+                with open(filename, "wb") as file:
+                    file.write(data)
+
+            return os.path.getsize(filename)
+
+        downloaded_bytes = 0
+        workers = min(self._workers, max(len(m.segments), 1))
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(materialize, index)
+                for index in range(len(m.segments))
+            ]
+
+            try:
+                for index, future in enumerate(futures):
+                    downloaded_bytes += future.result()
+                    tracker.update(downloaded_bytes, index)
+            finally:
+                for future in futures:
+                    future.cancel()
+
+        tracker.finish()
+
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:3",
+            "#EXT-X-TARGETDURATION:{}".format(
+                math.ceil(
+                    max((s.duration or 0 for s in m.segments), default=0)
+                )
+            ),
+            "#EXT-X-MEDIA-SEQUENCE:0",
+        ]
+
+        for index, segment in enumerate(m.segments):
+            if segment.discontinuity:
+                lines.append("#EXT-X-DISCONTINUITY")
+
+            lines.append(f"#EXTINF:{segment.duration or 0:.6f},")
+            lines.append(f"{index:05d}.ts")
+
+        lines.append("#EXT-X-ENDLIST")
+
+        playlist_filename = os.path.join(directory, "playlist.m3u8")
+
+        with open(playlist_filename, "w", encoding="utf-8") as file:
+            file.write("\n".join(lines) + "\n")
+
+        return playlist_filename
+
+    def download_many(
+        self,
+        files: Iterable[BeletFile | Tuple[BeletFile, Optional[str]]],
+        processes: int = 4,
+        download_progress_callback: Optional[Callable[..., None]] = None,
+        control: Optional[DownloadControl] = None,
+    ) -> FFmpegBatchResult:
+        """Download many files with at most `processes` ffmpeg processes
+
+        A failing download doesn't abort the batch, its exception is
+        collected in `errors` instead. Cancelling `control` cancels
+        the whole batch.
+
+        Args:
+            files (Iterable[BeletFile | Tuple[BeletFile, str]]): files,
+                or `(file, output_filename)` pairs
+            processes (int): maximum number of concurrent ffmpeg
+                processes
+            download_progress_callback (Callable): called like a
+                download progress callback with the index of the file
+                as the first argument
+            control (DownloadControl): pause/cancel/bandwidth control
+                shared by all downloads
+
+        Returns:
+            FFmpegBatchResult: output filenames in input order and
+                errors
+        """
+
+        if processes < 1:
+            raise ValueError(f"processes must be positive -> {processes}")
+
+        jobs = [
+            item if isinstance(item, tuple) else (item, None)
+            for item in files
+        ]
+        batch_files = [file for file, _ in jobs]
+        output_filenames = [None] * len(jobs)
+        errors = {}
+
+        if not jobs:
+            return FFmpegBatchResult(batch_files, output_filenames, errors)
+
+        def download(index: int) -> str:
+            file, output_filename = jobs[index]
+            callback = None
+
+            if download_progress_callback is not None:
+                # partial keeps the `progress` parameter visible
+                callback = partial(download_progress_callback, index)
+
+            return self.download(file, output_filename, callback, control)
+
+        with ThreadPoolExecutor(
+            max_workers=min(processes, len(jobs))
+        ) as executor:
+            futures = [
+                executor.submit(download, index) for index in range(len(jobs))
+            ]
+
+            for index, future in enumerate(futures):
+                try:
+                    output_filenames[index] = future.result()
+                except Exception as e:
+                    errors[index] = e
+
+        return FFmpegBatchResult(batch_files, output_filenames, errors)
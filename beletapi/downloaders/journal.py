@@ -0,0 +1,172 @@
+import os
+import json
+import zlib
+from typing import IO, Callable, List, Optional, Tuple
+
+
+class SegmentJournal:
+    """Sidecar file recording segments that were written to a part file
+
+    The first line identifies the download (source playlist and segment
+    count), every following line records one completed segment as
+    `index`, byte `length`, `crc32` checksum and the `uri` it was
+    fetched from. Segments are written to the part file in order, so
+    completed segments always form a prefix of the playlist.
+    """
+
+    _file: Optional[IO[str]]
+
+    def __init__(self, filename: str, source: str, max_segments: int) -> None:
+        self.filename = filename
+        self.source = source
+        self.max_segments = max_segments
+
+        self._file = None
+
+    def __enter__(self) -> "SegmentJournal":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    @staticmethod
+    def checksum(data: bytes, value: int = 0) -> int:
+        return zlib.crc32(data, value)
+
+    def resume(
+        self,
+        part_filename: str,
+        accept: Optional[Callable[[int, Optional[str]], bool]] = None,
+    ) -> Tuple[int, int]:
+        """Verify `part_filename` against the journal and reopen it
+
+        The part file is truncated to the last verified segment, any
+        stale or mismatching journal is discarded.
+
+        Args:
+            part_filename (str): file the segments were written to
+            accept (Callable[[int, Optional[str]], bool]): called with
+                the index and url of every recorded segment, segments
+                from the first rejected one on are fetched again
+
+        Returns:
+            Tuple[int, int]: count of completed segments and their
+                             total size in bytes
+        """
+
+        entries = self._read_entries()
+        completed, size = 0, 0
+
+        if accept is not None:
+            for count, (index, _, _, uri) in enumerate(entries):
+                if not accept(index, uri):
+                    entries = entries[:count]
+                    break
+
+        if entries and os.path.isfile(part_filename):
+            completed, size = self._verify(part_filename, entries)
+
+        if completed == 0:
+            size = 0
+
+        with open(part_filename, "ab") as part_file:
+            part_file.truncate(size)
+
+        self._file = open(self.filename, "w", encoding="utf-8")
+        self._write(
+            {"source": self.source, "segments": self.max_segments}
+        )
+
+        for index, length, crc, uri in entries[:completed]:
+            self._write(
+                {"index": index, "length": length, "crc32": crc, "uri": uri}
+            )
+
+        return completed, size
+
+    def append(
+        self, index: int, data: bytes, uri: Optional[str] = None
+    ) -> None:
+        self._write(
+            {
+                "index": index,
+                "length": len(data),
+                "crc32": self.checksum(data),
+                "uri": uri,
+            }
+        )
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def remove(self) -> None:
+        self.close()
+
+        if os.path.isfile(self.filename):
+            os.remove(self.filename)
+
+    def _write(self, entry: dict) -> None:
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+
+    def _read_entries(self) -> List[Tuple[int, int, int, Optional[str]]]:
+        if not os.path.isfile(self.filename):
+            return []
+
+        with open(self.filename, "r", encoding="utf-8") as file:
+            lines = file.read().splitlines()
+
+        try:
+            header = json.loads(lines[0])
+        except (IndexError, ValueError):
+            return []
+
+        if (
+            header.get("source") != self.source
+            or header.get("segments") != self.max_segments
+        ):
+            return []
+
+        entries = []
+
+        for line in lines[1:]:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # last line may be cut off by a crash
+                break
+
+            if entry.get("index") != len(entries):
+                break
+
+            entries.append(
+                (
+                    entry["index"],
+                    entry["length"],
+                    entry["crc32"],
+                    entry.get("uri"),
+                )
+            )
+
+        return entries
+
+    def _verify(
+        self,
+        part_filename: str,
+        entries: List[Tuple[int, int, int, Optional[str]]],
+    ) -> Tuple[int, int]:
+        completed, size = 0, 0
+
+        with open(part_filename, "rb") as part_file:
+            for _, length, crc, _ in entries:
+                data = part_file.read(length)
+
+                if len(data) != length or self.checksum(data) != crc:
+                    break
+
+                completed += 1
+                size += length
+
+        return completed, size
@@ -0,0 +1,467 @@
+import os
+import time
+import heapq
+import itertools
+import threading
+from collections import deque
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from beletapi.models.file import BeletFile
+from beletapi.ratelimit import BandwidthLimiter
+from beletapi.exceptions import DownloadCancelledError
+from .downloaderbase import (
+    DownloadControl,
+    DownloaderBase,
+    DownloadProgressProtocol,
+)
+
+
+class DownloadTask:
+    """Handle of a download submitted to `DownloadManager`
+
+    Attributes:
+        file: file being downloaded
+        output_filename: path the file is downloaded to
+        priority: higher priority tasks are started first
+        state: one of `QUEUED`, `RUNNING`, `PAUSED`, `COMPLETED`,
+            `FAILED`, `CANCELLED`
+        error: exception of a failed task
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    PAUSED = "paused"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    def __init__(
+        self,
+        manager: "DownloadManager",
+        file: BeletFile,
+        output_filename: str,
+        priority: int,
+        callback: Optional[DownloadProgressProtocol],
+    ) -> None:
+        self.file = file
+        self.output_filename = output_filename
+        self.priority = priority
+        self.state = self.QUEUED
+        self.error: Optional[Exception] = None
+
+        self._manager = manager
+        self._callback = callback
+        self._control = DownloadControl(
+            manager._limiter, manager._account, output_filename
+        )
+        self._started = False
+        self._done = threading.Event()
+
+    def __repr__(self) -> str:
+        return (
+            f"<DownloadTask: output_filename='{self.output_filename}' "
+            f"state={self.state}>"
+        )
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    @property
+    def downloaded_bytes(self) -> int:
+        """Bytes received by this task"""
+
+        return self._control.received_bytes
+
+    def pause(self) -> None:
+        """Pause the task
+
+        A queued task isn't started until resumed, a running one stops
+        receiving data but keeps its slot.
+        """
+
+        self._manager._pause(self)
+
+    def resume(self) -> None:
+        self._manager._resume(self)
+
+    def cancel(self) -> None:
+        self._manager._cancel(self)
+
+    def wait(self, timeout: Optional[float] = None) -> str:
+        """Wait for the task to finish
+
+        Returns:
+            str: output filename
+
+        Raises:
+            TimeoutError: raised if `timeout` passed
+            DownloadCancelledError: raised if the task was cancelled
+            Exception: error of a failed task
+        """
+
+        if not self._done.wait(timeout):
+            raise TimeoutError(self.output_filename)
+
+        if self.state == self.CANCELLED:
+            raise DownloadCancelledError(self.output_filename)
+
+        if self.error is not None:
+            raise self.error
+
+        return self.output_filename
+
+
+class DownloadManagerStats(NamedTuple):
+    """Aggregate state of `DownloadManager`
+
+    Attributes:
+        queued: tasks waiting for a slot
+        running: tasks downloading
+        paused: paused tasks
+        completed: finished tasks
+        failed: failed tasks
+        cancelled: cancelled tasks
+        downloaded_bytes: bytes received by all tasks
+        current_rate: bytes per second over the last few seconds
+        average_rate: bytes per second since the first task started
+    """
+
+    queued: int
+    running: int
+    paused: int
+    completed: int
+    failed: int
+    cancelled: int
+    downloaded_bytes: int
+    current_rate: float
+    average_rate: float
+
+
+class DownloadManager:
+    """Queue of downloads run by a pool of worker threads
+
+    Tasks are started by priority (then submission order),
+    `max_concurrent` at a time. All tasks share one `bandwidth` limit.
+    Submitting the same file to the same output again returns the
+    existing task instead of downloading it twice.
+
+    `SegmentDownloader` is recommended: it pauses and limits bandwidth
+    between segments and resumes cancelled downloads from its journal.
+    `FFmpegDownloader` does both only approximately.
+
+    Args:
+        downloader (DownloaderBase): downloader of all tasks, e.g.
+            `SegmentDownloader(client)`
+        max_concurrent (int): number of concurrent downloads
+        bandwidth (float): total bytes per second, `None` - unlimited
+        rate_window (float): seconds `current_rate` is averaged over
+    """
+
+    def __init__(
+        self,
+        downloader: DownloaderBase,
+        max_concurrent: int = 2,
+        bandwidth: Optional[float] = None,
+        rate_window: float = 5.0,
+    ) -> None:
+        if max_concurrent < 1:
+            raise ValueError(
+                f"max_concurrent must be positive -> {max_concurrent}"
+            )
+
+        self._downloader = downloader
+        self._limiter = BandwidthLimiter(bandwidth)
+        self.rate_window = rate_window
+
+        self._condition = threading.Condition()
+        self._queue: List[Tuple[int, int, DownloadTask]] = []
+        self._counter = itertools.count()
+        self._tasks: Dict[Tuple[str, str], DownloadTask] = {}
+        self._shutdown = False
+
+        self._bytes_lock = threading.Lock()
+        self._downloaded_bytes = 0
+        self._started: Optional[float] = None
+        self._samples = deque()
+
+        self._workers = [
+            threading.Thread(
+                target=self._work,
+                name=f"beletapi-download-{i}",
+                daemon=True,
+            )
+            for i in range(max_concurrent)
+        ]
+
+        for worker in self._workers:
+            worker.start()
+
+    def __enter__(self) -> "DownloadManager":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.shutdown()
+
+    @property
+    def bandwidth(self) -> Optional[float]:
+        return self._limiter.rate
+
+    @bandwidth.setter
+    def bandwidth(self, bandwidth: Optional[float]) -> None:
+        self._limiter.rate = bandwidth
+
+    @property
+    def tasks(self) -> List[DownloadTask]:
+        with self._condition:
+            return list(self._tasks.values())
+
+    def submit(
+        self,
+        file: BeletFile,
+        output_filename: Optional[str] = None,
+        priority: int = 0,
+        download_progress_callback: Optional[DownloadProgressProtocol] = None,
+    ) -> DownloadTask:
+        """Add a download to the queue
+
+        If the same file is already queued, running, paused or
+        completed with the same output, that task is returned and its
+        priority is raised to `priority` if it's higher.
+
+        Args:
+            file (BeletFile): file of a movie or an episode
+            output_filename (str): path where to download the file to
+            priority (int): higher priority tasks are started first
+            download_progress_callback (DownloadProgressProtocol):
+                download progress callback
+
+        Returns:
+            DownloadTask: task handle
+        """
+
+        if output_filename is None:
+            output_filename = self._downloader.default_output_filename(file)
+
+        key = (file.filename, os.path.abspath(output_filename))
+
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("download manager was shut down")
+
+            task = self._tasks.get(key)
+
+            if task is not None and task.state not in (
+                DownloadTask.FAILED,
+                DownloadTask.CANCELLED,
+            ):
+                if priority > task.priority:
+                    task.priority = priority
+
+                    if task.state == DownloadTask.QUEUED:
+                        self._push(task)
+
+                return task
+
+            task = DownloadTask(
+                self,
+                file,
+                output_filename,
+                priority,
+                download_progress_callback,
+            )
+            self._tasks[key] = task
+            self._push(task)
+
+            return task
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait until all submitted tasks are done
+
+        Paused tasks are waited for too, until they are resumed or
+        cancelled.
+
+        Returns:
+            bool: `False` if `timeout` passed
+        """
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        for task in self.tasks:
+            left = None
+
+            if deadline is not None:
+                left = max(deadline - time.monotonic(), 0)
+
+            if not task._done.wait(left):
+                return False
+
+        return True
+
+    def pause_all(self) -> None:
+        for task in self.tasks:
+            task.pause()
+
+    def resume_all(self) -> None:
+        for task in self.tasks:
+            task.resume()
+
+    def shutdown(self, cancel: bool = False) -> None:
+        """Stop the workers
+
+        Args:
+            cancel (bool): cancel queued and running tasks instead of
+                waiting for them
+        """
+
+        if cancel:
+            for task in self.tasks:
+                task.cancel()
+        else:
+            self.wait()
+
+        with self._condition:
+            self._shutdown = True
+            self._condition.notify_all()
+
+        for worker in self._workers:
+            worker.join()
+
+    def stats(self) -> DownloadManagerStats:
+        counts = dict.fromkeys(
+            (
+                DownloadTask.QUEUED,
+                DownloadTask.RUNNING,
+                DownloadTask.PAUSED,
+                DownloadTask.COMPLETED,
+                DownloadTask.FAILED,
+                DownloadTask.CANCELLED,
+            ),
+            0,
+        )
+
+        for task in self.tasks:
+            counts[task.state] += 1
+
+        now = time.monotonic()
+
+        with self._bytes_lock:
+            self._trim_samples(now)
+            downloaded_bytes = self._downloaded_bytes
+            window_bytes = sum(amount for _, amount in self._samples)
+            started = self._started
+
+        elapsed = now - started if started is not None else 0.0
+        window = min(self.rate_window, elapsed)
+
+        return DownloadManagerStats(
+            queued=counts[DownloadTask.QUEUED],
+            running=counts[DownloadTask.RUNNING],
+            paused=counts[DownloadTask.PAUSED],
+            completed=counts[DownloadTask.COMPLETED],
+            failed=counts[DownloadTask.FAILED],
+            cancelled=counts[DownloadTask.CANCELLED],
+            downloaded_bytes=downloaded_bytes,
+            current_rate=window_bytes / window if window > 0 else 0.0,
+            average_rate=downloaded_bytes / elapsed if elapsed > 0 else 0.0,
+        )
+
+    def _push(self, task: DownloadTask) -> None:
+        # stale entries (older priority, paused tasks) are skipped by
+        # workers, a task is started by the first valid entry
+        heapq.heappush(
+            self._queue, (-task.priority, next(self._counter), task)
+        )
+        self._condition.notify()
+
+    def _next_task(self) -> Optional[DownloadTask]:
+        with self._condition:
+            while True:
+                while self._queue:
+                    priority, _, task = heapq.heappop(self._queue)
+
+                    if (
+                        task.state == DownloadTask.QUEUED
+                        and -priority == task.priority
+                    ):
+                        task.state = DownloadTask.RUNNING
+                        task._started = True
+                        return task
+
+                if self._shutdown:
+                    return None
+
+                self._condition.wait()
+
+    def _work(self) -> None:
+        while True:
+            task = self._next_task()
+
+            if task is None:
+                return
+
+            with self._bytes_lock:
+                if self._started is None:
+                    self._started = time.monotonic()
+
+            try:
+                self._downloader.download(
+                    task.file,
+                    task.output_filename,
+                    task._callback,
+                    task._control,
+                )
+            except DownloadCancelledError:
+                state = DownloadTask.CANCELLED
+            except Exception as e:
+                task.error = e
+                state = DownloadTask.FAILED
+            else:
+                state = DownloadTask.COMPLETED
+
+            with self._condition:
+                task.state = state
+                task._done.set()
+
+    def _pause(self, task: DownloadTask) -> None:
+        with self._condition:
+            if task.state in (DownloadTask.QUEUED, DownloadTask.RUNNING):
+                task.state = DownloadTask.PAUSED
+                task._control.pause()
+
+    def _resume(self, task: DownloadTask) -> None:
+        with self._condition:
+            if task.state != DownloadTask.PAUSED:
+                return
+
+            task._control.resume()
+
+            if task._started:
+                task.state = DownloadTask.RUNNING
+            else:
+                task.state = DownloadTask.QUEUED
+                self._push(task)
+
+    def _cancel(self, task: DownloadTask) -> None:
+        with self._condition:
+            if task.done:
+                return
+
+            task._control.cancel()
+
+            # a started task is finished by its worker
+            if not task._started:
+                task.state = DownloadTask.CANCELLED
+                task._done.set()
+
+    def _account(self, amount: int) -> None:
+        now = time.monotonic()
+
+        with self._bytes_lock:
+            self._downloaded_bytes += amount
+            self._samples.append((now, amount))
+            self._trim_samples(now)
+
+    def _trim_samples(self, now: float) -> None:
+        while self._samples and now - self._samples[0][0] > self.rate_window:
+            self._samples.popleft()
@@ -0,0 +1,194 @@
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import m3u8
+
+from beletapi.session import BeletSession
+
+
+def fetch_playlist(session: BeletSession, url: str) -> m3u8.M3U8:
+    """Fetch and parse a playlist
+
+    `base_uri` of the returned playlist is set, so `absolute_uri`
+    of its segments and variants can be used directly.
+
+    Args:
+        session (BeletSession): session used for the request
+        url (str): playlist url
+
+    Returns:
+        m3u8.M3U8: parsed playlist
+    """
+
+    response = session.get(url)
+    response.raise_for_status()
+
+    return m3u8.M3U8(response.text, base_uri=url[: url.rfind("/") + 1])
+
+
+class PlaylistCacheStats(NamedTuple):
+    """Counters of `PlaylistCache`
+
+    Attributes:
+        entries: playlists currently cached
+        hits: lookups served from the cache or by a concurrent fetch
+        misses: lookups that fetched the playlist
+    """
+
+    entries: int
+    hits: int
+    misses: int
+
+
+class PlaylistCache:
+    """Parsed playlists by url, in memory
+
+    Entries expire `ttl` seconds after they were fetched, the least
+    recently used ones are evicted above `max_entries`. Concurrent
+    lookups of the same url wait for a single fetch. Pass the same
+    instance to several downloaders to share it.
+
+    Cached playlists are shared between callers, don't modify them.
+
+    Args:
+        ttl (float): seconds a playlist stays fresh
+        max_entries (int): maximum number of cached playlists
+    """
+
+    def __init__(self, ttl: float = 300.0, max_entries: int = 64) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        self._entries: OrderedDict[str, Tuple[float, m3u8.M3U8]] = (
+            OrderedDict()
+        )
+        self._fetching: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, session: BeletSession, url: str) -> m3u8.M3U8:
+        """Cached playlist of `url`, fetched if missing or expired
+
+        Args:
+            session (BeletSession): session used to fetch it
+            url (str): playlist url
+
+        Returns:
+            m3u8.M3U8: parsed playlist with `base_uri` set
+        """
+
+        with self._lock:
+            entry = self._entries.get(url)
+
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(url)
+                self._hits += 1
+                return entry[1]
+
+            future = self._fetching.get(url)
+            owner = future is None
+
+            if owner:
+                future = self._fetching[url] = Future()
+                self._misses += 1
+            else:
+                self._hits += 1
+
+        if not owner:
+            # fetched by another thread
+            return future.result()
+
+        try:
+            playlist = fetch_playlist(session, url)
+        except BaseException as e:
+            with self._lock:
+                del self._fetching[url]
+
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._fetching[url]
+            self._store(url, playlist)
+
+        future.set_result(playlist)
+        return playlist
+
+    def get_many(
+        self,
+        session: BeletSession,
+        urls: Iterable[str],
+        workers: int = 8,
+    ) -> List[m3u8.M3U8]:
+        """Playlists of `urls`, missing ones are fetched concurrently
+
+        Args:
+            session (BeletSession): session used to fetch them
+            urls (Iterable[str]): playlist urls
+            workers (int): maximum number of concurrent requests
+
+        Returns:
+            List[m3u8.M3U8]: playlists in order of `urls`
+        """
+
+        urls = list(urls)
+        unique = list(dict.fromkeys(urls))
+
+        if len(unique) <= 1:
+            return [self.get(session, url) for url in urls]
+
+        with ThreadPoolExecutor(
+            max_workers=min(workers, len(unique))
+        ) as executor:
+            playlists = dict(
+                zip(
+                    unique,
+                    executor.map(lambda url: self.get(session, url), unique),
+                )
+            )
+
+        return [playlists[url] for url in urls]
+
+    def invalidate(self, url: Optional[str] = None) -> None:
+        """Drop the playlist of `url`, or all playlists if `None`"""
+
+        with self._lock:
+            if url is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(url, None)
+
+    def stats(self) -> PlaylistCacheStats:
+        with self._lock:
+            return PlaylistCacheStats(
+                len(self._entries), self._hits, self._misses
+            )
+
+    def _store(self, url: str, playlist: m3u8.M3U8) -> None:
+        if self.ttl <= 0:
+            return
+
+        now = time.monotonic()
+        self._entries[url] = (now + self.ttl, playlist)
+        self._entries.move_to_end(url)
+
+        # expired entries first, then the least recently used ones
+        expired = [
+            key
+            for key, (expires, _) in self._entries.items()
+            if expires <= now
+        ]
+
+        for key in expired:
+            del self._entries[key]
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
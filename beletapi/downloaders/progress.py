@@ -0,0 +1,218 @@
+import time
+import bisect
+import inspect
+from collections import deque
+from itertools import accumulate
+from typing import Callable, NamedTuple, Optional
+
+import m3u8
+
+
+class DownloadProgress(NamedTuple):
+    """Progress of a download
+
+    Attributes:
+        downloaded_bytes: bytes downloaded so far
+        downloaded_segment: index of the last downloaded segment
+        max_segments: number of segments in the playlist
+        downloaded_duration: seconds of media downloaded so far
+        total_duration: seconds of media in the playlist
+        current_rate: bytes per second over the last few seconds
+        average_rate: bytes per second since the download started
+        eta: estimated seconds left, `None` until it can be estimated
+        speed: media seconds processed per second as reported by
+            ffmpeg, `None` for other downloaders
+    """
+
+    downloaded_bytes: int
+    downloaded_segment: int
+    max_segments: int
+    downloaded_duration: float
+    total_duration: float
+    current_rate: float
+    average_rate: float
+    eta: Optional[float]
+    speed: Optional[float] = None
+
+
+class ProgressTracker:
+    """Computes `DownloadProgress` and coalesces callback calls
+
+    Downloaders report every change with `update`, the callback is
+    called at most once per `interval` seconds and once more by
+    `finish`. ETA is estimated from segment durations of the playlist:
+    media seconds left divided by media seconds downloaded per second.
+
+    Callbacks get `(downloaded_bytes, downloaded_segment, max_segments)`
+    as before, callbacks that accept a `progress` keyword argument
+    additionally get the whole `DownloadProgress`.
+
+    Args:
+        m (m3u8.M3U8): media playlist being downloaded
+        callback: download progress callback, may be `None`
+        interval (float): minimum seconds between callback calls
+        rate_window (float): seconds `current_rate` is averaged over
+        downloaded_bytes (int): bytes already downloaded (resume)
+        downloaded_segment (int): index of the last segment already
+            downloaded, `-1` if none
+    """
+
+    def __init__(
+        self,
+        m: m3u8.M3U8,
+        callback: Optional[Callable[..., None]],
+        interval: float = 0.5,
+        rate_window: float = 5.0,
+        downloaded_bytes: int = 0,
+        downloaded_segment: int = -1,
+    ) -> None:
+        self._callback = callback
+        self._detailed = callback is not None and _accepts_progress(callback)
+        self.interval = interval
+        self.rate_window = rate_window
+
+        self._durations = list(
+            accumulate(segment.duration or 0 for segment in m.segments)
+        )
+        self.max_segments = len(self._durations)
+        self.total_duration = self._durations[-1] if self._durations else 0.0
+
+        self._bytes = downloaded_bytes
+        self._segment = downloaded_segment
+        self._duration = self._segment_duration(downloaded_segment)
+        self._speed = None
+
+        self._started = time.monotonic()
+        self._start_bytes = downloaded_bytes
+        self._start_duration = self._duration
+        self._samples = deque([(self._started, downloaded_bytes)])
+        self._last_call = self._started
+        self._dirty = False
+
+    def update(
+        self,
+        downloaded_bytes: int,
+        downloaded_segment: int,
+        downloaded_duration: Optional[float] = None,
+        speed: Optional[float] = None,
+    ) -> None:
+        """Record progress, calls the callback if `interval` passed
+
+        Args:
+            downloaded_bytes (int): bytes downloaded so far
+            downloaded_segment (int): index of the last downloaded
+                segment
+            downloaded_duration (float): seconds of media downloaded,
+                derived from `downloaded_segment` if not given
+            speed (float): media seconds per second, if known
+        """
+
+        self._bytes = downloaded_bytes
+        self._segment = downloaded_segment
+        self._duration = (
+            self._segment_duration(downloaded_segment)
+            if downloaded_duration is None
+            else downloaded_duration
+        )
+        self._speed = speed
+        self._dirty = True
+
+        now = time.monotonic()
+
+        if now - self._last_call >= self.interval:
+            self._call(now)
+
+    def finish(self) -> None:
+        """Call the callback with the latest progress if not yet done"""
+
+        if self._dirty:
+            self._call(time.monotonic())
+
+    def progress(self) -> DownloadProgress:
+        return self._progress(time.monotonic())
+
+    def segment_at(self, duration: float) -> int:
+        """Index of the last segment that ends within `duration`
+        seconds of media, `-1` if none"""
+
+        index = bisect.bisect_right(self._durations, duration) - 1
+        return min(index, self.max_segments - 1)
+
+    def _segment_duration(self, index: int) -> float:
+        if index < 0 or not self._durations:
+            return 0.0
+
+        return self._durations[min(index, self.max_segments - 1)]
+
+    def _progress(self, now: float) -> DownloadProgress:
+        elapsed = now - self._started
+        downloaded = self._bytes - self._start_bytes
+        average_rate = downloaded / elapsed if elapsed > 0 else 0.0
+
+        sample_time, sample_bytes = self._samples[0]
+        current_rate = (
+            (self._bytes - sample_bytes) / (now - sample_time)
+            if now > sample_time
+            else 0.0
+        )
+
+        # media seconds downloaded per second
+        eta = None
+        media_rate = (
+            (self._duration - self._start_duration) / elapsed
+            if elapsed > 0
+            else 0.0
+        )
+
+        if media_rate > 0:
+            eta = max(self.total_duration - self._duration, 0) / media_rate
+
+        return DownloadProgress(
+            downloaded_bytes=self._bytes,
+            downloaded_segment=self._segment,
+            max_segments=self.max_segments,
+            downloaded_duration=self._duration,
+            total_duration=self.total_duration,
+            current_rate=current_rate,
+            average_rate=average_rate,
+            eta=eta,
+            speed=self._speed,
+        )
+
+    def _call(self, now: float) -> None:
+        self._samples.append((now, self._bytes))
+
+        # keep one sample older than the window to measure against
+        while (
+            len(self._samples) > 2
+            and now - self._samples[1][0] >= self.rate_window
+        ):
+            self._samples.popleft()
+
+        self._last_call = now
+        self._dirty = False
+
+        if self._callback is None:
+            return
+
+        if self._detailed:
+            self._callback(
+                self._bytes,
+                self._segment,
+                self.max_segments,
+                progress=self._progress(now),
+            )
+        else:
+            self._callback(self._bytes, self._segment, self.max_segments)
+
+
+def _accepts_progress(callback: Callable[..., None]) -> bool:
+    try:
+        parameters = inspect.signature(callback).parameters
+    except (TypeError, ValueError):
+        return False
+
+    return "progress" in parameters or any(
+        parameter.kind == inspect.Parameter.VAR_KEYWORD
+        for parameter in parameters.values()
+    )
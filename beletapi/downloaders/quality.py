@@ -0,0 +1,395 @@
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import m3u8
+
+from beletapi.session import BeletSession
+from .playlist import PlaylistCache, fetch_playlist
+
+
+class Variant(NamedTuple):
+    """Variant stream of a master playlist
+
+    Attributes:
+        uri: absolute url of the media playlist
+        bandwidth: peak bits per second (`BANDWIDTH`)
+        resolution: `(width, height)` if known (`RESOLUTION`)
+        codecs: codecs if known (`CODECS`)
+    """
+
+    uri: str
+    bandwidth: int
+    resolution: Optional[Tuple[int, int]]
+    codecs: Optional[str] = None
+
+    @classmethod
+    def from_playlist(cls, playlist: m3u8.Playlist) -> "Variant":
+        info = playlist.stream_info
+        return cls(
+            playlist.absolute_uri,
+            info.bandwidth or 0,
+            info.resolution,
+            info.codecs,
+        )
+
+
+class QualityChoice(NamedTuple):
+    """Result of `QualitySelector.select`
+
+    Attributes:
+        variants: all variants, lowest bandwidth first
+        index: index of the chosen variant in `variants`
+        throughput: probed throughput in bits per second, `None` if
+            probing wasn't needed
+    """
+
+    variants: List[Variant]
+    index: int
+    throughput: Optional[float]
+
+    @property
+    def variant(self) -> Variant:
+        return self.variants[self.index]
+
+
+class ThroughputEstimator:
+    """Aggregate download throughput over a sliding window
+
+    Concurrent transfers report received bytes, the estimate is the
+    sum of bytes received in the last `window` seconds divided by the
+    window, so it measures what all connections achieve together.
+
+    Args:
+        window (float): seconds to average over
+        initial (float): estimate in bits per second until some data
+            is received
+    """
+
+    def __init__(
+        self, window: float = 10.0, initial: Optional[float] = None
+    ) -> None:
+        self.window = window
+        self._initial = initial
+        self._samples = deque()
+        self._total = 0
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def add(self, received_bytes: int) -> None:
+        now = time.monotonic()
+
+        with self._lock:
+            self._samples.append((now, received_bytes))
+            self._total += received_bytes
+            self._trim(now)
+
+    def estimate(self) -> Optional[float]:
+        """Throughput in bits per second"""
+
+        now = time.monotonic()
+
+        with self._lock:
+            self._trim(now)
+
+            if not self._samples:
+                return self._initial
+
+            elapsed = min(self.window, now - self._started)
+
+            if elapsed <= 0:
+                return self._initial
+
+            return self._total * 8 / elapsed
+
+    def _trim(self, now: float) -> None:
+        while self._samples and now - self._samples[0][0] > self.window:
+            self._total -= self._samples.popleft()[1]
+
+
+class QualitySelector:
+    """Chooses the variant of a master playlist to download
+
+    Without limits the highest `BANDWIDTH` variant is chosen. With
+    `max_bitrate` variants above it are skipped. With `target_time`
+    the first `probe_segments` segments of the lowest variant are
+    downloaded concurrently to measure throughput, and the highest
+    variant that can be downloaded within `target_time` seconds with
+    `safety` of that throughput is chosen. If none fits, the lowest
+    variant is used.
+
+    With `adaptive`, `SegmentDownloader` re-evaluates the choice after
+    every segment from the measured throughput and the time left. It
+    only switches between variants with the same resolution and codecs
+    whose segments are aligned, so the stream stays decodable with one
+    set of parameters (e.g. bitrate ladders of a single resolution).
+
+    Args:
+        target_time (float): seconds the download should finish in
+        max_bitrate (int): maximum variant bandwidth in bits per second
+        max_height (int): maximum vertical resolution (e.g. `720`)
+        probe_segments (int): number of segments to probe with
+        safety (float): fraction of the measured throughput to rely on
+        adaptive (bool): switch variants during the download
+    """
+
+    def __init__(
+        self,
+        target_time: Optional[float] = None,
+        max_bitrate: Optional[int] = None,
+        max_height: Optional[int] = None,
+        probe_segments: int = 3,
+        safety: float = 0.8,
+        adaptive: bool = False,
+    ) -> None:
+        self.target_time = target_time
+        self.max_bitrate = max_bitrate
+        self.max_height = max_height
+        self.probe_segments = probe_segments
+        self.safety = safety
+        self.adaptive = adaptive
+
+    def select(
+        self,
+        session: BeletSession,
+        master: m3u8.M3U8,
+        playlist_cache: Optional[PlaylistCache] = None,
+    ) -> QualityChoice:
+        """Choose a variant of `master`
+
+        Args:
+            session (BeletSession): session used for probing
+            master (m3u8.M3U8): master playlist with `base_uri` set
+            playlist_cache (PlaylistCache): cache of media playlists
+
+        Returns:
+            QualityChoice: all variants and the chosen one
+        """
+
+        variants = sorted(
+            (Variant.from_playlist(playlist) for playlist in master.playlists),
+            key=lambda variant: variant.bandwidth,
+        )
+        throughput = None
+        duration = None
+
+        if self.target_time is not None and len(variants) > 1:
+            if playlist_cache is not None:
+                lowest = playlist_cache.get(session, variants[0].uri)
+            else:
+                lowest = fetch_playlist(session, variants[0].uri)
+
+            duration = sum(
+                segment.duration or 0 for segment in lowest.segments
+            )
+            throughput = self._probe(session, lowest)
+
+        index = self.choose(variants, throughput, duration, self.target_time)
+        return QualityChoice(variants, index, throughput)
+
+    def choose(
+        self,
+        variants: List[Variant],
+        throughput: Optional[float],
+        duration: Optional[float],
+        time_left: Optional[float],
+    ) -> int:
+        """Index of the best variant that fits the limits
+
+        Args:
+            variants (List[Variant]): lowest bandwidth first
+            throughput (float): bits per second, `None` if unknown
+            duration (float): seconds of media left to download
+            time_left (float): seconds left to download it in
+        """
+
+        budget = float("inf")
+
+        if self.max_bitrate is not None:
+            budget = self.max_bitrate
+
+        if (
+            throughput is not None
+            and duration
+            and time_left is not None
+        ):
+            budget = min(
+                budget,
+                throughput * self.safety * max(time_left, 0) / duration,
+            )
+
+        chosen = 0
+
+        for index, variant in enumerate(variants):
+            if variant.bandwidth > budget:
+                continue
+
+            if (
+                self.max_height is not None
+                and variant.resolution is not None
+                and variant.resolution[1] > self.max_height
+            ):
+                continue
+
+            chosen = index
+
+        return chosen
+
+    def _probe(self, session: BeletSession, m: m3u8.M3U8) -> Optional[float]:
+        segments = m.segments[: self.probe_segments]
+
+        if not segments:
+            return None
+
+        def fetch(segment: m3u8.Segment) -> int:
+            response = session.get(segment.absolute_uri)
+            response.raise_for_status()
+            return len(response.content)
+
+        start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=len(segments)) as executor:
+            received = sum(executor.map(fetch, segments))
+
+        elapsed = time.perf_counter() - start
+        return received * 8 / elapsed if elapsed > 0 else None
+
+
+class AdaptivePlaylist:
+    """Aligned media playlists of all variants, switched by throughput
+
+    Used by `SegmentDownloader` in place of a media playlist.
+    `segments[i]` is the i-th segment of the currently chosen variant,
+    the choice is updated by `update` as segments arrive. The url each
+    segment was fetched from is recorded in `segment_uris`.
+
+    Args:
+        selector (QualitySelector): selection policy
+        choice (QualityChoice): initial choice, see `compatible`
+        playlists (List[m3u8.M3U8]): media playlists of
+            `choice.variants`, see `is_aligned`
+    """
+
+    def __init__(
+        self,
+        selector: QualitySelector,
+        choice: QualityChoice,
+        playlists: List[m3u8.M3U8],
+    ) -> None:
+        self.selector = selector
+        self.variants = choice.variants
+        self.playlists = playlists
+        self.current = choice.index
+        self.estimator = ThroughputEstimator(initial=choice.throughput)
+
+        # (segment index, variant index) of every switch
+        self.switches: List[Tuple[int, int]] = []
+        self.segment_uris: Dict[int, str] = {}
+
+        self._durations = [
+            segment.duration or 0 for segment in playlists[0].segments
+        ]
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def compatible(choice: QualityChoice) -> QualityChoice:
+        """Restrict `choice` to variants that can be mixed with the
+        chosen one: same resolution and codecs
+
+        Variants of unknown resolution or codecs are never mixed.
+        """
+
+        chosen = choice.variant
+
+        if chosen.resolution is None or chosen.codecs is None:
+            return QualityChoice([chosen], 0, choice.throughput)
+
+        variants = [
+            variant
+            for variant in choice.variants
+            if variant.resolution == chosen.resolution
+            and variant.codecs == chosen.codecs
+        ]
+
+        return QualityChoice(
+            variants, variants.index(chosen), choice.throughput
+        )
+
+    @staticmethod
+    def is_aligned(playlists: List[m3u8.M3U8]) -> bool:
+        """Whether segments with the same index cover the same media
+        time in all `playlists`
+        """
+
+        durations = {
+            tuple(
+                round(segment.duration or 0, 3)
+                for segment in playlist.segments
+            )
+            for playlist in playlists
+        }
+        return len(durations) == 1
+
+    @property
+    def segments(self) -> "_AdaptiveSegments":
+        return _AdaptiveSegments(self)
+
+    @property
+    def keys(self) -> List[Optional[m3u8.Key]]:
+        return [key for playlist in self.playlists for key in playlist.keys]
+
+    @property
+    def is_endlist(self) -> bool:
+        return True
+
+    @property
+    def variant(self) -> Variant:
+        return self.variants[self.current]
+
+    def update(self, index: int, received_bytes: int) -> None:
+        """Record a received segment and re-evaluate the choice
+
+        Args:
+            index (int): index of the received segment
+            received_bytes (int): its size
+        """
+
+        self.estimator.add(received_bytes)
+
+        time_left = None
+
+        if self.selector.target_time is not None:
+            elapsed = time.monotonic() - self._started
+            time_left = self.selector.target_time - elapsed
+
+        with self._lock:
+            duration = sum(self._durations[index + 1 :])
+            chosen = self.selector.choose(
+                self.variants,
+                self.estimator.estimate(),
+                duration,
+                time_left,
+            )
+
+            if chosen != self.current:
+                self.current = chosen
+                self.switches.append((index + 1, chosen))
+
+
+class _AdaptiveSegments:
+    def __init__(self, playlist: AdaptivePlaylist) -> None:
+        self._playlist = playlist
+
+    def __len__(self) -> int:
+        return len(self._playlist._durations)
+
+    def __getitem__(self, index: int) -> m3u8.Segment:
+        playlist = self._playlist
+        return playlist.playlists[playlist.current].segments[index]
+
+    def __iter__(self) -> Iterator[m3u8.Segment]:
+        for index in range(len(self)):
+            yield self[index]
@@ -0,0 +1,349 @@
+import os
+import shutil
+import hashlib
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import (
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+try:
+    import fcntl
+except ImportError:  # not on Windows
+    fcntl = None
+
+
+# ioctl cloning a whole file (btrfs, xfs, ...)
+FICLONE = 0x40049409
+
+
+class SegmentCacheStats(NamedTuple):
+    """Counters of `SegmentCache`
+
+    Attributes:
+        entries: segments stored
+        size: bytes stored
+        hits: lookups of stored segments
+        misses: lookups of missing segments
+    """
+
+    entries: int
+    size: int
+    hits: int
+    misses: int
+
+
+class SegmentCache:
+    """Size bounded on-disk store of HLS segments shared by downloads
+
+    Segments are stored once per content (`<sha256>.ts`), urls map to
+    them through small index files, so the same data reached through
+    different urls is stored only once. Least recently used segments
+    are evicted, down to `EVICT_TO` of `max_size`, once the store
+    grows over `max_size` bytes. Index files of evicted segments are
+    removed with them.
+
+    Several downloaders, and processes, can use the same directory.
+    Stored bytes are counted as they are stored, the directory is
+    scanned again on eviction and every `RESCAN_INTERVAL` stores to
+    pick up segments of other processes, under a lock file on POSIX
+    systems (`fcntl.flock`). Until then the store can exceed
+    `max_size` by what other processes stored. Without `fcntl`
+    (Windows) only threads of one process may share it.
+
+    Downloaders consult it before requesting a segment and store what
+    they receive:
+    `SegmentDownloader(client, segment_cache=SegmentCache("segments"))`
+
+    Args:
+        directory (str): directory of the store
+        max_size (int): maximum bytes stored
+        key (Callable[[str], str]): maps a segment url to its cache
+            key, e.g. to strip signatures from the query string
+            (default: the url itself)
+    """
+
+    # stores between scans of the directory
+    RESCAN_INTERVAL = 256
+
+    # fraction of `max_size` eviction frees the store down to
+    EVICT_TO = 0.9
+
+    def __init__(
+        self,
+        directory: str = "beletapisegments",
+        max_size: int = 2 * 1024**3,
+        key: Optional[Callable[[str], str]] = None,
+    ) -> None:
+        self.directory = directory
+        self.max_size = max_size
+        self._key = key
+
+        self._lock = threading.Lock()
+        self._evict_lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._stores = 0
+
+        os.makedirs(directory, exist_ok=True)
+
+        self._size = self.size
+
+    @property
+    def size(self) -> int:
+        objects, _ = self._scan()
+        return sum(size for size, _ in objects.values())
+
+    def stats(self) -> SegmentCacheStats:
+        objects, _ = self._scan()
+
+        with self._lock:
+            return SegmentCacheStats(
+                len(objects),
+                sum(size for size, _ in objects.values()),
+                self._hits,
+                self._misses,
+            )
+
+    def path(self, url: str) -> Optional[str]:
+        """Path of the stored segment of `url`, `None` if not stored
+
+        The file is shared, it must not be modified.
+        """
+
+        index_path = self._index_path(url)
+
+        try:
+            with open(index_path, "r", encoding="ascii") as file:
+                path = self._object_path(file.read().strip())
+
+            # mtime is used as last access time for LRU eviction
+            os.utime(path)
+        except OSError:
+            path = None
+
+            if os.path.exists(index_path):
+                # segment was evicted
+                self._remove(index_path)
+
+        with self._lock:
+            if path is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+
+        return path
+
+    def read(self, url: str) -> Optional[bytes]:
+        """Stored segment of `url`, `None` if not stored"""
+
+        path = self.path(url)
+
+        if path is None:
+            return None
+
+        try:
+            with open(path, "rb") as file:
+                return file.read()
+        except OSError:
+            # evicted meanwhile
+            return None
+
+    def store(self, url: str, data: bytes) -> str:
+        """Store `data` as the segment of `url`
+
+        Returns:
+            str: path of the stored segment
+        """
+
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+
+        added = 0
+
+        try:
+            # already stored, now the most recently used
+            os.utime(path)
+        except FileNotFoundError:
+            self._write(path, data)
+            added = len(data)
+
+            # read-only, materialized hard links share the file
+            os.chmod(path, 0o444)
+
+        self._write(self._index_path(url), digest.encode("ascii"))
+
+        with self._lock:
+            self._size += added
+            self._stores += 1
+            rescan = (
+                self._size > self.max_size
+                or self._stores % self.RESCAN_INTERVAL == 0
+            )
+
+        if rescan:
+            with self._locked():
+                size = self._evict()
+
+            with self._lock:
+                self._size = size
+
+        return path
+
+    def materialize(self, url: str, destination: str) -> Optional[str]:
+        """Create `destination` with the stored segment of `url`
+
+        A hard link is tried first, then a reflink (copy-on-write
+        clone), then a plain copy. The first two need `destination`
+        on the same filesystem as the store.
+
+        Returns:
+            str: `"hardlink"`, `"reflink"` or `"copy"`, `None` if the
+                segment isn't stored
+        """
+
+        path = self.path(url)
+
+        if path is None:
+            return None
+
+        try:
+            os.link(path, destination)
+            return "hardlink"
+        except OSError:
+            pass
+
+        if fcntl is not None:
+            try:
+                with open(path, "rb") as source, open(
+                    destination, "wb"
+                ) as target:
+                    fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+
+                return "reflink"
+            except OSError:
+                pass
+
+        try:
+            shutil.copyfile(path, destination)
+        except FileNotFoundError:
+            # evicted meanwhile
+            return None
+
+        return "copy"
+
+    def clear(self) -> None:
+        with self._locked():
+            for filename in os.listdir(self.directory):
+                if filename.endswith((".ts", ".url")):
+                    self._remove(os.path.join(self.directory, filename))
+
+        with self._lock:
+            self._size = 0
+
+    def _index_path(self, url: str) -> str:
+        key = self._key(url) if self._key is not None else url
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.directory, digest + ".url")
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest + ".ts")
+
+    def _write(self, path: str, data: bytes) -> None:
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        # threads of this process, then other processes
+        with self._evict_lock:
+            if fcntl is None:
+                yield
+                return
+
+            lock_path = os.path.join(self.directory, ".lock")
+
+            with open(lock_path, "a") as lock_file:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _scan(self) -> Tuple[Dict[str, Tuple[int, float]], List[str]]:
+        """`(size, mtime)` of stored segments by path, and index files"""
+
+        objects = {}
+        index_paths = []
+
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name.endswith(".url"):
+                    index_paths.append(entry.path)
+
+                if not entry.name.endswith(".ts"):
+                    continue
+
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    # evicted meanwhile
+                    continue
+
+                objects[entry.path] = (stat.st_size, stat.st_mtime)
+
+        return objects, index_paths
+
+    def _evict(self) -> int:
+        """Evict least recently used segments if the store is too
+        large, returns the bytes stored afterwards
+        """
+
+        # segments stored by other processes count as well
+        objects, index_paths = self._scan()
+        total = sum(size for size, _ in objects.values())
+
+        if total <= self.max_size:
+            return total
+
+        for path in sorted(objects, key=lambda path: objects[path][1]):
+            total -= objects.pop(path)[0]
+            self._remove(path)
+
+            if total <= self.max_size * self.EVICT_TO:
+                break
+
+        # index files of evicted segments, including ones evicted by
+        # other processes meanwhile
+        for index_path in index_paths:
+            try:
+                with open(index_path, "r", encoding="ascii") as file:
+                    path = self._object_path(file.read().strip())
+            except OSError:
+                continue
+
+            # objects are written before their index, a new index of
+            # another process always has its object
+            if path not in objects and not os.path.exists(path):
+                self._remove(index_path)
+
+        return total
@@ -0,0 +1,380 @@
+import os
+import subprocess
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+import m3u8
+
+from .downloaderbase import (
+    DownloadControl,
+    DownloaderBase,
+    DownloadProgressProtocol,
+)
+from .journal import SegmentJournal
+from .progress import ProgressTracker
+from .quality import AdaptivePlaylist
+from beletapi.models.file import BeletFile
+from beletapi.remux import remux_file
+from beletapi.exceptions import RemuxError, UnsupportedPlaylistError
+
+
+class SegmentDownloader(DownloaderBase):
+    """Downloads HLS segments concurrently through the session
+
+    Segments are fetched by `workers` threads and written to the
+    output in playlist order. The resulting MPEG-TS stream is remuxed
+    into the output container by ffmpeg afterwards, or in pure Python
+    for MP4 outputs (`.mp4`, `.m4v`, `.mov`) with `remuxer="python"`.
+    Nothing is remuxed if `output_filename` ends with `.ts`.
+
+    With `resume` enabled, completed segments are recorded in a
+    `<output_filename>.journal` sidecar file, so downloading the same
+    file again after a failure only fetches the missing segments.
+
+    `stream` and `download_to` deliver the MPEG-TS stream without
+    touching the disk, e.g. to a transcoder's stdin. Pass `stream` to
+    `beletapi.remux.remux` to get MP4 instead.
+
+    Use `functools.partial(SegmentDownloader, workers=16)` as
+    `downloader_cls` of `BeletClient` to change the worker count.
+
+    Args:
+        workers (int): number of concurrent segment requests
+        resume (bool): resume interrupted downloads from the journal
+        read_ahead (int): maximum number of segments fetched ahead of
+            the one being written (default: `2 * workers`)
+        remuxer (str): `"ffmpeg"`, or `"python"` to remux MP4 outputs
+            without ffmpeg (fragmented MP4, other containers still use
+            ffmpeg)
+    """
+
+    REMUXERS = ("ffmpeg", "python")
+
+    MP4_EXTENSIONS = (".mp4", ".m4v", ".mov")
+
+    def __init__(
+        self,
+        *args,
+        workers: int = 8,
+        resume: bool = True,
+        read_ahead: Optional[int] = None,
+        remuxer: str = "ffmpeg",
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+
+        if workers < 1:
+            raise ValueError(f"workers must be positive -> {workers}")
+
+        if remuxer not in self.REMUXERS:
+            raise ValueError(f"unknown remuxer -> {remuxer}")
+
+        self._workers = workers
+        self._resume = resume
+        self._read_ahead = max(read_ahead or workers * 2, 1)
+        self._remuxer = remuxer
+
+    def _fetch_adaptive_segment(
+        self,
+        m: AdaptivePlaylist,
+        index: int,
+        control: Optional[DownloadControl] = None,
+    ) -> bytes:
+        segment = m.segments[index]
+        data = self._fetch_segment(segment, control)
+        m.segment_uris[index] = segment.absolute_uri
+        m.update(index, len(data))
+        return data
+
+    def _iter_segments(
+        self,
+        m: m3u8.M3U8,
+        start: int = 0,
+        control: Optional[DownloadControl] = None,
+    ) -> Iterator[Tuple[int, bytes]]:
+        """Yield `(index, data)` of segments in playlist order
+
+        At most `read_ahead` segments are kept in flight, so memory
+        usage doesn't depend on the length of the playlist.
+        """
+
+        segments = m.segments
+        window = self._read_ahead
+        adaptive = isinstance(m, AdaptivePlaylist)
+        pending = deque()
+        index = start
+
+        workers = min(self._workers, window)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            try:
+                while index < len(segments) or pending:
+                    while index < len(segments) and len(pending) < window:
+                        if adaptive:
+                            # variant is chosen when the fetch starts
+                            future = executor.submit(
+                                self._fetch_adaptive_segment,
+                                m,
+                                index,
+                                control,
+                            )
+                        else:
+                            future = executor.submit(
+                                self._fetch_segment, segments[index], control
+                            )
+                        pending.append((index, future))
+                        index += 1
+
+                    segment_index, future = pending.popleft()
+                    yield segment_index, future.result()
+            finally:
+                for _, future in pending:
+                    future.cancel()
+
+    def stream(
+        self,
+        file: BeletFile,
+        download_progress_callback: Optional[DownloadProgressProtocol] = None,
+        control: Optional[DownloadControl] = None,
+    ) -> Iterator[memoryview]:
+        """Yield the MPEG-TS stream of `file` segment by segment
+
+        Buffers are views of the received segments, nothing is copied
+        or joined. At most `read_ahead` segments are buffered besides
+        the one being consumed. Closing the iterator early cancels
+        the pending requests.
+
+        Args:
+            file (BeletFile): `BeletFile` object
+            download_progress_callback (DownloadProgressProtocol):
+                download progress callback
+            control (DownloadControl): pause/cancel/bandwidth control
+
+        Yields:
+            memoryview: segments in playlist order
+        """
+
+        _, m = self._fetch_segment_playlist(file)
+        self._check_playlist(m)
+
+        tracker = self._create_progress_tracker(m, download_progress_callback)
+        downloaded_bytes = 0
+
+        for index, data in self._iter_segments(m, 0, control):
+            downloaded_bytes += len(data)
+            tracker.update(downloaded_bytes, index)
+
+            yield memoryview(data)
+
+        tracker.finish()
+
+    def download_to(
+        self,
+        file: BeletFile,
+        output: BinaryIO,
+        download_progress_callback: Optional[DownloadProgressProtocol] = None,
+        control: Optional[DownloadControl] = None,
+    ) -> int:
+        """Write the MPEG-TS stream of `file` to a file object or pipe
+
+        `output` must be blocking and isn't closed. Raw (unbuffered)
+        outputs that accept only part of a buffer are written to until
+        all of it is out.
+
+        Args:
+            file (BeletFile): `BeletFile` object
+            output (BinaryIO): writable binary file object, e.g.
+                `subprocess.Popen(...).stdin` or `sys.stdout.buffer`
+            download_progress_callback (DownloadProgressProtocol):
+                download progress callback
+            control (DownloadControl): pause/cancel/bandwidth control
+
+        Returns:
+            int: number of bytes written
+        """
+
+        written = 0
+
+        for buffer in self.stream(file, download_progress_callback, control):
+            while buffer:
+                count = output.write(buffer)
+
+                # buffered writers return None or the whole length
+                if count is None or count >= len(buffer):
+                    written += len(buffer)
+                    break
+
+                written += count
+                buffer = buffer[count:]
+
+        output.flush()
+
+        return written
+
+    def _fetch_segment_playlist(
+        self, file: BeletFile
+    ) -> Tuple[str, m3u8.M3U8 | AdaptivePlaylist]:
+        """Playlist to download and its source, which identifies the
+        downloaded media in the resume journal
+        """
+
+        selector = self._quality_selector
+
+        if selector is None or not selector.adaptive:
+            return self._fetch_media_playlist(file)
+
+        cache = self._playlist_cache
+        m = cache.get(self._session, file.filename)
+
+        if m.is_endlist:
+            return file.filename, m
+
+        self._prefetch_variants(m)
+
+        choice = AdaptivePlaylist.compatible(
+            selector.select(self._session, m, cache)
+        )
+        uris = [variant.uri for variant in choice.variants]
+        playlists = cache.get_many(self._session, uris)
+
+        if len(playlists) == 1 or not AdaptivePlaylist.is_aligned(
+            playlists
+        ):
+            # segments can't be mixed, stick to the initial choice
+            return uris[choice.index], playlists[choice.index]
+
+        # segments may come from any of these variants
+        return " ".join(uris), AdaptivePlaylist(selector, choice, playlists)
+
+    @staticmethod
+    def _segment_uri(m: m3u8.M3U8 | AdaptivePlaylist, index: int) -> str:
+        if isinstance(m, AdaptivePlaylist):
+            return m.segment_uris.pop(index)
+
+        return m.segments[index].absolute_uri
+
+    @staticmethod
+    def _is_segment_of(
+        m: m3u8.M3U8 | AdaptivePlaylist, index: int, uri: Optional[str]
+    ) -> bool:
+        if isinstance(m, AdaptivePlaylist):
+            return any(
+                playlist.segments[index].absolute_uri == uri
+                for playlist in m.playlists
+            )
+
+        return m.segments[index].absolute_uri == uri
+
+    def _check_playlist(self, m: m3u8.M3U8) -> None:
+        for key in m.keys:
+            if key is not None and key.method != "NONE":
+                raise UnsupportedPlaylistError(
+                    f"encrypted segments ({key.method})"
+                )
+
+    def _remux(self, input_filename: str, output_filename: str) -> None:
+        extension = os.path.splitext(output_filename)[1].lower()
+
+        if self._remuxer == "python" and extension in self.MP4_EXTENSIONS:
+            remux_file(input_filename, output_filename)
+            return
+
+        proc = subprocess.run(
+            [
+                "ffmpeg", "-y",
+                "-i", input_filename,
+                "-bsf:a", "aac_adtstoasc",
+                "-c", "copy",
+                output_filename,
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+
+        if proc.returncode != 0:
+            raise RemuxError(proc.stderr.decode("utf-8", "replace")[-512:])
+
+    def _write_segments(
+        self,
+        m: m3u8.M3U8,
+        part_filename: str,
+        start: int,
+        downloaded_bytes: int,
+        journal: Optional[SegmentJournal],
+        tracker: ProgressTracker,
+        control: Optional[DownloadControl],
+    ) -> None:
+        with open(part_filename, "ab" if start else "wb") as part_file:
+            for index, data in self._iter_segments(m, start, control):
+                part_file.write(data)
+                downloaded_bytes += len(data)
+
+                uri = self._segment_uri(m, index)
+
+                if journal is not None:
+                    # the journal must never get ahead of the part file
+                    part_file.flush()
+                    journal.append(index, data, uri)
+
+                tracker.update(downloaded_bytes, index)
+
+        tracker.finish()
+
+    # override
+    def download(
+        self,
+        file: BeletFile,
+        output_filename: Optional[str],
+        download_progress_callback: Optional[DownloadProgressProtocol] = None,
+        control: Optional[DownloadControl] = None,
+    ) -> str:
+        if output_filename is None:
+            output_filename = self.default_output_filename(file)
+
+        source, m = self._fetch_segment_playlist(file)
+        self._check_playlist(m)
+
+        remux = os.path.splitext(output_filename)[1].lower() != ".ts"
+        part_filename = output_filename + (".part.ts" if remux else ".part")
+
+        max_segments = len(m.segments)
+        journal = SegmentJournal(
+            output_filename + ".journal", source, max_segments
+        )
+
+        if self._resume:
+            with journal:
+                start, downloaded_bytes = journal.resume(
+                    part_filename,
+                    lambda index, uri: self._is_segment_of(m, index, uri),
+                )
+                tracker = self._create_progress_tracker(
+                    m, download_progress_callback, downloaded_bytes, start - 1
+                )
+                self._write_segments(
+                    m,
+                    part_filename,
+                    start,
+                    downloaded_bytes,
+                    journal,
+                    tracker,
+                    control,
+                )
+        else:
+            tracker = self._create_progress_tracker(
+                m, download_progress_callback
+            )
+            self._write_segments(
+                m, part_filename, 0, 0, None, tracker, control
+            )
+
+        if remux:
+            self._remux(part_filename, output_filename)
+            os.remove(part_filename)
+        else:
+            os.replace(part_filename, output_filename)
+
+        journal.remove()
+
+        return output_filename
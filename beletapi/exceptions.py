@@ -32,3 +32,32 @@ class APIStatusError(Exception):
     def raise_for_status(json_data) -> None:
         if json_data["status"] == "error":
             raise APIStatusError(json_data["message"])
+
+
+class RemuxError(Exception):
+    def __init__(self, message) -> None:
+        super().__init__("Remux error -> {}".format(message))
+
+
+class UnsupportedPlaylistError(Exception):
+    def __init__(self, message) -> None:
+        super().__init__("Unsupported playlist -> {}".format(message))
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, host) -> None:
+        super().__init__(
+            "Circuit is open, host is failing -> {}".format(host)
+        )
+
+
+class DownloadCancelledError(Exception):
+    def __init__(self, filename) -> None:
+        super().__init__("Download was cancelled -> {}".format(filename))
+
+
+class FFmpegError(Exception):
+    def __init__(self, returncode, message) -> None:
+        super().__init__(
+            "ffmpeg exited with code {} -> {}".format(returncode, message)
+        )
@@ -0,0 +1,260 @@
+import bisect
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Tuple
+
+from .api import Apis
+
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+class Histogram:
+    """Cumulative latency histogram in Prometheus style"""
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        result = []
+        total = 0
+
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            result.append((repr(bound), total))
+
+        result.append(("+Inf", total + self.counts[-1]))
+
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "buckets": dict(self.cumulative()),
+        }
+
+
+class SessionMetrics:
+    """Request metrics of a `BeletSession`
+
+    Requests are labeled by templated endpoint (`Apis.resolve_endpoint`,
+    e.g. `film_api.movie`), requests to other hosts (HLS playlists
+    and segments) are labeled `other`. Latency is measured until the
+    body is read (until headers for streamed responses).
+    """
+
+    OTHER = "other"
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS) -> None:
+        self._buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self.reset()
+
+    @classmethod
+    def endpoint_of(cls, url: str) -> str:
+        return Apis.resolve_endpoint(url) or cls.OTHER
+
+    def reset(self) -> None:
+        with self._lock:
+            self._requests = defaultdict(int)
+            self._latency = defaultdict(lambda: Histogram(self._buckets))
+            self._bytes = defaultdict(int)
+            self._retries = defaultdict(int)
+            self._cache = defaultdict(int)
+            self._refreshes = defaultdict(int)
+            self._refresh_latency = Histogram(self._buckets)
+
+    def record_request(
+        self,
+        endpoint: str,
+        method: str,
+        status: int | str,
+        latency: float,
+        received_bytes: int,
+    ) -> None:
+        with self._lock:
+            self._requests[(endpoint, method, str(status))] += 1
+            self._latency[(endpoint, method)].observe(latency)
+            self._bytes[endpoint] += received_bytes
+
+    def record_retry(self, endpoint: str) -> None:
+        """Request was replayed after 401 and token refresh"""
+
+        with self._lock:
+            self._retries[endpoint] += 1
+
+    def record_cache(self, endpoint: str, result: str) -> None:
+        """`result` is `hit`, `miss` or `revalidated`"""
+
+        with self._lock:
+            self._cache[(endpoint, result)] += 1
+
+    def record_token_refresh(self, latency: float, success: bool) -> None:
+        with self._lock:
+            self._refreshes["ok" if success else "error"] += 1
+            self._refresh_latency.observe(latency)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Copy of all metrics grouped by endpoint
+
+        Returns:
+            Dict[str, Any]: `{"endpoints": {name: {"requests": {method:
+                {status: count}}, "latency": {method: histogram},
+                "bytes_received", "retries_401", "cache": {result:
+                count}}}, "token_refresh": {...}}`
+        """
+
+        with self._lock:
+            endpoints: Dict[str, Dict[str, Any]] = {}
+
+            def endpoint_entry(endpoint: str) -> Dict[str, Any]:
+                return endpoints.setdefault(
+                    endpoint,
+                    {
+                        "requests": {},
+                        "latency": {},
+                        "bytes_received": 0,
+                        "retries_401": 0,
+                        "cache": {},
+                    },
+                )
+
+            for (endpoint, method, status), count in self._requests.items():
+                entry = endpoint_entry(endpoint)["requests"]
+                entry.setdefault(method, {})[status] = count
+
+            for (endpoint, method), histogram in self._latency.items():
+                entry = endpoint_entry(endpoint)["latency"]
+                entry[method] = histogram.snapshot()
+
+            for endpoint, received in self._bytes.items():
+                endpoint_entry(endpoint)["bytes_received"] = received
+
+            for endpoint, count in self._retries.items():
+                endpoint_entry(endpoint)["retries_401"] = count
+
+            for (endpoint, result), count in self._cache.items():
+                endpoint_entry(endpoint)["cache"][result] = count
+
+            return {
+                "endpoints": endpoints,
+                "token_refresh": {
+                    "results": dict(self._refreshes),
+                    "latency": self._refresh_latency.snapshot(),
+                },
+            }
+
+    def to_prometheus(self, prefix: str = "beletapi") -> str:
+        """Render metrics in Prometheus text exposition format"""
+
+        lines = []
+
+        def header(name: str, kind: str, help_text: str) -> None:
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+
+        def histogram(
+            name: str, labels: Dict[str, str], value: Histogram
+        ) -> None:
+            for le, count in value.cumulative():
+                lines.append(
+                    f"{prefix}_{name}_bucket"
+                    f"{_labels(dict(labels, le=le))} {count}"
+                )
+
+            lines.append(f"{prefix}_{name}_sum{_labels(labels)} {value.sum}")
+            lines.append(
+                f"{prefix}_{name}_count{_labels(labels)} {value.count}"
+            )
+
+        with self._lock:
+            header("requests_total", "counter", "HTTP requests sent")
+            for (endpoint, method, status), count in self._requests.items():
+                labels = {
+                    "endpoint": endpoint, "method": method, "status": status
+                }
+                lines.append(
+                    f"{prefix}_requests_total{_labels(labels)} {count}"
+                )
+
+            header(
+                "request_duration_seconds", "histogram", "HTTP request latency"
+            )
+            for (endpoint, method), value in self._latency.items():
+                histogram(
+                    "request_duration_seconds",
+                    {"endpoint": endpoint, "method": method},
+                    value,
+                )
+
+            header("received_bytes_total", "counter", "Response body bytes")
+            for endpoint, received in self._bytes.items():
+                labels = {"endpoint": endpoint}
+                lines.append(
+                    f"{prefix}_received_bytes_total{_labels(labels)} "
+                    f"{received}"
+                )
+
+            header(
+                "token_retries_total",
+                "counter",
+                "Requests replayed after 401 and token refresh",
+            )
+            for endpoint, count in self._retries.items():
+                labels = {"endpoint": endpoint}
+                lines.append(
+                    f"{prefix}_token_retries_total{_labels(labels)} {count}"
+                )
+
+            header("cache_requests_total", "counter", "Response cache lookups")
+            for (endpoint, result), count in self._cache.items():
+                labels = {"endpoint": endpoint, "result": result}
+                lines.append(
+                    f"{prefix}_cache_requests_total{_labels(labels)} {count}"
+                )
+
+            header("token_refresh_total", "counter", "Token refreshes")
+            for result, count in self._refreshes.items():
+                labels = {"result": result}
+                lines.append(
+                    f"{prefix}_token_refresh_total{_labels(labels)} {count}"
+                )
+
+            header(
+                "token_refresh_duration_seconds",
+                "histogram",
+                "Token refresh latency",
+            )
+            histogram(
+                "token_refresh_duration_seconds", {}, self._refresh_latency
+            )
+
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+
+    pairs = (f'{key}="{_escape(value)}"' for key, value in labels.items())
+    return "{" + ",".join(pairs) + "}"
+
+
+def _escape(value: str) -> str:
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\n", "\\n")
+        .replace('"', '\\"')
+    )
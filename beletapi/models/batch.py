@@ -0,0 +1,17 @@
+from typing import Dict, List, NamedTuple, Optional
+
+from .moviebase import BeletMovieBase
+
+
+class BeletBatchResult(NamedTuple):
+    """Result of `BeletClient.get_movies`
+
+    `movies` is aligned with `ids` (deduplicated input order), items
+    that failed are `None` in `movies` and their exception is stored
+    in `errors` under the movie id. Inputs that couldn't be parsed
+    are kept in `ids` as they were given.
+    """
+
+    ids: List[int | str]
+    movies: List[Optional[BeletMovieBase]]
+    errors: Dict[int | str, Exception]
@@ -1,4 +1,6 @@
-from typing import Optional, List, Dict, Any
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict, Any, Tuple
 
 from .moviebase import BeletMovieBase
 
@@ -9,6 +11,8 @@ from .file import BeletFile
 
 
 class BeletMovie(BeletMovieBase):
+    __slots__ = ("_files",)
+
     _files: Optional[List[BeletFile]]
 
     def __init__(self, session: BeletSession, **kwargs) -> None:
@@ -26,23 +30,41 @@ class BeletMovie(BeletMovieBase):
         if self._files is not None:
             return self._files
 
-        response = self._session.get(
-            url=Apis.film_api.files.format(self.id),
-            params={"type": 1},
-        )
+        response = self._session.get(**self._files_request())
+        self._set_files(response)
+
+        return self._files
+
+    async def fetch_files(self) -> List[BeletFile]:
+        """Awaitable counterpart of `files` for `AsyncBeletClient`"""
+
+        if self._files is not None:
+            return self._files
 
+        response = await self._session.get(**self._files_request())
+        self._set_files(response)
+
+        return self._files
+
+    def _files_request(self) -> Dict[str, Any]:
+        return {
+            "url": Apis.film_api.files.format(self.id),
+            "params": {"type": 1},
+        }
+
+    def _set_files(self, response) -> None:
         response.raise_for_status()
         response_json = response.json()
         APIStatusError.raise_for_status(response_json)
 
         self._files = [
-            BeletFile(**data) for data in response.json()["sources"]
+            BeletFile(**data) for data in response_json["sources"]
         ]
 
-        return self._files
-
 
 class BeletMovieFragment(BeletMovieBase):
+    __slots__ = ()
+
     def __init__(self, session: BeletSession, **kwargs) -> None:
         super().__init__(session, **kwargs)
 
@@ -90,6 +112,7 @@ class BeletSeriesEpisode:
 class BeletSeriesSeason:
     _session: BeletSession
     _episodes: Optional[List[BeletSeriesEpisode]]
+    _episodes_by_id: Optional[Dict[int, BeletSeriesEpisode]]
 
     def __init__(self, session: BeletSession, id: int, name: str) -> None:
         self._session = session
@@ -98,6 +121,7 @@ class BeletSeriesSeason:
         self.name = name
 
         self._episodes = None
+        self._episodes_by_id = None
 
     def __repr__(self) -> str:
         return self.__str__()
@@ -110,15 +134,34 @@ class BeletSeriesSeason:
         if self._episodes is not None:
             return self._episodes
 
-        response = self._session.get(
-            url=Apis.film_api.episodes, params={"seasonId": self.id}
-        )
+        response = self._session.get(**self._episodes_request())
+        self._set_episodes(response)
+
+        return self._episodes
+
+    async def fetch_episodes(self) -> List[BeletSeriesEpisode]:
+        """Awaitable counterpart of `episodes` for `AsyncBeletClient`"""
+
+        if self._episodes is not None:
+            return self._episodes
 
+        response = await self._session.get(**self._episodes_request())
+        self._set_episodes(response)
+
+        return self._episodes
+
+    def _episodes_request(self) -> Dict[str, Any]:
+        return {
+            "url": Apis.film_api.episodes,
+            "params": {"seasonId": self.id},
+        }
+
+    def _set_episodes(self, response) -> None:
         response.raise_for_status()
         response_json = response.json()
         APIStatusError.raise_for_status(response_json)
 
-        self._episodes = []
+        episodes = []
 
         for episode_info in response_json["episodes"]:
             episode_info["files"] = [
@@ -126,26 +169,43 @@ class BeletSeriesSeason:
             ]
 
             episode_info.pop("sources")
-            self._episodes.append(BeletSeriesEpisode(**episode_info))
+            episodes.append(BeletSeriesEpisode(**episode_info))
 
-        return self._episodes
+        self._episodes_by_id = {episode.id: episode for episode in episodes}
+        self._episodes = episodes
+
+    def get_episode_by_id(
+        self, episode_id: int
+    ) -> Optional[BeletSeriesEpisode]:
+        self.episodes  # loads episodes and builds the index
+        return self._episodes_by_id.get(episode_id)
 
-    def get_episode_by_id(self, episode_id):
-        for episode in self.episodes:
-            if episode.id == episode_id:
-                return episode
+    async def fetch_episode_by_id(
+        self, episode_id: int
+    ) -> Optional[BeletSeriesEpisode]:
+        """Awaitable counterpart of `get_episode_by_id`"""
 
-        return None
+        await self.fetch_episodes()
+        return self._episodes_by_id.get(episode_id)
 
 
 class BeletSeries(BeletMovieBase):
-    _seasons: List[BeletSeriesSeason | Dict[str, Any]]
+    __slots__ = ("_seasons", "_seasons_by_id", "_episode_index")
+
+    _seasons: List[BeletSeriesSeason]
+    _seasons_by_id: Dict[int, BeletSeriesSeason]
+    _episode_index: Optional[
+        Dict[int, Tuple[BeletSeriesSeason, BeletSeriesEpisode]]
+    ]
 
     def __init__(self, session: BeletSession, **kwargs) -> None:
-        super().__init__(session, **kwargs)  # sets `self._seasons`
+        super().__init__(session, **kwargs)
         self._seasons = [
-            BeletSeriesSeason(self._session, **data) for data in self._seasons
+            BeletSeriesSeason(self._session, **data)
+            for data in self._data["seasons"]
         ]
+        self._seasons_by_id = {season.id: season for season in self._seasons}
+        self._episode_index = None
 
     def __repr__(self) -> str:
         return self.__str__()
@@ -157,9 +217,89 @@ class BeletSeries(BeletMovieBase):
     def seasons(self) -> List[BeletSeriesSeason]:
         return self._seasons
 
-    def get_season_by_id(self, season_id) -> BeletSeriesSeason:
-        for season in self.seasons:
-            if season.id == season_id:
-                return season
+    def prefetch(self, workers: int = 8) -> List[BeletSeriesSeason]:
+        """Load episodes of all seasons concurrently
+
+        Seasons that already have their episodes loaded are skipped
+
+        Args:
+            workers (int): maximum number of concurrent requests
+
+        Returns:
+            List[BeletSeriesSeason]: seasons
+        """
+
+        seasons = [s for s in self._seasons if s._episodes is None]
+
+        if len(seasons) == 1:
+            seasons[0].episodes
+        elif seasons:
+            workers = min(workers, len(seasons))
+
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                # consuming the results raises the first failure
+                list(executor.map(lambda season: season.episodes, seasons))
+
+        return self._seasons
+
+    async def fetch_seasons(self) -> List[BeletSeriesSeason]:
+        """Awaitable counterpart of `prefetch` for `AsyncBeletClient`"""
+
+        await asyncio.gather(
+            *(season.fetch_episodes() for season in self._seasons)
+        )
+
+        return self._seasons
+
+    def get_season_by_id(self, season_id: int) -> Optional[BeletSeriesSeason]:
+        return self._seasons_by_id.get(season_id)
+
+    def get_episode_by_id(
+        self, episode_id: int
+    ) -> Optional[Tuple[BeletSeriesSeason, BeletSeriesEpisode]]:
+        """Find episode without knowing its season
+
+        Loads episodes of all seasons on the first call (see `prefetch`)
+
+        Args:
+            episode_id (int): episode id
+
+        Returns:
+            Optional[Tuple[BeletSeriesSeason, BeletSeriesEpisode]]:
+                season and episode or `None` if not found
+        """
+
+        if self._episode_index is None:
+            self.prefetch()
+            self._build_episode_index()
+
+        return self._episode_index.get(episode_id)
+
+    async def fetch_episode_by_id(
+        self, episode_id: int
+    ) -> Optional[Tuple[BeletSeriesSeason, BeletSeriesEpisode]]:
+        """Awaitable counterpart of `get_episode_by_id`"""
+
+        if self._episode_index is None:
+            await self.fetch_seasons()
+            self._build_episode_index()
+
+        return self._episode_index.get(episode_id)
+
+    def _build_episode_index(self) -> None:
+        self._episode_index = {
+            episode.id: (season, episode)
+            for season in self._seasons
+            for episode in season._episodes
+        }
+
+
+def movie_from_data(
+    session: BeletSession, data: Dict[str, Any]
+) -> BeletMovie | BeletSeries:
+    """Create `BeletMovie` or `BeletSeries` from `film` json data"""
+
+    if data["seasons"] is None:
+        return BeletMovie(session, **data)
 
-        return None
+    return BeletSeries(session, **data)
@@ -1,109 +1,171 @@
-from typing import Optional, Dict, List, Any
+from typing import Any, Callable, Dict, List, Optional
 
 from beletapi.session import BeletSession
 from beletapi.enums import BeletCategory
 
 
+class _Field:
+    """Attribute that reads its value from the raw json data
+
+    Values are looked up on access, if `decode` is set the decoded
+    value is computed on first access and cached per instance.
+    """
+
+    __slots__ = ("name", "key", "default", "decode")
+
+    def __init__(
+        self,
+        default: Any = None,
+        decode: Optional[Callable[[Any], Any]] = None,
+        key: Optional[str] = None,
+    ) -> None:
+        self.name = None
+        self.key = key
+        self.default = default
+        self.decode = decode
+
+    def __set_name__(self, owner: type, name: str) -> None:
+        self.name = name
+
+        if self.key is None:
+            self.key = name
+
+    def __get__(
+        self, instance: Optional["BeletMovieBase"], owner: type
+    ) -> Any:
+        if instance is None:
+            return self
+
+        if self.decode is None:
+            return instance._data.get(self.key, self.default)
+
+        decoded = instance._decoded
+
+        if decoded is None:
+            decoded = instance._decoded = {}
+        elif self.name in decoded:
+            return decoded[self.name]
+
+        value = decoded[self.name] = self.decode(
+            instance._data.get(self.key, self.default)
+        )
+        return value
+
+    def __set__(self, instance: "BeletMovieBase", value: Any) -> None:
+        if self.decode is None:
+            instance._data[self.key] = value
+            return
+
+        if instance._decoded is None:
+            instance._decoded = {}
+
+        instance._decoded[self.name] = value
+
+
 class BeletMovieBase:
     """Base movie class that only holds data
 
     Other classes should inherit this class and add
-    other functionality
+    other functionality. The raw json data is kept as is
+    and fields are read from it on access, so holding many
+    search results or homepage fragments stays cheap.
     """
 
-    def __init__(self, session: BeletSession, **kwargs) -> None:
-        self._session = session
+    __slots__ = ("_session", "_data", "_decoded")
 
-        # ID of movie or series
-        self.id: int = kwargs.get("id", None)
+    # ID of movie or series
+    id: int = _Field()
 
-        # Name
-        self.name: str = kwargs.get("name", None)
+    # Name
+    name: str = _Field()
 
-        # Age rating
-        self.age: int = kwargs.get("age", None)
+    # Age rating
+    age: int = _Field()
 
-        # Release year
-        self.year: int = kwargs.get("year", None)
+    # Release year
+    year: int = _Field()
 
-        # Duration in seconds
-        self.duration: float | str = kwargs.get("duration", None)
+    # Duration in seconds
+    duration: float | str = _Field()
 
-        # Thumbnails
-        self.thumbnails: Dict[str, Any] = kwargs.get("thumbnails", None)
+    # Thumbnails
+    thumbnails: Dict[str, Any] = _Field()
 
-        # Images
-        self.images: Dict[str, Any] = kwargs.get("images", None)
+    # Images
+    images: Dict[str, Any] = _Field()
 
-        # Language
-        self.language: str = kwargs.get("language", None)
+    # Language
+    language: str = _Field()
 
-        # Description
-        self.description: str = kwargs.get("description", None)
+    # Description
+    description: str = _Field()
 
-        # Parent ID (What is this?)
-        self.parent_id: int = kwargs.get("parent_id", None)
+    # Parent ID (What is this?)
+    parent_id: int = _Field()
 
-        # Was movie/series liked by user
-        self.like: bool = kwargs.get("like", None)
+    # Was movie/series liked by user
+    like: bool = _Field()
 
-        # Was movie/series disliked by user
-        self.dislike: bool = kwargs.get("dislike", None)
+    # Was movie/series disliked by user
+    dislike: bool = _Field()
 
-        # Is user favorite movie/series
-        self.favorites: bool = kwargs.get("favorites", None)
+    # Is user favorite movie/series
+    favorites: bool = _Field()
 
-        # How much was watched
-        self.watch_time: Optional[float] = kwargs.get("watch_time", None)
+    # How much was watched
+    watch_time: Optional[float] = _Field()
 
-        # Type (movie or series)
-        self.type_id: int = kwargs.get("type_id", None)
+    # Type (movie or series)
+    type_id: int = _Field()
 
-        # Category
-        self.category_id: BeletCategory = BeletCategory(
-            kwargs.get("category_id", 1)
-        )
+    # Category
+    category_id: BeletCategory = _Field(1, BeletCategory)
 
-        # Rating of the movie/series in Kinopoisk
-        self.rating_kp: float = kwargs.get("rating_kp", None)
+    # Rating of the movie/series in Kinopoisk
+    rating_kp: float = _Field()
 
-        # Rating of the movie/series in IMDb
-        self.rating_imdb: float = kwargs.get("rating_imdb", None)
+    # Rating of the movie/series in IMDb
+    rating_imdb: float = _Field()
 
-        # Is movie/series for kids?
-        self.for_kids: bool = kwargs.get("for_kids", None)
+    # Is movie/series for kids?
+    for_kids: bool = _Field()
 
-        # Genres
-        self.genres: list[str] = kwargs.get("genres", None)
+    # Genres
+    genres: list[str] = _Field()
 
-        # Countries
-        self.countries: list[str] = kwargs.get("countries", None)
+    # Countries
+    countries: list[str] = _Field()
 
-        # Actors
-        self.actors: list[str] = kwargs.get("actors", None)
+    # Actors
+    actors: list[str] = _Field()
 
-        # Directors
-        self.directors: list[str] = kwargs.get("directors", None)
+    # Directors
+    directors: list[str] = _Field()
 
-        # Seasons (+leading underscore because derived classes use it)
-        self._seasons: Optional[Dict[str, Any]] = kwargs.get("seasons", None)
+    # Seasons (+leading underscore because derived classes use it)
+    _seasons: Optional[Dict[str, Any]] = _Field(key="seasons")
 
-        self.episode_info: Optional[Dict[str, Any]] = kwargs.get(
-            "episode_info", None
-        )
+    episode_info: Optional[Dict[str, Any]] = _Field()
 
-        # Last watched information
-        self.last_episode_info: Optional[Dict[str, Any]] = kwargs.get(
-            "last_episode_info", None
-        )
+    # Last watched information
+    last_episode_info: Optional[Dict[str, Any]] = _Field()
 
-        # Trailers
-        self.trailers: Optional[List[Any]] = kwargs.get("trailers", None)
+    # Trailers
+    trailers: Optional[List[Any]] = _Field()
 
-        # Media info (audios, captions...)
-        self.media_info: Optional[Dict[str, Any]] = kwargs.get(
-            "media_info", None
-        )
+    # Media info (audios, captions...)
+    media_info: Optional[Dict[str, Any]] = _Field()
+
+    # Studios
+    studios: Optional[List[Any]] = _Field()
+
+    def __init__(self, session: BeletSession, **kwargs) -> None:
+        self._session = session
+        self._data = kwargs
+        self._decoded = None
+
+    @property
+    def raw_data(self) -> Dict[str, Any]:
+        """Json data the movie was created from"""
 
-        # Studios
-        self.studios: Optional[List[Any]] = kwargs.get("studios", None)
+        return self._data
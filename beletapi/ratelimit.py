@@ -0,0 +1,250 @@
+import time
+import threading
+from collections import deque
+from typing import NamedTuple, Optional
+
+
+class RateLimiterStats(NamedTuple):
+    """Snapshot of `RateLimiter` state
+
+    Attributes:
+        tokens: tokens currently in the bucket
+        in_flight: requests holding a slot
+        queue_depth: callers waiting for a slot
+        acquired: total number of granted requests
+        total_wait: total seconds callers spent waiting
+        max_wait: longest single wait in seconds
+    """
+
+    tokens: float
+    in_flight: int
+    queue_depth: int
+    acquired: int
+    total_wait: float
+    max_wait: float
+
+
+class RateLimiter:
+    """Token bucket rate limiter with a max-in-flight limit
+
+    `rate` tokens per second are added to a bucket of `burst` tokens,
+    every request takes one. At most `max_in_flight` requests run at
+    the same time. Waiting callers are served in FIFO order.
+    `None` disables the corresponding limit.
+    """
+
+    def __init__(
+        self,
+        rate: Optional[float] = None,
+        burst: int = 1,
+        max_in_flight: Optional[int] = None,
+    ) -> None:
+        if rate is not None and rate <= 0:
+            raise ValueError(f"rate must be positive -> {rate}")
+
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.max_in_flight = max_in_flight
+
+        self._condition = threading.Condition()
+        self._queue = deque()
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._in_flight = 0
+
+        self._acquired = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def __enter__(self) -> "RateLimiter":
+        self.acquire()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.release()
+
+    def acquire(self, slot: bool = True) -> float:
+        """Wait for a token and a free slot
+
+        Args:
+            slot (bool): also take an in-flight slot, `False` for
+                retries of a request that already holds one (they
+                don't queue behind callers waiting for a slot)
+
+        Returns:
+            float: seconds spent waiting
+        """
+
+        ticket = object()
+        start = time.monotonic()
+
+        with self._condition:
+            if slot:
+                self._queue.append(ticket)
+            else:
+                self._queue.appendleft(ticket)
+
+            try:
+                while not self._try_acquire(ticket, slot):
+                    self._condition.wait(self._next_token_in(ticket, slot))
+            except BaseException:
+                self._queue.remove(ticket)
+                self._condition.notify_all()
+                raise
+
+            waited = time.monotonic() - start
+            self._acquired += 1
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+
+            # let the next caller in line check its turn
+            self._condition.notify_all()
+
+        return waited
+
+    def release(self) -> None:
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def stats(self) -> RateLimiterStats:
+        with self._condition:
+            self._refill()
+
+            return RateLimiterStats(
+                tokens=self._tokens,
+                in_flight=self._in_flight,
+                queue_depth=len(self._queue),
+                acquired=self._acquired,
+                total_wait=self._total_wait,
+                max_wait=self._max_wait,
+            )
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+
+        if self.rate is not None:
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate
+            )
+
+        self._updated = now
+
+    def _try_acquire(self, ticket: object, slot: bool = True) -> bool:
+        if self._queue[0] is not ticket:
+            return False
+
+        if slot and self._slots_full():
+            return False
+
+        self._refill()
+
+        if self.rate is not None:
+            if self._tokens < 1:
+                return False
+
+            self._tokens -= 1
+
+        self._queue.popleft()
+
+        if slot:
+            self._in_flight += 1
+
+        return True
+
+    def _slots_full(self) -> bool:
+        return (
+            self.max_in_flight is not None
+            and self._in_flight >= self.max_in_flight
+        )
+
+    def _next_token_in(
+        self, ticket: object, slot: bool = True
+    ) -> Optional[float]:
+        # only the first caller in line waits for the bucket, the
+        # others (and callers waiting for a slot) wait to be notified
+        if (
+            self.rate is None
+            or self._queue[0] is not ticket
+            or (slot and self._slots_full())
+        ):
+            return None
+
+        return max((1 - self._tokens) / self.rate, 0)
+
+
+class BandwidthLimiter:
+    """Token bucket of bytes shared by concurrent transfers
+
+    Transfers report received bytes with `consume`, which sleeps as
+    long as needed to keep the total rate at `rate` bytes per second.
+    Bytes are accounted after they are received, so a burst can
+    exceed `rate` by one chunk, but the average doesn't. Waiting
+    callers queue up behind each other's debt, so the bandwidth is
+    shared evenly.
+
+    Args:
+        rate (float): bytes per second, `None` - unlimited
+        burst (float): bucket size in bytes (default: `rate`)
+    """
+
+    def __init__(
+        self, rate: Optional[float] = None, burst: Optional[float] = None
+    ) -> None:
+        self._lock = threading.Lock()
+        self._burst = burst
+        self._rate = None
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+        self.rate = rate
+
+    @property
+    def rate(self) -> Optional[float]:
+        return self._rate
+
+    @rate.setter
+    def rate(self, rate: Optional[float]) -> None:
+        if rate is not None and rate <= 0:
+            raise ValueError(f"rate must be positive -> {rate}")
+
+        with self._lock:
+            self._refill()
+            self._rate = rate
+            self._tokens = min(self._tokens, self._capacity())
+
+    def consume(self, amount: int) -> float:
+        """Account `amount` received bytes, sleep if over the limit
+
+        Returns:
+            float: seconds slept
+        """
+
+        with self._lock:
+            if self._rate is None:
+                return 0.0
+
+            self._refill()
+            self._tokens -= amount
+            delay = -self._tokens / self._rate if self._tokens < 0 else 0.0
+
+        if delay > 0:
+            time.sleep(delay)
+
+        return delay
+
+    def _capacity(self) -> float:
+        if self._rate is None:
+            return 0.0
+
+        return self._burst if self._burst is not None else self._rate
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+
+        if self._rate is not None:
+            self._tokens = min(
+                self._capacity(),
+                self._tokens + (now - self._updated) * self._rate,
+            )
+
+        self._updated = now
@@ -0,0 +1,11 @@
+from .remuxer import TsToMp4Remuxer, remux, remux_file
+from .ts import PesPacket, TsDemuxer, demux
+
+__all__ = [
+    "TsToMp4Remuxer",
+    "remux",
+    "remux_file",
+    "PesPacket",
+    "TsDemuxer",
+    "demux",
+]
@@ -0,0 +1,103 @@
+from typing import Iterator, NamedTuple, Tuple
+
+from beletapi.exceptions import RemuxError
+
+
+SAMPLE_RATES = (
+    96000, 88200, 64000, 48000, 44100, 32000,
+    24000, 22050, 16000, 12000, 11025, 8000, 7350,
+)
+
+# samples per AAC frame
+FRAME_SAMPLES = 1024
+
+
+class AudioConfig(NamedTuple):
+    """Stream parameters from an ADTS header
+
+    Attributes:
+        object_type: MPEG-4 audio object type (2 - AAC LC)
+        sample_rate_index: index into `SAMPLE_RATES`
+        channels: channel configuration
+    """
+
+    object_type: int
+    sample_rate_index: int
+    channels: int
+
+    @property
+    def sample_rate(self) -> int:
+        return SAMPLE_RATES[self.sample_rate_index]
+
+    def audio_specific_config(self) -> bytes:
+        """`AudioSpecificConfig` of the `esds` box"""
+
+        value = (
+            self.object_type << 11
+            | self.sample_rate_index << 7
+            | self.channels << 3
+        )
+        return value.to_bytes(2, "big")
+
+
+class AdtsParser:
+    """Splits ADTS streams into raw AAC frames
+
+    This is the `aac_adtstoasc` step: headers are stripped from the
+    frames and their parameters end up in the `AudioSpecificConfig`.
+    Frames split across PES packets are joined.
+    """
+
+    def __init__(self) -> None:
+        self.config = None
+        self._tail = b""
+
+    def feed(self, data: bytes) -> Iterator[Tuple[AudioConfig, bytes]]:
+        """Yield `(config, frame)` of complete frames in `data`"""
+
+        if self._tail:
+            data = self._tail + data
+
+        offset = 0
+        size = len(data)
+
+        while offset + 7 <= size:
+            if data[offset] != 0xFF or data[offset + 1] & 0xF6 != 0xF0:
+                # resync
+                next_offset = data.find(b"\xff", offset + 1)
+
+                if next_offset == -1:
+                    offset = size
+                    break
+
+                offset = next_offset
+                continue
+
+            header_length = 7 if data[offset + 1] & 0x01 else 9
+            frame_length = (
+                (data[offset + 3] & 0x03) << 11
+                | data[offset + 4] << 3
+                | data[offset + 5] >> 5
+            )
+
+            if frame_length < header_length:
+                raise RemuxError(f"invalid ADTS frame length {frame_length}")
+
+            if offset + frame_length > size:
+                break
+
+            if data[offset + 6] & 0x03:
+                raise RemuxError("ADTS frames with several raw data blocks")
+
+            config = AudioConfig(
+                (data[offset + 2] >> 6) + 1,
+                (data[offset + 2] >> 2) & 0x0F,
+                (data[offset + 2] & 0x01) << 2 | data[offset + 3] >> 6,
+            )
+            self.config = config
+
+            yield config, data[offset + header_length : offset + frame_length]
+
+            offset += frame_length
+
+        self._tail = data[offset:]
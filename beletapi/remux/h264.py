@@ -0,0 +1,254 @@
+import struct
+from typing import Iterator, List, NamedTuple
+
+from beletapi.exceptions import RemuxError
+
+
+NAL_IDR = 5
+
+NAL_SPS = 7
+
+NAL_PPS = 8
+
+# profiles with chroma format and bit depth in the SPS
+HIGH_PROFILES = (100, 110, 122, 244, 44, 83, 86, 118, 128, 138, 139, 134)
+
+
+class SpsInfo(NamedTuple):
+    """Fields of a sequence parameter set needed for the MP4 headers
+
+    Attributes:
+        profile: `profile_idc`
+        compatibility: constraint flags byte
+        level: `level_idc`
+        chroma_format: `chroma_format_idc`
+        bit_depth_luma: luma bit depth
+        bit_depth_chroma: chroma bit depth
+        width: cropped frame width in pixels
+        height: cropped frame height in pixels
+    """
+
+    profile: int
+    compatibility: int
+    level: int
+    chroma_format: int
+    bit_depth_luma: int
+    bit_depth_chroma: int
+    width: int
+    height: int
+
+
+class AccessUnit(NamedTuple):
+    """H.264 access unit converted to a MP4 sample
+
+    Attributes:
+        data: NAL units prefixed with 4 byte lengths, parameter sets
+            are kept in-band like ffmpeg does, so resolution changes
+            (e.g. adaptive quality) still decode
+        keyframe: contains an IDR slice
+        sps: sequence parameter sets of the access unit
+        pps: picture parameter sets of the access unit
+    """
+
+    data: bytes
+    keyframe: bool
+    sps: List[bytes]
+    pps: List[bytes]
+
+
+def split_nal_units(data: bytes) -> Iterator[bytes]:
+    """Split an Annex B byte stream into NAL units"""
+
+    start = data.find(b"\x00\x00\x01")
+
+    while start != -1:
+        start += 3
+        end = data.find(b"\x00\x00\x01", start)
+        nal = data[start:] if end == -1 else data[start:end]
+
+        # trailing zeros belong to the next 4 byte start code
+        nal = nal.rstrip(b"\x00")
+
+        if nal:
+            yield nal
+
+        start = end
+
+
+def access_unit(data: bytes) -> AccessUnit:
+    """Convert an Annex B access unit (a PES payload) to a MP4 sample"""
+
+    parts = []
+    keyframe = False
+    sps = []
+    pps = []
+
+    for nal in split_nal_units(data):
+        nal_type = nal[0] & 0x1F
+
+        if nal_type == NAL_SPS:
+            sps.append(nal)
+        elif nal_type == NAL_PPS:
+            pps.append(nal)
+        elif nal_type == NAL_IDR:
+            keyframe = True
+
+        parts.append(struct.pack(">I", len(nal)))
+        parts.append(nal)
+
+    return AccessUnit(b"".join(parts), keyframe, sps, pps)
+
+
+def avc_decoder_configuration(sps: bytes, pps: bytes, info: SpsInfo) -> bytes:
+    """`AVCDecoderConfigurationRecord` (payload of the `avcC` box)"""
+
+    record = (
+        bytes((1, info.profile, info.compatibility, info.level))
+        # 4 byte NAL lengths, one SPS
+        + b"\xff\xe1"
+        + struct.pack(">H", len(sps))
+        + sps
+        + b"\x01"
+        + struct.pack(">H", len(pps))
+        + pps
+    )
+
+    if info.profile in HIGH_PROFILES:
+        record += bytes(
+            (
+                0xFC | info.chroma_format,
+                0xF8 | (info.bit_depth_luma - 8),
+                0xF8 | (info.bit_depth_chroma - 8),
+                0,
+            )
+        )
+
+    return record
+
+
+class _BitReader:
+    def __init__(self, data: bytes) -> None:
+        self._value = int.from_bytes(data, "big")
+        self._left = len(data) * 8
+
+    def bits(self, count: int) -> int:
+        if count > self._left:
+            raise RemuxError("truncated SPS")
+
+        self._left -= count
+        return (self._value >> self._left) & ((1 << count) - 1)
+
+    def flag(self) -> bool:
+        return bool(self.bits(1))
+
+    def ue(self) -> int:
+        zeros = 0
+
+        while not self.bits(1):
+            zeros += 1
+
+        return (1 << zeros) - 1 + self.bits(zeros)
+
+    def se(self) -> int:
+        value = self.ue()
+        return (value + 1) // 2 if value & 1 else -(value // 2)
+
+
+def _unescape(nal: bytes) -> bytes:
+    # remove emulation prevention bytes
+    return nal.replace(b"\x00\x00\x03", b"\x00\x00")
+
+
+def _skip_scaling_list(reader: _BitReader, size: int) -> None:
+    last = next_scale = 8
+
+    for _ in range(size):
+        if next_scale:
+            next_scale = (last + reader.se()) % 256
+
+        last = next_scale or last
+
+
+def parse_sps(sps: bytes) -> SpsInfo:
+    """Parse a sequence parameter set NAL unit
+
+    Raises:
+        RemuxError: raised if the SPS is truncated
+    """
+
+    reader = _BitReader(_unescape(sps[1:]))
+
+    profile = reader.bits(8)
+    compatibility = reader.bits(8)
+    level = reader.bits(8)
+    reader.ue()  # seq_parameter_set_id
+
+    chroma_format = 1
+    bit_depth_luma = bit_depth_chroma = 8
+    separate_planes = False
+
+    if profile in HIGH_PROFILES:
+        chroma_format = reader.ue()
+
+        if chroma_format == 3:
+            separate_planes = reader.flag()
+
+        bit_depth_luma = reader.ue() + 8
+        bit_depth_chroma = reader.ue() + 8
+        reader.flag()  # qpprime_y_zero_transform_bypass_flag
+
+        if reader.flag():
+            for i in range(8 if chroma_format != 3 else 12):
+                if reader.flag():
+                    _skip_scaling_list(reader, 16 if i < 6 else 64)
+
+    reader.ue()  # log2_max_frame_num_minus4
+    poc_type = reader.ue()
+
+    if poc_type == 0:
+        reader.ue()  # log2_max_pic_order_cnt_lsb_minus4
+    elif poc_type == 1:
+        reader.flag()
+        reader.se()
+        reader.se()
+
+        for _ in range(reader.ue()):
+            reader.se()
+
+    reader.ue()  # max_num_ref_frames
+    reader.flag()  # gaps_in_frame_num_value_allowed_flag
+
+    width_mbs = reader.ue() + 1
+    height_map_units = reader.ue() + 1
+    frame_mbs_only = reader.flag()
+
+    if not frame_mbs_only:
+        reader.flag()  # mb_adaptive_frame_field_flag
+
+    reader.flag()  # direct_8x8_inference_flag
+
+    width = width_mbs * 16
+    height = (2 - frame_mbs_only) * height_map_units * 16
+
+    if reader.flag():
+        left, right, top, bottom = (reader.ue() for _ in range(4))
+
+        if chroma_format == 0 or separate_planes:
+            crop_x, crop_y = 1, 2 - frame_mbs_only
+        else:
+            crop_x = 1 if chroma_format == 3 else 2
+            crop_y = (2 if chroma_format == 1 else 1) * (2 - frame_mbs_only)
+
+        width -= (left + right) * crop_x
+        height -= (top + bottom) * crop_y
+
+    return SpsInfo(
+        profile,
+        compatibility,
+        level,
+        chroma_format,
+        bit_depth_luma,
+        bit_depth_chroma,
+        width,
+        height,
+    )
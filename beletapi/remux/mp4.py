@@ -0,0 +1,399 @@
+import struct
+from typing import BinaryIO, List, NamedTuple, Optional, Tuple
+
+from .aac import AudioConfig
+from .h264 import SpsInfo
+
+
+MOVIE_TIMESCALE = 1000
+
+MATRIX = struct.pack(">9I", 0x10000, 0, 0, 0, 0x10000, 0, 0, 0, 0x40000000)
+
+# sample flags: depends on nothing (sync) / depends on others (non-sync)
+SYNC_SAMPLE_FLAGS = 0x02000000
+NON_SYNC_SAMPLE_FLAGS = 0x01010000
+
+# trun flags
+TRUN_DATA_OFFSET = 0x000001
+TRUN_DURATION = 0x000100
+TRUN_SIZE = 0x000200
+TRUN_FLAGS = 0x000400
+TRUN_COMPOSITION_OFFSET = 0x000800
+
+# tfhd flags
+TFHD_DEFAULT_FLAGS = 0x000020
+TFHD_DEFAULT_BASE_IS_MOOF = 0x020000
+
+
+def box(kind: bytes, *payload: bytes) -> bytes:
+    data = b"".join(payload)
+    return struct.pack(">I", 8 + len(data)) + kind + data
+
+
+def full_box(kind: bytes, version: int, flags: int, *payload: bytes) -> bytes:
+    return box(kind, struct.pack(">I", version << 24 | flags), *payload)
+
+
+def _descriptor(tag: int, *payload: bytes) -> bytes:
+    data = b"".join(payload)
+    return bytes((tag, len(data))) + data
+
+
+class Track(NamedTuple):
+    """Track of a fragmented MP4 file
+
+    Attributes:
+        track_id: track ID, starting at 1
+        handler: `b"vide"` or `b"soun"`
+        timescale: units per second of sample timestamps
+        sample_entry: `avc1` or `mp4a` box
+        width: video width in pixels
+        height: video height in pixels
+    """
+
+    track_id: int
+    handler: bytes
+    timescale: int
+    sample_entry: bytes
+    width: int = 0
+    height: int = 0
+
+    @classmethod
+    def video(
+        cls, track_id: int, info: SpsInfo, avcc: bytes
+    ) -> "Track":
+        entry = box(
+            b"avc1",
+            bytes(6),
+            struct.pack(">H", 1),  # data_reference_index
+            bytes(16),
+            struct.pack(">HH", info.width, info.height),
+            struct.pack(">II", 0x480000, 0x480000),  # 72 dpi
+            bytes(4),
+            struct.pack(">H", 1),  # frame_count
+            bytes(32),  # compressorname
+            struct.pack(">Hh", 0x18, -1),
+            box(b"avcC", avcc),
+        )
+        return cls(
+            track_id, b"vide", 90000, entry, info.width, info.height
+        )
+
+    @classmethod
+    def audio(cls, track_id: int, config: AudioConfig) -> "Track":
+        esds = full_box(
+            b"esds",
+            0,
+            0,
+            _descriptor(
+                0x03,  # ES_Descriptor
+                struct.pack(">HB", track_id, 0),
+                _descriptor(
+                    0x04,  # DecoderConfigDescriptor
+                    # MPEG-4 audio, audio stream
+                    bytes((0x40, 0x15)),
+                    bytes(3),  # bufferSizeDB
+                    struct.pack(">II", 0, 0),  # max/avg bitrate
+                    _descriptor(0x05, config.audio_specific_config()),
+                ),
+                _descriptor(0x06, b"\x02"),  # SLConfigDescriptor
+            ),
+        )
+        entry = box(
+            b"mp4a",
+            bytes(6),
+            struct.pack(">H", 1),  # data_reference_index
+            bytes(8),
+            struct.pack(">HH", config.channels, 16),
+            bytes(4),
+            struct.pack(">I", config.sample_rate << 16),
+            esds,
+        )
+        return cls(track_id, b"soun", config.sample_rate, entry)
+
+    def trak(self) -> bytes:
+        video = self.handler == b"vide"
+
+        tkhd = full_box(
+            b"tkhd",
+            0,
+            0x000003,  # enabled, in movie
+            struct.pack(">III", 0, 0, self.track_id),
+            bytes(4),
+            struct.pack(">I", 0),  # duration
+            bytes(8),
+            struct.pack(">hhH", 0, 0, 0 if video else 0x0100),
+            bytes(2),
+            MATRIX,
+            struct.pack(">II", self.width << 16, self.height << 16),
+        )
+        mdhd = full_box(
+            b"mdhd",
+            0,
+            0,
+            struct.pack(">IIII", 0, 0, self.timescale, 0),
+            struct.pack(">HH", 0x55C4, 0),  # "und"
+        )
+        hdlr = full_box(
+            b"hdlr",
+            0,
+            0,
+            bytes(4),
+            self.handler,
+            bytes(12),
+            b"VideoHandler\x00" if video else b"SoundHandler\x00",
+        )
+
+        if video:
+            media_header = full_box(b"vmhd", 0, 1, bytes(8))
+        else:
+            media_header = full_box(b"smhd", 0, 0, bytes(4))
+
+        dinf = box(
+            b"dinf",
+            full_box(
+                b"dref",
+                0,
+                0,
+                struct.pack(">I", 1),
+                full_box(b"url ", 0, 1),
+            ),
+        )
+        stbl = box(
+            b"stbl",
+            full_box(b"stsd", 0, 0, struct.pack(">I", 1), self.sample_entry),
+            full_box(b"stts", 0, 0, bytes(4)),
+            full_box(b"stsc", 0, 0, bytes(4)),
+            full_box(b"stsz", 0, 0, bytes(8)),
+            full_box(b"stco", 0, 0, bytes(4)),
+        )
+
+        return box(
+            b"trak",
+            tkhd,
+            box(
+                b"mdia",
+                mdhd,
+                hdlr,
+                box(b"minf", media_header, dinf, stbl),
+            ),
+        )
+
+
+class TrackFragment:
+    """Samples of one track in the fragment being assembled
+
+    Attributes:
+        track: the track
+        decode_time: decoding time of the first sample
+        samples: `(duration, size, flags, composition_offset)` tuples
+        payloads: sample data
+    """
+
+    def __init__(self, track: Track, decode_time: int) -> None:
+        self.track = track
+        self.decode_time = decode_time
+        self.samples: List[Tuple[int, int, int, int]] = []
+        self.payloads: List[bytes] = []
+        self.size = 0
+
+    @property
+    def duration(self) -> int:
+        return sum(sample[0] for sample in self.samples)
+
+    def add(
+        self,
+        data: bytes,
+        duration: int,
+        flags: int = SYNC_SAMPLE_FLAGS,
+        composition_offset: int = 0,
+    ) -> None:
+        self.samples.append((duration, len(data), flags, composition_offset))
+        self.payloads.append(data)
+        self.size += len(data)
+
+    def stretch(self, duration: int) -> None:
+        """Lengthen the last sample by `duration`, e.g. over a gap"""
+
+        last, size, flags, composition_offset = self.samples[-1]
+        self.samples[-1] = (last + duration, size, flags, composition_offset)
+
+    def traf(self, data_offset: int) -> bytes:
+        video = self.track.handler == b"vide"
+        count = len(self.samples)
+
+        if video:
+            flags = (
+                TRUN_DATA_OFFSET
+                | TRUN_DURATION
+                | TRUN_SIZE
+                | TRUN_FLAGS
+                | TRUN_COMPOSITION_OFFSET
+            )
+            # version 1 for signed composition offsets
+            table = struct.pack(
+                ">" + "IIIi" * count,
+                *(value for sample in self.samples for value in sample),
+            )
+            tfhd = full_box(
+                b"tfhd",
+                0,
+                TFHD_DEFAULT_BASE_IS_MOOF,
+                struct.pack(">I", self.track.track_id),
+            )
+        else:
+            flags = TRUN_DATA_OFFSET | TRUN_DURATION | TRUN_SIZE
+            table = struct.pack(
+                ">" + "II" * count,
+                *(value for sample in self.samples for value in sample[:2]),
+            )
+            tfhd = full_box(
+                b"tfhd",
+                0,
+                TFHD_DEFAULT_BASE_IS_MOOF | TFHD_DEFAULT_FLAGS,
+                struct.pack(">II", self.track.track_id, SYNC_SAMPLE_FLAGS),
+            )
+
+        return box(
+            b"traf",
+            tfhd,
+            full_box(b"tfdt", 1, 0, struct.pack(">Q", self.decode_time)),
+            full_box(
+                b"trun",
+                1,
+                flags,
+                struct.pack(">Ii", count, data_offset),
+                table,
+            ),
+        )
+
+
+class FragmentedMp4Writer:
+    """Writes a fragmented MP4 file to a stream
+
+    The movie header comes first (fast start) and each fragment is
+    written as soon as it's complete, so the output doesn't need to be
+    seekable and only one fragment is kept in memory. If the output is
+    seekable, the movie duration is filled in by `close`.
+
+    Args:
+        output (BinaryIO): writable binary file object
+        tracks (List[Track]): tracks of the movie
+    """
+
+    def __init__(self, output: BinaryIO, tracks: List[Track]) -> None:
+        self.output = output
+        self.tracks = tracks
+        self._sequence = 0
+        self._durations = {track.track_id: 0 for track in tracks}
+        self._duration_offsets: Optional[Tuple[int, int]] = None
+
+        self._write_header()
+
+    def _write_header(self) -> None:
+        ftyp = box(
+            b"ftyp", b"isom", struct.pack(">I", 0x200), b"isomiso6avc1mp41"
+        )
+        mvhd = full_box(
+            b"mvhd",
+            0,
+            0,
+            struct.pack(">IIII", 0, 0, MOVIE_TIMESCALE, 0),
+            struct.pack(">IH", 0x10000, 0x0100),  # rate, volume
+            bytes(10),
+            MATRIX,
+            bytes(24),
+            struct.pack(">I", len(self.tracks) + 1),  # next_track_ID
+        )
+        mvex = box(
+            b"mvex",
+            full_box(b"mehd", 0, 0, struct.pack(">I", 0)),
+            *(
+                full_box(
+                    b"trex",
+                    0,
+                    0,
+                    struct.pack(">IIIII", track.track_id, 1, 0, 0, 0),
+                )
+                for track in self.tracks
+            ),
+        )
+        header = ftyp + box(
+            b"moov", mvhd, *(track.trak() for track in self.tracks), mvex
+        )
+
+        if _seekable(self.output):
+            start = self.output.tell()
+            # mvhd duration and mehd fragment_duration
+            self._duration_offsets = (
+                start + len(ftyp) + 8 + 24,
+                start + len(header) - len(mvex) + 8 + 12,
+            )
+
+        self.output.write(header)
+
+    def write_fragment(self, fragments: List[TrackFragment]) -> None:
+        """Write a `moof` and `mdat` pair of non-empty track fragments"""
+
+        fragments = [fragment for fragment in fragments if fragment.samples]
+
+        if not fragments:
+            return
+
+        self._sequence += 1
+
+        def moof(offsets: List[int]) -> bytes:
+            return box(
+                b"moof",
+                full_box(b"mfhd", 0, 0, struct.pack(">I", self._sequence)),
+                *(
+                    fragment.traf(offset)
+                    for fragment, offset in zip(fragments, offsets)
+                ),
+            )
+
+        # the box size doesn't depend on the offsets
+        moof_size = len(moof([0] * len(fragments)))
+        offsets = []
+        offset = moof_size + 8
+
+        for fragment in fragments:
+            offsets.append(offset)
+            offset += fragment.size
+
+        output = self.output
+        output.write(moof(offsets))
+        output.write(struct.pack(">I", offset - moof_size) + b"mdat")
+
+        for fragment in fragments:
+            for payload in fragment.payloads:
+                output.write(payload)
+
+            track = fragment.track
+            end = fragment.decode_time + fragment.duration
+            self._durations[track.track_id] = max(
+                self._durations[track.track_id],
+                end * MOVIE_TIMESCALE // track.timescale,
+            )
+
+    def close(self) -> None:
+        """Fill in the movie duration if the output is seekable"""
+
+        if self._duration_offsets is None:
+            return
+
+        duration = max(self._durations.values(), default=0)
+        position = self.output.tell()
+
+        for offset in self._duration_offsets:
+            self.output.seek(offset)
+            self.output.write(struct.pack(">I", duration))
+
+        self.output.seek(position)
+
+
+def _seekable(output: BinaryIO) -> bool:
+    try:
+        return output.seekable()
+    except (AttributeError, ValueError):
+        return False
@@ -0,0 +1,400 @@
+import logging
+from collections import deque
+from typing import BinaryIO, Iterable, List, Optional
+
+from beletapi.exceptions import RemuxError
+from .aac import FRAME_SAMPLES, AdtsParser
+from .h264 import access_unit, avc_decoder_configuration, parse_sps
+from .mp4 import (
+    NON_SYNC_SAMPLE_FLAGS,
+    SYNC_SAMPLE_FLAGS,
+    FragmentedMp4Writer,
+    Track,
+    TrackFragment,
+)
+from .ts import STREAM_TYPE_AAC, STREAM_TYPE_H264, PesPacket, TsDemuxer
+
+
+# 90kHz units
+PES_TIMESCALE = 90000
+
+# limit of media buffered while waiting for the audio configuration
+MAX_HEADER_DELAY = 10 * PES_TIMESCALE
+
+# larger audio timestamp jumps are discontinuities, not gaps
+MAX_AUDIO_DRIFT = 10 * PES_TIMESCALE
+
+logger = logging.getLogger(__name__)
+
+
+class TsToMp4Remuxer:
+    """Remuxes a MPEG-TS stream with H.264 and AAC into MP4
+
+    Equivalent of `ffmpeg -i input.ts -bsf:a aac_adtstoasc -c copy
+    output.mp4` in pure Python: nothing is decoded, access units and
+    ADTS frames are only repackaged. The output is a fragmented MP4
+    with the movie header first, written in a single pass. Memory
+    usage is bounded by one fragment of media, so the stream can be
+    remuxed while it's being downloaded.
+
+    The first H.264 and the first AAC stream of the program are kept,
+    media before the first keyframe is dropped.
+
+    Audio follows the PES timestamps: gaps (lost packets) stretch the
+    previous frame, overlapping frames are dropped and jumps over
+    `MAX_AUDIO_DRIFT` are taken as discontinuities, the timeline goes
+    on without a gap like the video's.
+
+    Differences to ffmpeg's output: there is no seek index (`sidx` or
+    `mfra`), parameter sets and access unit delimiters stay in-band in
+    the samples and `avcC` only has the first SPS and PPS, so streams
+    changing their parameters mid-way depend on the player honouring
+    the in-band ones. Timestamp discontinuities are joined instead of
+    kept. The audio track is declared from the first ADTS header, so
+    if no AAC frame comes within `MAX_HEADER_DELAY` of video the output
+    has no audio at all (a warning is logged).
+
+    Args:
+        output (BinaryIO): writable binary file object, doesn't need to
+            be seekable
+        fragment_duration (float): minimum seconds of media per
+            fragment, fragments start at keyframes
+    """
+
+    def __init__(
+        self, output: BinaryIO, fragment_duration: float = 2.0
+    ) -> None:
+        self.output = output
+        self.fragment_duration = fragment_duration
+
+        self._demuxer = TsDemuxer()
+        self._adts = AdtsParser()
+        self._writer: Optional[FragmentedMp4Writer] = None
+
+        self._video_pid: Optional[int] = None
+        self._audio_pid: Optional[int] = None
+        self._avcc: Optional[bytes] = None
+        self._sps_info = None
+
+        # presentation and decoding time of the first keyframe
+        self._origin_pts: Optional[int] = None
+        self._origin_dts: Optional[int] = None
+
+        self._video: Optional[TrackFragment] = None
+        self._audio: Optional[TrackFragment] = None
+        self._video_track: Optional[Track] = None
+        self._audio_track: Optional[Track] = None
+
+        # (dts, pts, access unit) waiting for the next one's dts
+        self._pending = None
+        self._last_duration = 3000
+        self._video_time = 0
+
+        # audio PES packets received before the first keyframe
+        self._early_audio = deque()
+        self._audio_time: Optional[int] = None
+        # added to audio timestamps to join discontinuities
+        self._audio_shift = 0
+
+    def feed(self, data: bytes | memoryview) -> None:
+        """Remux a chunk of the MPEG-TS stream"""
+
+        for packet in self._demuxer.feed(data):
+            self._packet(packet)
+
+    def finish(self) -> None:
+        """Write the remaining media, the output isn't closed
+
+        Raises:
+            RemuxError: raised if the stream had no H.264 or AAC media
+        """
+
+        for packet in self._demuxer.flush():
+            self._packet(packet)
+
+        if self._pending is not None:
+            self._add_video_sample(self._last_duration)
+
+        self._flush(force=True)
+
+        if self._writer is None:
+            raise RemuxError("no H.264 or AAC media in the stream")
+
+        self._writer.close()
+
+    def _packet(self, packet: PesPacket) -> None:
+        if self._video_pid is None and self._audio_pid is None:
+            for pid, stream_type in self._demuxer.streams.items():
+                if stream_type == STREAM_TYPE_H264:
+                    self._video_pid = self._video_pid or pid
+                elif stream_type == STREAM_TYPE_AAC:
+                    self._audio_pid = self._audio_pid or pid
+
+        if packet.pid == self._video_pid:
+            self._video_packet(packet)
+        elif packet.pid == self._audio_pid:
+            self._audio_packet(packet)
+
+    def _video_packet(self, packet: PesPacket) -> None:
+        unit = access_unit(packet.payload)
+
+        if unit.sps and unit.pps and self._avcc is None:
+            self._sps_info = parse_sps(unit.sps[0])
+            self._avcc = avc_decoder_configuration(
+                unit.sps[0], unit.pps[0], self._sps_info
+            )
+
+        if not unit.data:
+            return
+
+        dts = packet.dts
+        pts = packet.pts
+
+        if dts is None:
+            if self._pending is None:
+                return
+
+            dts = self._pending[0] + self._last_duration
+            pts = dts
+
+        if self._origin_dts is None:
+            if not unit.keyframe or self._avcc is None:
+                return
+
+            self._origin_pts = pts
+            self._origin_dts = dts
+            self._start_audio()
+
+        if self._pending is not None:
+            duration = dts - self._pending[0]
+
+            if duration > 0:
+                self._last_duration = duration
+
+            self._add_video_sample(self._last_duration)
+
+            if unit.keyframe and self._video_fragment_full():
+                self._flush()
+
+        self._pending = (dts, pts, unit)
+
+    def _add_video_sample(self, duration: int) -> None:
+        dts, pts, unit = self._pending
+        self._pending = None
+
+        if self._video is None:
+            self._video = TrackFragment(None, self._video_time)
+
+        # keeps the first keyframe presented at 0
+        offset = (pts - self._origin_pts) - (dts - self._origin_dts)
+
+        self._video.add(
+            unit.data,
+            duration,
+            SYNC_SAMPLE_FLAGS if unit.keyframe else NON_SYNC_SAMPLE_FLAGS,
+            offset,
+        )
+        self._video_time += duration
+
+    def _video_fragment_full(self) -> bool:
+        return (
+            self._video is not None
+            and self._video.duration
+            >= self.fragment_duration * PES_TIMESCALE
+        )
+
+    def _audio_packet(self, packet: PesPacket) -> None:
+        if self._origin_pts is None and self._video_pid is not None:
+            self._early_audio.append(packet)
+
+            if len(self._early_audio) > 1000:
+                # no keyframe, don't buffer forever
+                self._early_audio.popleft()
+
+            return
+
+        if self._origin_pts is None:
+            self._origin_pts = self._origin_dts = packet.pts or 0
+
+        self._add_audio(packet)
+
+        if self._video_pid is None and self._audio_fragment_full():
+            self._flush()
+
+    def _start_audio(self) -> None:
+        while self._early_audio:
+            self._add_audio(self._early_audio.popleft())
+
+    def _add_audio(self, packet: PesPacket) -> None:
+        pts = packet.pts
+
+        for index, (config, frame) in enumerate(
+            self._adts.feed(packet.payload)
+        ):
+            rate = config.sample_rate
+            time = None
+
+            if pts is not None:
+                frame_pts = pts + (
+                    index * FRAME_SAMPLES * PES_TIMESCALE // rate
+                )
+                time = (
+                    (frame_pts - self._origin_pts) * rate // PES_TIMESCALE
+                    + self._audio_shift
+                )
+
+            if self._audio_time is None:
+                if time is None or time < 0:
+                    # before the first video frame
+                    continue
+
+                self._audio_time = time
+            elif time is not None and not self._resync_audio(time, rate):
+                continue
+
+            if self._audio is None:
+                self._audio = TrackFragment(None, self._audio_time)
+
+            self._audio.add(frame, FRAME_SAMPLES)
+            self._audio_time += FRAME_SAMPLES
+
+    def _resync_audio(self, time: int, rate: int) -> bool:
+        """Follow the timestamp of the next audio frame, returns whether
+        to keep the frame
+        """
+
+        drift = time - self._audio_time
+
+        if abs(drift) <= FRAME_SAMPLES:
+            return True
+
+        if abs(drift) > MAX_AUDIO_DRIFT * rate // PES_TIMESCALE:
+            # timestamps restarted, carry on from the current time
+            self._audio_shift -= drift
+            return True
+
+        if drift < 0:
+            # overlaps audio already added
+            return False
+
+        if self._audio is not None and self._audio.samples:
+            self._audio.stretch(drift)
+
+        self._audio_time = time
+        return True
+
+    def _audio_fragment_full(self) -> bool:
+        if self._audio is None or self._adts.config is None:
+            return False
+
+        rate = self._adts.config.sample_rate
+        return self._audio.duration >= self.fragment_duration * rate
+
+    def _flush(self, force: bool = False) -> None:
+        if self._writer is None and not self._start_writer(force):
+            return
+
+        fragments: List[TrackFragment] = []
+
+        if self._video is not None:
+            fragments.append(self._with_track(self._video, self._video_track))
+
+        if self._audio is not None and self._audio_track is not None:
+            fragments.append(self._with_track(self._audio, self._audio_track))
+
+        self._writer.write_fragment(fragments)
+        self._video = None
+        self._audio = None
+
+    def _start_writer(self, force: bool) -> bool:
+        audio_ready = self._audio_pid is None or self._adts.config is not None
+
+        if not audio_ready and not force:
+            # wait a bit for the first audio frame
+            buffered = self._video.duration if self._video else 0
+
+            if buffered < MAX_HEADER_DELAY:
+                return False
+
+        tracks = []
+
+        if self._avcc is not None and self._video is not None:
+            self._video_track = Track.video(
+                len(tracks) + 1, self._sps_info, self._avcc
+            )
+            tracks.append(self._video_track)
+
+        if self._adts.config is not None and self._audio is not None:
+            self._audio_track = Track.audio(
+                len(tracks) + 1, self._adts.config
+            )
+            tracks.append(self._audio_track)
+
+        if not tracks:
+            return False
+
+        if self._audio_pid is not None and self._audio_track is None:
+            logger.warning(
+                "no AAC frame before the first fragment, audio is dropped"
+            )
+
+        self._writer = FragmentedMp4Writer(self.output, tracks)
+        return True
+
+    @staticmethod
+    def _with_track(fragment: TrackFragment, track: Track) -> TrackFragment:
+        fragment.track = track
+        return fragment
+
+
+def remux(
+    chunks: Iterable[bytes | memoryview],
+    output: BinaryIO,
+    fragment_duration: float = 2.0,
+) -> None:
+    """Remux a MPEG-TS stream given in chunks into MP4
+
+    Args:
+        chunks (Iterable[bytes | memoryview]): the MPEG-TS stream, e.g.
+            `SegmentDownloader.stream(file)`
+        output (BinaryIO): writable binary file object
+        fragment_duration (float): minimum seconds per fragment
+
+    Raises:
+        RemuxError: raised if the stream can't be remuxed
+    """
+
+    remuxer = TsToMp4Remuxer(output, fragment_duration)
+
+    for chunk in chunks:
+        remuxer.feed(chunk)
+
+    remuxer.finish()
+
+
+def remux_file(
+    input_filename: str,
+    output_filename: str,
+    fragment_duration: float = 2.0,
+    chunk_size: int = 1 << 20,
+) -> None:
+    """Remux a MPEG-TS file into a MP4 file
+
+    Args:
+        input_filename (str): MPEG-TS file
+        output_filename (str): MP4 file to create
+        fragment_duration (float): minimum seconds per fragment
+        chunk_size (int): bytes read at once
+
+    Raises:
+        RemuxError: raised if the file can't be remuxed
+    """
+
+    with open(input_filename, "rb") as input_file, open(
+        output_filename, "wb"
+    ) as output_file:
+        remux(
+            iter(lambda: input_file.read(chunk_size), b""),
+            output_file,
+            fragment_duration,
+        )
@@ -0,0 +1,207 @@
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+from beletapi.exceptions import RemuxError
+
+
+PACKET_SIZE = 188
+
+SYNC_BYTE = 0x47
+
+STREAM_TYPE_AAC = 0x0F
+
+STREAM_TYPE_H264 = 0x1B
+
+# 33 bit PTS/DTS
+TIMESTAMP_WRAP = 1 << 33
+
+
+class PesPacket(NamedTuple):
+    """Reassembled PES packet of an elementary stream
+
+    Attributes:
+        pid: PID of the elementary stream
+        stream_type: `STREAM_TYPE_*` from the PMT
+        pts: presentation timestamp in 90kHz units (unwrapped)
+        dts: decoding timestamp, equals `pts` if absent
+        payload: elementary stream data
+    """
+
+    pid: int
+    stream_type: int
+    pts: Optional[int]
+    dts: Optional[int]
+    payload: bytes
+
+
+class TsDemuxer:
+    """Incremental MPEG-TS demuxer
+
+    Finds elementary streams through PAT/PMT and reassembles their
+    PES packets. Data can be fed in chunks of any size, only the
+    incomplete tail packet and the PES packets being assembled are
+    kept in memory.
+    """
+
+    def __init__(self) -> None:
+        self.streams: Dict[int, int] = {}
+        self._pmt_pid: Optional[int] = None
+        self._tail = b""
+        self._pes: Dict[int, List[bytes]] = {}
+        self._last_timestamps: Dict[int, int] = {}
+
+    @property
+    def has_streams(self) -> bool:
+        return bool(self.streams)
+
+    def feed(self, data: bytes | memoryview) -> Iterator[PesPacket]:
+        """Demux a chunk, yields PES packets completed by it"""
+
+        data = self._tail + bytes(data) if self._tail else bytes(data)
+        end = len(data) - len(data) % PACKET_SIZE
+        streams = self.streams
+        pes = self._pes
+
+        # hot loop, packets are parsed inline
+        for offset in range(0, end, PACKET_SIZE):
+            if data[offset] != SYNC_BYTE:
+                raise RemuxError(f"lost MPEG-TS sync at byte {offset}")
+
+            flags = data[offset + 1]
+            pid = (flags & 0x1F) << 8 | data[offset + 2]
+            control = data[offset + 3]
+
+            if not control & 0x10:
+                # adaptation field only
+                continue
+
+            start = offset + 4
+
+            if control & 0x20:
+                start += 1 + data[start]
+
+            stop = offset + PACKET_SIZE
+
+            if start >= stop:
+                continue
+
+            if pid in streams:
+                if flags & 0x40:
+                    packet = self._finish_pes(pid)
+                    pes[pid] = [data[start:stop]]
+
+                    if packet is not None:
+                        yield packet
+                else:
+                    chunks = pes.get(pid)
+
+                    if chunks is not None:
+                        chunks.append(data[start:stop])
+            elif flags & 0x40:
+                if pid == 0:
+                    self._parse_pat(data[start:stop])
+                elif pid == self._pmt_pid:
+                    self._parse_pmt(data[start:stop])
+
+        self._tail = data[end:]
+
+    def flush(self) -> Iterator[PesPacket]:
+        """Yield PES packets still being assembled"""
+
+        for pid in list(self._pes):
+            packet = self._finish_pes(pid)
+
+            if packet is not None:
+                yield packet
+
+    def _parse_pat(self, payload: bytes) -> None:
+        section = payload[1 + payload[0] :]
+        length = ((section[1] & 0x0F) << 8) | section[2]
+
+        # program loop, the CRC is skipped
+        for i in range(8, 3 + length - 4, 4):
+            program = (section[i] << 8) | section[i + 1]
+
+            if program != 0:
+                self._pmt_pid = (section[i + 2] & 0x1F) << 8 | section[i + 3]
+                return
+
+    def _parse_pmt(self, payload: bytes) -> None:
+        section = payload[1 + payload[0] :]
+        length = ((section[1] & 0x0F) << 8) | section[2]
+        info_length = ((section[10] & 0x0F) << 8) | section[11]
+        i = 12 + info_length
+        end = 3 + length - 4
+
+        while i + 5 <= end:
+            stream_type = section[i]
+            pid = ((section[i + 1] & 0x1F) << 8) | section[i + 2]
+            es_info_length = ((section[i + 3] & 0x0F) << 8) | section[i + 4]
+
+            if stream_type in (STREAM_TYPE_H264, STREAM_TYPE_AAC):
+                self.streams.setdefault(pid, stream_type)
+
+            i += 5 + es_info_length
+
+    def _finish_pes(self, pid: int) -> Optional[PesPacket]:
+        chunks = self._pes.pop(pid, None)
+
+        if not chunks:
+            return None
+
+        data = b"".join(chunks)
+
+        if len(data) < 9 or data[:3] != b"\x00\x00\x01":
+            return None
+
+        flags = data[7]
+        header_length = data[8]
+        pts = dts = None
+
+        if flags & 0x80:
+            pts = self._unwrap(pid, _timestamp(data, 9))
+
+            if flags & 0x40:
+                dts = self._unwrap(pid, _timestamp(data, 14))
+            else:
+                dts = pts
+
+        return PesPacket(
+            pid, self.streams[pid], pts, dts, data[9 + header_length :]
+        )
+
+    def _unwrap(self, pid: int, timestamp: int) -> int:
+        last = self._last_timestamps.get(pid)
+
+        if last is not None:
+            # pick the wrap period closest to the previous timestamp
+            base = last - last % TIMESTAMP_WRAP
+            candidates = (
+                base - TIMESTAMP_WRAP + timestamp,
+                base + timestamp,
+                base + TIMESTAMP_WRAP + timestamp,
+            )
+            timestamp = min(candidates, key=lambda c: abs(c - last))
+
+        self._last_timestamps[pid] = timestamp
+        return timestamp
+
+
+def _timestamp(data: bytes, offset: int) -> int:
+    return (
+        ((data[offset] >> 1) & 0x07) << 30
+        | data[offset + 1] << 22
+        | (data[offset + 2] >> 1) << 15
+        | data[offset + 3] << 7
+        | data[offset + 4] >> 1
+    )
+
+
+def demux(chunks: Iterable[bytes | memoryview]) -> Iterator[PesPacket]:
+    """Yield PES packets of a MPEG-TS stream given in chunks"""
+
+    demuxer = TsDemuxer()
+
+    for chunk in chunks:
+        yield from demuxer.feed(chunk)
+
+    yield from demuxer.flush()
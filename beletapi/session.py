@@ -1,11 +1,16 @@
-import base64
 import time
-from typing import Callable, Optional, Dict
+import threading
+from typing import Callable, Optional, Dict, List, Tuple
 
 import requests
 
 from .api import Apis
+from .adapters import BeletHTTPAdapter, HostConfig, default_host_configs
+from .ratelimit import RateLimiterStats
+from .cache import ResponseCache
+from .metrics import SessionMetrics
 from .exceptions import *
+from .utils import decode_token
 
 
 class BeletSession(requests.Session):
@@ -14,15 +19,48 @@ class BeletSession(requests.Session):
     This object is only used to get raw data from server,
     it just wraps the `requests.Session` object providing
     useful data to server such as session token and cookies
+
+    It's safe to share one session between threads: when several
+    requests get 401 at the same time, only one of them refreshes
+    the token and the others replay with the new token.
+
+    Every api host gets its own connection pool, retries and circuit
+    breaker (see `HostConfig`), `host_configs` overrides the defaults
+    per url prefix (e.g. `{"https://cdn.belet.tm/": HostConfig(...)}`).
+
+    Every request is recorded in `metrics` (see `SessionMetrics`).
     """
 
     """Session token"""
     _token: Optional[str]
 
-    def __init__(self, *args, **kwargs) -> None:
+    """Optional on-disk cache of GET responses"""
+    cache: Optional[ResponseCache]
+
+    """Request metrics"""
+    metrics: SessionMetrics
+
+    def __init__(
+        self,
+        *args,
+        cache: Optional[ResponseCache] = None,
+        host_configs: Optional[Dict[str, HostConfig]] = None,
+        metrics: Optional[SessionMetrics] = None,
+        **kwargs,
+    ) -> None:
         super().__init__(*args, **kwargs)
 
+        for prefix, config in (
+            default_host_configs() | (host_configs or {})
+        ).items():
+            self.configure_host(prefix, config)
+
         self._token = None
+        self._token_expiration: Optional[Tuple[str, int]] = None
+        self._token_listeners: List[Callable[[Optional[str]], None]] = []
+        self._refresh_lock = threading.Lock()
+        self.cache = cache
+        self.metrics = metrics if metrics is not None else SessionMetrics()
 
     @property
     def token(self) -> str:
@@ -32,6 +70,66 @@ class BeletSession(requests.Session):
     def token(self, token) -> None:
         self._token = token
 
+        for listener in list(self._token_listeners):
+            listener(token)
+
+    def configure_host(self, prefix: str, config: HostConfig) -> None:
+        """Mount a `BeletHTTPAdapter` for urls starting with `prefix`
+
+        Args:
+            prefix (str): url prefix, e.g. `https://api.belet.tm/`
+            config (HostConfig): connection settings
+        """
+
+        self.mount(prefix, BeletHTTPAdapter(config))
+
+    def limiter_stats(self) -> Dict[str, RateLimiterStats]:
+        """Current state of rate limiters by host
+
+        Only hosts with `rate_limit` or `max_in_flight` configured
+        that were requested at least once are included.
+        """
+
+        stats = {}
+
+        for adapter in self.adapters.values():
+            if isinstance(adapter, BeletHTTPAdapter):
+                stats |= adapter.limiter_stats()
+
+        return stats
+
+    def send(self, request, **kwargs) -> requests.Response:  # override
+        endpoint = self.metrics.endpoint_of(request.url)
+        start = time.perf_counter()
+
+        try:
+            response = super().send(request, **kwargs)
+        except Exception:
+            self.metrics.record_request(
+                endpoint,
+                request.method,
+                "error",
+                time.perf_counter() - start,
+                0,
+            )
+            raise
+
+        if kwargs.get("stream", False):
+            # body isn't read yet
+            received = int(response.headers.get("Content-Length") or 0)
+        else:
+            received = len(response.content)
+
+        self.metrics.record_request(
+            endpoint,
+            request.method,
+            response.status_code,
+            time.perf_counter() - start,
+            received,
+        )
+
+        return response
+
     def get_token_expiration_date(self) -> int:
         """Get timestamp of token expiration time
 
@@ -44,12 +142,15 @@ class BeletSession(requests.Session):
             InvalidTokenError: raised if token is `None`
         """
 
-        if not self._token:
-            raise InvalidTokenError(self._token)
+        token = self._token
+        cached = self._token_expiration
+
+        # claims are decoded once per token
+        if cached is None or cached[0] is not token:
+            cached = (token, decode_token(token)["exp"])
+            self._token_expiration = cached
 
-        s = base64.b64decode(self._token.rsplit(".", 1)[0].encode() + b"==")
-        start = s.find(b"{", 1)
-        return json.loads(s[start:])["exp"]
+        return cached[1]
 
     def is_token_expired(self) -> bool:
         """Check if token is expired
@@ -76,7 +177,7 @@ class BeletSession(requests.Session):
         """
 
         if self.is_token_expired():
-            self._refresh_token()
+            self._refresh_token_once(self._token)
             return True
 
         return False
@@ -85,7 +186,8 @@ class BeletSession(requests.Session):
         """Make GET request
 
         Make GET request to `url` with token appended.
-        Automatically refreshes token if expired.
+        Automatically refreshes token if expired. Responses
+        of cacheable endpoints are served from `cache` if set.
 
         Args:
             All args of `requests.Request` object.
@@ -96,13 +198,20 @@ class BeletSession(requests.Session):
             requests.Response: response object of `requests` module
         """
 
-        kwargs["headers"] = self._set_header_token(kwargs.get("headers", {}))
+        if self.cache is not None and not kwargs.get("stream", False):
+            return self._cached_get(*args, **kwargs)
+
+        return self._get(*args, **kwargs)
 
+    def _get(self, *args, **kwargs) -> requests.Response:
         _kwargs = kwargs.copy()
         _kwargs.pop("refresh", None)
+        _kwargs["headers"] = self._set_header_token(
+            dict(kwargs.get("headers") or {})
+        )
         response = super().get(*args, **_kwargs)
         response = self._repeat_request_if_token_is_expired(
-            response, self.get, *args, **kwargs
+            response, self._get, *args, **kwargs
         )
 
         return response
@@ -122,10 +231,11 @@ class BeletSession(requests.Session):
             requests.Response: response object of `requests` module
         """
 
-        kwargs["headers"] = self._set_header_token(kwargs.get("headers", {}))
-
         _kwargs = kwargs.copy()
         _kwargs.pop("refresh", None)
+        _kwargs["headers"] = self._set_header_token(
+            dict(kwargs.get("headers") or {})
+        )
         response = super().post(*args, **_kwargs)
         response = self._repeat_request_if_token_is_expired(
             response, self.post, *args, **kwargs
@@ -133,19 +243,75 @@ class BeletSession(requests.Session):
 
         return response
 
+    def _cached_get(self, url: str, **kwargs) -> requests.Response:
+        endpoint = Apis.resolve_endpoint(url)
+        ttl = self.cache.get_ttl(endpoint)
+
+        if ttl is None:
+            return self._get(url, **kwargs)
+
+        full_url = requests.Request(
+            "GET", url, params=kwargs.get("params")
+        ).prepare().url
+        key = self.cache.key(full_url, self._token)
+        entry = self.cache.load(key)
+
+        if entry is not None:
+            if self.cache.is_fresh(entry, ttl):
+                self.metrics.record_cache(endpoint, "hit")
+                return self.cache.build_response(entry)
+
+            kwargs["headers"] = dict(kwargs.get("headers") or {})
+            kwargs["headers"].update(self.cache.revalidation_headers(entry))
+
+        response = self._get(url, **kwargs)
+
+        if response.status_code == 304 and entry is not None:
+            self.metrics.record_cache(endpoint, "revalidated")
+            entry["stored_at"] = time.time()
+            self.cache.save(key, entry)
+            return self.cache.build_response(entry)
+
+        self.metrics.record_cache(endpoint, "miss")
+
+        if self.cache.is_cacheable(response):
+            # token might have been refreshed while requesting
+            self.cache.store(self.cache.key(full_url, self._token), response)
+
+        return response
+
     def _set_header_token(self, headers: Dict[str, str]) -> Dict[str, str]:
         headers.setdefault("Authorization", self._token)
         return headers
 
+    def _refresh_token_once(self, stale_token: Optional[str]) -> bool:
+        # the first thread refreshes, the others only wait for it
+        with self._refresh_lock:
+            if self._token != stale_token:
+                return False
+
+            self._refresh_token()
+            return True
+
     def _refresh_token(self) -> None:
-        response = super().post(url=Apis.main_api.refresh)
+        start = time.perf_counter()
 
-        if response.status_code == 401:
-            raise UnauthorizedError(response.text)
+        try:
+            response = super().post(url=Apis.main_api.refresh)
+
+            if response.status_code == 401:
+                raise UnauthorizedError(response.text)
+
+            response.raise_for_status()
 
-        response.raise_for_status()
+            self.token = response.json()["token"]
+        except Exception:
+            self.metrics.record_token_refresh(
+                time.perf_counter() - start, False
+            )
+            raise
 
-        self.token = response.json()["token"]
+        self.metrics.record_token_refresh(time.perf_counter() - start, True)
 
     def _repeat_request_if_token_is_expired(
         self,
@@ -156,7 +322,12 @@ class BeletSession(requests.Session):
     ) -> requests.Response:
         if response.status_code == 401:
             if kwargs.get("refresh", True):
-                self._refresh_token()
+                self.metrics.record_retry(
+                    self.metrics.endpoint_of(response.request.url)
+                )
+                self._refresh_token_once(
+                    response.request.headers.get("Authorization")
+                )
                 kwargs["refresh"] = False
                 return request_function(*args, **kwargs)
             else:
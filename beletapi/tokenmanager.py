@@ -0,0 +1,201 @@
+import time
+import threading
+from typing import Callable, Optional, Tuple
+
+from .session import BeletSession
+from .utils import decode_token
+
+
+class TokenManager:
+    """Refreshes the session token in background before it expires
+
+    A daemon thread sleeps until `margin` seconds before the token
+    expiry (at most half of the token lifetime, and not sooner than
+    `retry_interval` after the last refresh) and refreshes it, so
+    requests don't have to get 401 and retry. It's woken up whenever
+    the session token changes (login, reactive refresh...) to
+    reschedule. Failed refreshes are retried, also after the token
+    expired, starting after `retry_interval` seconds and doubling the
+    delay up to `max_retry_interval`.
+
+    Args:
+        session (BeletSession): session whose token is managed
+        margin (float): seconds before expiry to refresh at
+        retry_interval (float): seconds before retrying a failed
+            refresh
+        max_retry_interval (float): maximum seconds between retries
+        on_refresh (Callable[[float, int], None]): called with the
+            refresh latency in seconds and the new expiry timestamp,
+            not for tokens replaced meanwhile by another thread
+        on_error (Callable[[Exception], None]): called when a
+            refresh fails
+    """
+
+    def __init__(
+        self,
+        session: BeletSession,
+        margin: float = 60,
+        retry_interval: float = 5,
+        max_retry_interval: float = 300,
+        on_refresh: Optional[Callable[[float, int], None]] = None,
+        on_error: Optional[Callable[[Exception], None]] = None,
+    ) -> None:
+        self._session = session
+        self.margin = margin
+        self.retry_interval = retry_interval
+        self.max_retry_interval = max_retry_interval
+        self.on_refresh = on_refresh
+        self.on_error = on_error
+
+        self.refresh_count = 0
+        self.failure_count = 0
+        self.last_refresh_latency: Optional[float] = None
+        self.last_error: Optional[Exception] = None
+        # consecutive failed refreshes, for the retry backoff
+        self._failures = 0
+        # monotonic time of the last successful refresh
+        self._refreshed_at: Optional[float] = None
+        # token and when it was first seen, if it has no "iat" claim
+        self._seen: Tuple[Optional[str], float] = (None, 0.0)
+
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self) -> "TokenManager":
+        self.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+
+        self._stopped.clear()
+        self._session._token_listeners.append(self._on_token_changed)
+        self._thread = threading.Thread(
+            target=self._run, name="beletapi-token-manager", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stopped.set()
+        self._wakeup.set()
+
+        if self._on_token_changed in self._session._token_listeners:
+            self._session._token_listeners.remove(self._on_token_changed)
+
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def next_refresh_in(self) -> Optional[float]:
+        """Seconds until the next scheduled refresh
+
+        Returns:
+            Optional[float]: `None` if there is no token to refresh
+        """
+
+        token = self._session.token
+
+        if not token:
+            return None
+
+        expiration = self._session.get_token_expiration_date()
+
+        # short-lived tokens would be due again right after a refresh
+        lifetime = max(expiration - self._issued_at(token), 0)
+        margin = min(self.margin, lifetime / 2)
+        delay = max(expiration - margin - time.time(), 0)
+
+        if self._refreshed_at is not None:
+            # never refresh in a loop, whatever the server returns
+            delay = max(
+                delay,
+                self._refreshed_at + self.retry_interval - time.monotonic(),
+            )
+
+        return delay
+
+    def _issued_at(self, token: str) -> float:
+        issued_at = decode_token(token).get("iat")
+
+        if issued_at is not None:
+            return issued_at
+
+        if self._seen[0] != token:
+            self._seen = (token, time.time())
+
+        return self._seen[1]
+
+    def _on_token_changed(self, token: Optional[str]) -> None:
+        self._wakeup.set()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                delay = self.next_refresh_in()
+            except Exception as e:
+                # undecodable token, nothing to schedule
+                self._report_error(e)
+                delay = None
+
+            if delay is None or delay > 0:
+                self._wakeup.wait(delay)
+                self._wakeup.clear()
+                continue
+
+            if self._refresh():
+                self._failures = 0
+                self._refreshed_at = time.monotonic()
+                continue
+
+            # expired tokens are accepted by the refresh endpoint too,
+            # keep retrying (or until woken up by a new token)
+            self._failures += 1
+            self._wakeup.wait(self._retry_delay())
+            self._wakeup.clear()
+
+    def _retry_delay(self) -> float:
+        return min(
+            self.retry_interval * 2 ** (self._failures - 1),
+            self.max_retry_interval,
+        )
+
+    def _refresh(self) -> bool:
+        token = self._session.token
+        start = time.perf_counter()
+
+        try:
+            refreshed = self._session._refresh_token_once(token)
+        except Exception as e:
+            self._report_error(e)
+            return False
+
+        if not refreshed:
+            # already replaced by another thread, rescheduled by it
+            return True
+
+        self.last_refresh_latency = time.perf_counter() - start
+        self.refresh_count += 1
+
+        if self.on_refresh is not None:
+            self.on_refresh(
+                self.last_refresh_latency,
+                self._session.get_token_expiration_date(),
+            )
+
+        return True
+
+    def _report_error(self, error: Exception) -> None:
+        self.failure_count += 1
+        self.last_error = error
+
+        if self.on_error is not None:
+            self.on_error(error)
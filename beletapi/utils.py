@@ -1,7 +1,15 @@
+import os
 import re
+import json
+import base64
+import pickle
 import random
+import struct
+import tempfile
 import datetime
-from typing import NamedTuple
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .exceptions import InvalidMovieIDError, InvalidTokenError
 
 
 _movie_url_pattern = re.compile(
@@ -33,6 +41,138 @@ def parse_movie_url(url) -> BeletMovieUrlInfo:
     return BeletMovieUrlInfo(**d)
 
 
+def format_movie_id(movie_id: int | str) -> int:
+    if isinstance(movie_id, str):
+        if movie_id.startswith("https://"):
+            return parse_movie_url(movie_id).movie_id
+        elif movie_id.isdigit():
+            return int(movie_id)
+
+    if isinstance(movie_id, int):
+        return movie_id
+
+    raise InvalidMovieIDError(movie_id)
+
+
+def format_movie_ids(
+    movie_ids: Iterable[int | str],
+) -> Tuple[List[int | str], Dict[int | str, Exception]]:
+    """Normalize and deduplicate movie ids and urls, keeping their order
+
+    Inputs that can't be parsed are kept as they are, their exception
+    is returned under the input.
+
+    Returns:
+        Tuple[List[int | str], Dict[int | str, Exception]]: ids and
+            parse errors
+    """
+
+    ids = {}
+    errors = {}
+
+    for movie_id in movie_ids:
+        try:
+            ids[format_movie_id(movie_id)] = None
+        except (InvalidMovieIDError, ValueError) as e:
+            ids[movie_id] = None
+            errors[movie_id] = e
+
+    return list(ids), errors
+
+
+def format_phone(phone: int | str) -> int:
+    pattern = re.compile("[\\d]{8}$")
+
+    if isinstance(phone, int):
+        phone = str(phone)
+
+    found = pattern.search(phone)
+
+    if not found:
+        raise ValueError(f"Wrong phone number format -> {phone}")
+
+    return int("993" + found[0])
+
+
+def decode_token(token: Optional[str]) -> Dict[str, Any]:
+    """Decode claims of the session token
+
+    Args:
+        token (str): session token
+
+    Returns:
+        Dict[str, Any]: token claims
+
+    Raises:
+        InvalidTokenError: raised if token is `None`
+    """
+
+    if not token:
+        raise InvalidTokenError(token)
+
+    s = base64.b64decode(token.rsplit(".", 1)[0].encode() + b"==")
+    start = s.find(b"{", 1)
+    return json.loads(s[start:])
+
+
+def load_data_file(path: str) -> Optional[Tuple[str, Any]]:
+    """Load token and pickled cookies saved by `save_data_file`
+
+    Returns:
+        Optional[Tuple[str, Any]]: token and cookie jar or `None`
+                                   if `path` doesn't exist
+    """
+
+    if not os.path.isfile(path):
+        return None
+
+    with open(path, "rb") as file:
+        data = file.read()
+
+    token_len, cookies_len = struct.unpack(">Bi", data[0:5])
+
+    _, _, token, cookies = struct.unpack(
+        f">Bi{token_len}s{cookies_len}s",
+        data,
+    )
+
+    return token.decode("ascii"), pickle.loads(cookies)
+
+
+def save_data_file(path: str, token: str, cookies: Any) -> None:
+    """Save token and cookies to `path`
+
+    The file is replaced atomically, so concurrent readers never
+    see a partially written file.
+    """
+
+    token_len = len(token)
+    cookies = pickle.dumps(cookies)
+    cookies_len = len(cookies)
+    data = struct.pack(
+        f">Bi{token_len}s{cookies_len}s",
+        token_len,
+        cookies_len,
+        token.encode("ascii"),
+        cookies,
+    )
+
+    fd, temp_path = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp"
+    )
+
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
 def generate_fingerprint() -> str:
     rand_str = ""
 
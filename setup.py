@@ -10,6 +10,8 @@ setup(
         "beletapi/",
         "beletapi/downloaders",
         "beletapi/models",
+        "beletapi/benchmark",
+        "beletapi/remux",
     ],
     install_requires=[],
 )